@@ -1,3 +1,6 @@
 from django.contrib import admin
 
+from .models import GeocodeResult
+
 # Register your models here.
+admin.site.register(GeocodeResult)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class DeadConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dead"
+
+    def ready(self):
+        from user.rollups import rollups_changed
+
+        from . import graphstore
+        from .forecast import schedule_refresh
+
+        rollups_changed.connect(schedule_refresh, dispatch_uid="dead.forecast.schedule_refresh")
+        graphstore.preload()
@@ -0,0 +1,74 @@
+"""Many-to-many walking distances over a GraphStore, cached by snapped node.
+
+All origins and destinations are snapped to their nearest nodes in one batch.
+Each origin then needs a single Dijkstra sweep that stops as soon as every
+destination node is settled or the cutoff is passed. The leg from a point to
+its nearest node counts at its straight-line length, so places off the network
+(or outside the mapped area) come out correspondingly far.
+
+Sweeps are cached per origin node: every request from the same street corner
+reuses the last sweep as long as it covered the destinations and the cutoff.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .routing import one_to_many
+
+LRU_SIZE = 512
+
+
+class DistanceMatrix:
+    def __init__(self, store, cache_size=LRU_SIZE):
+        self.store = store
+        self.cache_size = cache_size
+        self._lru = OrderedDict()  # origin node -> (cutoff searched, {destination node: metres})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compute(self, origins, destinations, cutoff=math.inf):
+        """Metres from each (lat, lon) origin to each destination, as an
+        origins x destinations array. Pairs longer than ``cutoff`` or unreachable are inf."""
+        matrix = np.full((len(origins), len(destinations)), np.inf)
+        if not len(origins) or not len(destinations):
+            return matrix
+        origin_nodes, origin_offsets = self.store.snap([p[0] for p in origins], [p[1] for p in origins])
+        dest_nodes, dest_offsets = self.store.snap([p[0] for p in destinations], [p[1] for p in destinations])
+        dest_nodes = dest_nodes.tolist()
+        targets = set(dest_nodes)
+
+        for i, (node, offset) in enumerate(zip(origin_nodes.tolist(), origin_offsets.tolist())):
+            reached = self.from_node(node, targets, cutoff - offset)
+            matrix[i] = offset + np.array([reached[t] for t in dest_nodes]) + dest_offsets
+        matrix[matrix > cutoff] = np.inf
+        return matrix
+
+    def from_node(self, source, targets, cutoff=math.inf):
+        """{target: network metres} from node ``source``; inf past ``cutoff`` or unreachable"""
+        with self._lock:
+            cached = self._lru.get(source)
+            if cached is not None and cached[0] >= cutoff and targets <= cached[1].keys():
+                self._lru.move_to_end(source)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        if cached is not None:
+            # Widen the sweep to what the cache already promised, so the entry only grows
+            targets = targets | cached[1].keys()
+            cutoff = max(cutoff, cached[0])
+
+        reached = one_to_many(self.store, source, targets, cutoff) if cutoff >= 0 else {}
+        distances = {target: reached.get(target, math.inf) for target in targets}
+        with self._lock:
+            self._lru[source] = (cutoff, distances)
+            self._lru.move_to_end(source)
+            while len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+        return distances
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
@@ -0,0 +1,194 @@
+"""Batch consumption forecasting for the calculate endpoint.
+
+Every item's monthly net consumption (bought - wasted, from the MonthlyConsumption
+rollup) is loaded into one items x months NumPy matrix. A damped-trend Holt model
+is then fitted for all items at once: the loop runs over months, and each step is
+a vector operation across items. Items with two or more years of history blend in
+a seasonal baseline (the same calendar month in previous years). Forecasts and
+waste-adjusted purchase recommendations go into ConsumptionForecast, which
+calculate reads directly.
+
+Refreshes run nightly (``manage.py refresh_forecasts``) and, debounced, in the
+background whenever the rollup changes.
+"""
+import logging
+import threading
+import time
+from datetime import date
+
+import numpy as np
+from django.db import close_old_connections, connection
+
+from foodsaver.db import WRITE_TIMEOUT, writer as db_writer
+from foodsaver.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+ALPHA = 0.5  # level smoothing
+BETA = 0.2  # trend smoothing
+PHI = 0.9  # trend damping
+SEASONAL_WEIGHT = 0.4  # share of the seasonal baseline when two years of history exist
+WASTE_WINDOW = 6  # months used for the waste ratio
+REFRESH_DELAY = 5.0  # seconds to wait for more changes before a background refresh
+WRITE_BATCH_SIZE = 2000
+
+refresh_flight = SingleFlight()
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def load_series(today=None):
+    """Monthly series for every item with purchase history.
+
+    Returns ``(item_ids, first_month, bought, wasted)``. ``bought`` and ``wasted``
+    are items x months float matrices on a continuous month axis that runs to the
+    current month, so recent months without purchases pull forecasts down. Months
+    before an item's first purchase are NaN; later months without purchases are 0.
+    """
+    today = today or date.today()
+    from user.models import MonthlyConsumption
+
+    query = MonthlyConsumption.objects.order_by().values_list('food_item_id', 'year', 'month', 'total_bought', 'total_wasted')
+    sql, params = query.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 5)
+
+    if not len(rows):
+        return np.empty(0, dtype=np.int64), 0, np.empty((0, 0)), np.empty((0, 0))
+
+    item_ids, item_index = np.unique(rows[:, 0], return_inverse=True)
+    month_number = rows[:, 1] * 12 + rows[:, 2] - 1
+    first_month = int(month_number.min())
+    last_month = max(int(month_number.max()), today.year * 12 + today.month - 1)
+    month_index = month_number - first_month
+    shape = (len(item_ids), last_month - first_month + 1)
+
+    bought = np.zeros(shape)
+    wasted = np.zeros(shape)
+    bought[item_index, month_index] = rows[:, 3]
+    wasted[item_index, month_index] = rows[:, 4]
+
+    first_seen = np.full(len(item_ids), shape[1])
+    np.minimum.at(first_seen, item_index, month_index)
+    before_first = np.arange(shape[1])[None, :] < first_seen[:, None]
+    bought[before_first] = np.nan
+    wasted[before_first] = np.nan
+    return item_ids, first_month, bought, wasted
+
+
+def holt_forecast(series, alpha=ALPHA, beta=BETA, phi=PHI):
+    """One-step-ahead damped-trend Holt forecast for each row of ``series``.
+
+    NaN marks months before a row's history starts. Each row is initialised at its
+    first observation.
+    """
+    n_items, n_months = series.shape
+    level = np.full(n_items, np.nan)
+    trend = np.zeros(n_items)
+    for t in range(n_months):
+        y = series[:, t]
+        observed = ~np.isnan(y)
+        starting = observed & np.isnan(level)
+        level[starting] = y[starting]
+
+        updating = observed & ~starting
+        previous = level[updating]
+        damped = phi * trend[updating]
+        level[updating] = alpha * y[updating] + (1 - alpha) * (previous + damped)
+        trend[updating] = beta * (level[updating] - previous) + (1 - beta) * damped
+    return level + phi * trend
+
+
+def seasonal_baseline(series):
+    """Mean of the same calendar month in previous years for the month after the
+    last column, and a mask of rows with at least two such years"""
+    n_months = series.shape[1]
+    columns = [n_months - 12 * k for k in (1, 2, 3) if n_months - 12 * k >= 0]
+    if len(columns) < 2:
+        return np.full(series.shape[0], np.nan), np.zeros(series.shape[0], dtype=bool)
+    same_month = series[:, columns]
+    available = (~np.isnan(same_month)).sum(axis=1)
+    baseline = np.divide(np.nansum(same_month, axis=1), available,
+                         out=np.full(series.shape[0], np.nan), where=available > 0)
+    return baseline, available >= 2
+
+
+def compute_forecasts(bought, wasted):
+    """Forecast arrays for every item. Returns a dict of per-item arrays."""
+    net = bought - wasted
+    history = (~np.isnan(net)).sum(axis=1)
+
+    forecast = holt_forecast(net)
+    baseline, seasonal = seasonal_baseline(net)
+    forecast = np.where(seasonal, (1 - SEASONAL_WEIGHT) * forecast + SEASONAL_WEIGHT * baseline, forecast)
+    forecast = np.maximum(forecast, 0.0)
+
+    recent_bought = np.nansum(bought[:, -WASTE_WINDOW:], axis=1)
+    recent_wasted = np.nansum(wasted[:, -WASTE_WINDOW:], axis=1)
+    waste_ratio = np.divide(recent_wasted, recent_bought, out=np.zeros_like(recent_bought), where=recent_bought > 0)
+
+    # The forecast is of net consumption, what actually gets used, so it already
+    # leaves out what would be wasted; the waste ratio is reported, not applied again
+    recommended = np.rint(forecast).astype(np.int64)
+
+    return {
+        'forecast': forecast,
+        'waste_ratio': waste_ratio,
+        'recommended': recommended,
+        'seasonal': seasonal,
+        'history': history,
+    }
+
+
+def refresh_forecasts():
+    """Recompute and store forecasts for every item. Returns the number of items."""
+    from .models import ConsumptionForecast
+
+    started = time.perf_counter()
+    item_ids, _, bought, wasted = load_series()
+    results = compute_forecasts(bought, wasted) if len(item_ids) else None
+
+    rows = [
+        ConsumptionForecast(
+            food_item_id=int(item_id),
+            forecast_consumption=round(float(results['forecast'][i]), 3),
+            waste_ratio=round(float(results['waste_ratio'][i]), 4),
+            recommended_quantity=int(results['recommended'][i]),
+            method='holt+seasonal' if results['seasonal'][i] else 'holt',
+            months_of_history=int(results['history'][i]),
+        )
+        for i, item_id in enumerate(item_ids)
+    ]
+    def replace():
+        ConsumptionForecast.objects.all().delete()
+        ConsumptionForecast.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+
+    # Swap the whole table in one write; readers keep seeing the old forecasts until it commits
+    db_writer.submit(replace).result(WRITE_TIMEOUT)
+    logger.info(f"Refreshed {len(rows)} consumption forecasts in {time.perf_counter() - started:.2f}s")
+    return len(rows)
+
+
+def _run_scheduled_refresh():
+    global _timer
+    with _timer_lock:
+        _timer = None
+    close_old_connections()
+    try:
+        refresh_flight.do('forecasts', refresh_forecasts)
+    except Exception as e:
+        logger.error(f"Error refreshing consumption forecasts: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_refresh(**kwargs):
+    """Refresh forecasts in the background once changes have settled (signal receiver)"""
+    global _timer
+    with _timer_lock:
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(REFRESH_DELAY, _run_scheduled_refresh)
+        _timer.daemon = True
+        _timer.start()
@@ -0,0 +1,179 @@
+"""Geocoding through an in-process LRU and a persistent cache table.
+
+Lookups go LRU -> ``GeocodeResult`` table -> geocoder backend, and answers
+(including "not found") are written back with the time they were fetched. Table
+rows are fresh for GEOCODE_TTL (not-found rows for NEGATIVE_TTL). A stale row is
+still returned when the backend cannot answer, so known places keep working
+offline.
+
+The backend is chosen by ``settings.GEOCODER``: 'google' uses the Google Maps
+client when GOOGLE_MAPS_API_KEY is set; 'offline' answers from the table only.
+Fill the table ahead of time with ``manage.py prefetch_geocodes``.
+"""
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from foodsaver.db import WRITE_TIMEOUT, writer as db_writer
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_TTL = timedelta(days=90)
+NEGATIVE_TTL = timedelta(days=1)
+LRU_SIZE = 1024
+
+_lru = OrderedDict()  # address_key -> ((lat, lon) or None, expiry time)
+_lru_lock = threading.Lock()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def normalize_address(address):
+    """Case-, spacing- and punctuation-insensitive cache key for an address"""
+    text = re.sub(r'[^\w\s#-]', ' ', str(address).lower())
+    return re.sub(r'\s+', ' ', text).strip()[:255]
+
+
+class GoogleGeocoder:
+    name = 'google'
+
+    def __init__(self, api_key):
+        import googlemaps
+
+        self.client = googlemaps.Client(key=api_key)
+
+    def geocode(self, address):
+        """(lat, lon), or None when not found. Raises on transport or quota errors."""
+        results = self.client.geocode(address)
+        if not results:
+            return None
+        location = results[0]['geometry']['location']
+        return location['lat'], location['lng']
+
+
+class OfflineGeocoder:
+    """Answers nothing itself, so lookups are served from the cache table alone"""
+    name = 'offline'
+
+    def geocode(self, address):
+        raise LookupError('Offline geocoder: address not in the cache')
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                api_key = os.getenv('GOOGLE_MAPS_API_KEY')
+                if getattr(settings, 'GEOCODER', 'google') == 'google' and api_key:
+                    _backend = GoogleGeocoder(api_key)
+                else:
+                    _backend = OfflineGeocoder()
+    return _backend
+
+
+def set_backend(backend):
+    """Swap the geocoder backend (e.g. OfflineGeocoder() in tests or batch jobs)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _remember(key, coords, fetched_at):
+    expires = fetched_at + (GEOCODE_TTL if coords is not None else NEGATIVE_TTL)
+    with _lru_lock:
+        _lru[key] = (coords, expires)
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _is_fresh(row, now):
+    ttl = GEOCODE_TTL if row.lat is not None else NEGATIVE_TTL
+    return row.fetched_at >= now - ttl
+
+
+def _coords(row):
+    return (row.lat, row.lon) if row.lat is not None else None
+
+
+def _fetch_and_store(address, key, backend):
+    """Ask the backend and upsert the answer. Returns the stored row, or None on errors."""
+    from .models import GeocodeResult
+
+    try:
+        coords = backend.geocode(address)
+    except Exception as e:
+        if not isinstance(backend, OfflineGeocoder):
+            logger.error(f"Error geocoding address: {str(e)}")
+        return None
+
+    row, _ = db_writer.submit(
+        GeocodeResult.objects.update_or_create,
+        address_key=key,
+        defaults={
+            'address': str(address)[:255],
+            'lat': coords[0] if coords else None,
+            'lon': coords[1] if coords else None,
+            'provider': backend.name,
+            'fetched_at': timezone.now(),
+        },
+    ).result(WRITE_TIMEOUT)
+    return row
+
+
+def geocode(address, allow_remote=True):
+    """(lat, lon) for ``address``, or None. Only calls the backend on a cache miss
+    or an expired row, and never when ``allow_remote`` is False."""
+    return geocode_many([address], allow_remote=allow_remote)[address]
+
+
+def geocode_many(addresses, allow_remote=True, force=False):
+    """Geocode several addresses with one table query. Returns {address: coords or None}.
+
+    ``force`` skips both caches and asks the backend for every address.
+    """
+    from .models import GeocodeResult
+
+    results = {}
+    keys = {}
+    now = timezone.now()
+    for address in addresses:
+        if not address:
+            results[address] = None
+            continue
+        key = normalize_address(address)
+        with _lru_lock:
+            cached = _lru.get(key)
+            if cached is not None and not force and cached[1] > now:
+                _lru.move_to_end(key)
+                results[address] = cached[0]
+                continue
+        keys[address] = key
+    if not keys:
+        return results
+
+    rows = {row.address_key: row for row in GeocodeResult.objects.filter(address_key__in=set(keys.values()))}
+    backend = get_backend() if allow_remote else None
+    for address, key in keys.items():
+        row = rows.get(key)
+        if backend is not None and (row is None or force or not _is_fresh(row, now)):
+            # On backend errors keep serving the stale row, if there is one
+            row = _fetch_and_store(address, key, backend) or row
+        if row is None:
+            results[address] = None
+            continue
+        results[address] = _coords(row)
+        _remember(key, results[address], row.fetched_at)
+    return results
+
+
+def clear_lru():
+    with _lru_lock:
+        _lru.clear()
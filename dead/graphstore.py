@@ -0,0 +1,303 @@
+"""Compact, memory-mapped street-network graphs for routing.
+
+An OSM graph from osmnx is converted once into flat NumPy arrays, stored as
+``.npy`` files under ``settings.GRAPH_STORE_DIR/<place-slug>/``:
+
+    node_ids  int64   OSM id of each node
+    lat, lon  float64 node coordinates
+    indptr    int64   CSR row pointers; the out-edges of node i are indptr[i]:indptr[i+1]
+    indices   int32   target node of each edge
+    weights   float32 edge length in metres (the shortest of any parallel edges)
+
+plus the grid_* arrays of the dead.spatial node index used for snapping points
+to nodes and, when built with ``--ch``, the ch_* arrays of a contraction
+hierarchy for fast queries (see dead.routing). The arrays are opened with ``mmap_mode='r'``, so loading is instant and every
+worker process shares the same pages through the OS page cache instead of
+holding its own copy of a networkx graph. Build stores ahead of time with
+``manage.py build_graph_store``. Every save gets a fresh ``build_id`` in its
+metadata, which data derived from a store (dead.isochrones) records and checks,
+and ``get_graph_store`` reopens a store whose meta.json has changed. DeadConfig.ready preloads the places in
+``settings.GRAPH_STORE_PLACES``. Regions too large to map whole are split into
+tiles that load per route; see dead.tiles.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from foodsaver import polyline
+from foodsaver.singleflight import SingleFlight
+
+from .distances import DistanceMatrix
+from .routing import ContractionHierarchy, bidirectional_astar, reverse_csr
+from .spatial import INDEX_ARRAYS, GridIndex
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+ARRAYS = ('node_ids', 'lat', 'lon', 'indptr', 'indices', 'weights')
+ROUTE_CACHE_SIZE = 1024
+MAX_ZOOM = 20
+
+_stores = {}  # (place, network_type) -> (meta.json mtime, store)
+_stores_lock = threading.Lock()
+build_flight = SingleFlight()
+
+
+class GraphStore:
+    """A read-only directed graph in CSR form with node coordinates"""
+
+    def __init__(self, node_ids, lat, lon, indptr, indices, weights, meta=None, index=None, ch=None):
+        self.node_ids = node_ids
+        self.lat = lat
+        self.lon = lon
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.meta = meta or {}
+        self.index = index if index is not None else GridIndex.build(lat, lon)
+        self.ch = ch
+        self.distances = DistanceMatrix(self)
+        self._reverse = None
+        self._routes = OrderedDict()  # (source node, target node) -> route dict
+        self._routes_lock = threading.Lock()
+
+    @property
+    def node_count(self):
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    @property
+    def build_id(self):
+        """Id of the saved build this store was loaded from, or None for one never saved"""
+        return self.meta.get('build_id')
+
+    @property
+    def reverse(self):
+        """(indptr, sources, weights) of the in-edges, built on first use"""
+        if self._reverse is None:
+            self._reverse = reverse_csr(self.indptr, self.indices, self.weights)
+        return self._reverse
+
+    @classmethod
+    def from_edges(cls, node_ids, lat, lon, src, dst, length, meta=None):
+        """Build from parallel edge arrays of node positions (not OSM ids)"""
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        length = np.asarray(length, dtype=np.float64)
+        keep = src != dst
+        src, dst, length = src[keep], dst[keep], length[keep]
+
+        # Sort by (src, dst, length) and keep the shortest of each parallel group
+        order = np.lexsort((length, dst, src))
+        src, dst, length = src[order], dst[order], length[order]
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        src, dst, length = src[first], dst[first], length[first]
+
+        n = len(node_ids)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(
+            np.asarray(node_ids, dtype=np.int64),
+            np.asarray(lat, dtype=np.float64),
+            np.asarray(lon, dtype=np.float64),
+            indptr,
+            dst.astype(np.int32),
+            length.astype(np.float32),
+            meta,
+        )
+
+    @classmethod
+    def from_networkx(cls, G, meta=None):
+        """Convert an osmnx MultiDiGraph (edge attribute ``length`` in metres)"""
+        node_ids = list(G.nodes)
+        position = {node: i for i, node in enumerate(node_ids)}
+        lat = [G.nodes[node]['y'] for node in node_ids]
+        lon = [G.nodes[node]['x'] for node in node_ids]
+        src, dst, length = [], [], []
+        for u, v, data in G.edges(data=True):
+            src.append(position[u])
+            dst.append(position[v])
+            length.append(data.get('length', 0.0))
+        return cls.from_edges(node_ids, lat, lon, src, dst, length, meta)
+
+    def save(self, path):
+        """Write the arrays and metadata to ``path``, replacing any previous store atomically"""
+        temp_path = f'{path}.tmp-{os.getpid()}'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for name in ARRAYS:
+            np.save(os.path.join(temp_path, f'{name}.npy'), getattr(self, name))
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(temp_path, f'{name}.npy'), getattr(self.index, name))
+        if self.ch is not None:
+            for name in ContractionHierarchy.ARRAYS:
+                np.save(os.path.join(temp_path, f'ch_{name}.npy'), getattr(self.ch, name))
+        meta = dict(self.meta, format=FORMAT_VERSION, build_id=uuid.uuid4().hex, nodes=self.node_count,
+                    edges=self.edge_count, index=self.index.meta, ch=self.ch is not None)
+        with open(os.path.join(temp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        old_path = f'{path}.old-{os.getpid()}'
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved store with memory-mapped arrays"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Graph store {path} has format {meta.get('format')}, expected {FORMAT_VERSION}")
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+        # Stores saved before the index existed get one built in memory (index=None)
+        index = None
+        if 'index' in meta:
+            index = GridIndex(meta=meta['index'], **{
+                name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in INDEX_ARRAYS
+            })
+        ch = None
+        if meta.get('ch'):
+            ch = ContractionHierarchy(**{
+                name: np.load(os.path.join(path, f'ch_{name}.npy'), mmap_mode='r')
+                for name in ContractionHierarchy.ARRAYS
+            })
+        return cls(meta=meta, index=index, ch=ch, **arrays)
+
+    def snap(self, lats, lons):
+        """Nearest node index and distance in metres for arrays of points, in one call"""
+        return self.index.nearest(lats, lons)
+
+    def nearest_node(self, lat, lon):
+        """Index of the node closest to (lat, lon)"""
+        nodes, _ = self.index.nearest(lat, lon)
+        return int(nodes[0])
+
+    def shortest_path(self, source, target):
+        """Shortest path between node indices as ``(path, metres)``, or None when unreachable.
+        Uses the contraction hierarchy when the store has one, bidirectional A* otherwise."""
+        if self.ch is not None:
+            return self.ch.query(source, target)
+        return bidirectional_astar(self, source, target)
+
+    def route(self, origin, destination):
+        """Shortest walk between two (lat, lon) points, in the shape generate_map expects.
+        Routes are cached by their snapped end nodes, along with their simplified geometries."""
+        nodes, _ = self.snap([origin[0], destination[0]], [origin[1], destination[1]])
+        key = (int(nodes[0]), int(nodes[1]))
+        with self._routes_lock:
+            if key in self._routes:
+                self._routes.move_to_end(key)
+                return self._routes[key]
+
+        found = self.shortest_path(*key)
+        route = None
+        if found is not None:
+            path, metres = found
+            route = {
+                'coords': [(float(self.lat[i]), float(self.lon[i])) for i in path],
+                'distance': metres,
+                'path': [int(self.node_ids[i]) for i in path],
+                'geometry': {},  # zoom -> simplified geometry, filled by route_geometry
+            }
+        with self._routes_lock:
+            self._routes[key] = route
+            while len(self._routes) > ROUTE_CACHE_SIZE:
+                self._routes.popitem(last=False)
+        return route
+
+
+def route_geometry(route, zoom=None):
+    """``route``'s coordinates simplified to about a pixel at ``zoom`` (all of them when
+    zoom is None) and their encoded polyline, computed once per route and zoom"""
+    if zoom is not None:
+        zoom = min(max(int(zoom), 0), MAX_ZOOM)
+    geometry = route['geometry'].get(zoom)
+    if geometry is None:
+        coords = route['coords']
+        if zoom is not None and coords:
+            coords = [tuple(point) for point in polyline.simplify(
+                coords, polyline.tolerance_for_zoom(zoom, coords[0][0])).tolist()]
+        geometry = route['geometry'][zoom] = {'coords': coords, 'polyline': polyline.encode(coords)}
+    return geometry
+
+
+def place_slug(place, network_type='walk'):
+    return re.sub(r'[^a-z0-9]+', '-', f'{place} {network_type}'.lower()).strip('-')
+
+
+def store_path(place, network_type='walk'):
+    return os.path.join(settings.GRAPH_STORE_DIR, place_slug(place, network_type))
+
+
+def build_graph_store(place, network_type='walk', contract=False):
+    """Download the OSM network for ``place`` with osmnx and save it as a store,
+    with a contraction hierarchy when ``contract`` is set"""
+    import osmnx as ox
+
+    started = time.perf_counter()
+    G = ox.graph_from_place(place, network_type=network_type)
+    store = GraphStore.from_networkx(G, meta={'place': place, 'network_type': network_type,
+                                              'built_at': time.time()})
+    if contract:
+        store.ch = ContractionHierarchy.build(store)
+    path = store_path(place, network_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    store.save(path)
+    logger.info(f"Built graph store for {place} ({store.node_count} nodes, {store.edge_count} edges) "
+                f"in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def load_graph_store(place, network_type='walk'):
+    """Load a saved store into the process cache. Returns it, or None when none is saved."""
+    path = store_path(place, network_type)
+    try:
+        mtime = os.stat(os.path.join(path, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    store = GraphStore.load(path)
+    with _stores_lock:
+        _stores[(place, network_type)] = (mtime, store)
+    return store
+
+
+def get_graph_store(place, network_type='walk'):
+    """The store for ``place``, reopened when it has been rebuilt since, or built the first time ever"""
+    cached = _stores.get((place, network_type))
+    try:
+        mtime = os.stat(os.path.join(store_path(place, network_type), 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    store = load_graph_store(place, network_type)
+    if store is None:
+        build_flight.do(f'build:{place}:{network_type}', build_graph_store, place, network_type)
+        store = load_graph_store(place, network_type)
+    return store
+
+
+def preload(places=None):
+    """Memory-map every configured store that has been built (called at startup)"""
+    for place in places if places is not None else settings.GRAPH_STORE_PLACES:
+        try:
+            if load_graph_store(place) is None:
+                logger.info(f"No graph store for {place} yet; run 'manage.py build_graph_store'")
+        except Exception as e:
+            logger.error(f"Error loading graph store for {place}: {e}")
@@ -0,0 +1,167 @@
+"""Precomputed isochrones: which sites can be walked to from each node, and how far.
+
+``IsochroneIndex.build`` runs one reverse Dijkstra sweep per site, out to
+``max_metres``, and inverts the results into a CSR index over graph nodes:
+
+    indptr   int64    the sites reachable from node i are at indptr[i]:indptr[i+1]
+    sites    int32    site position in meta['sites'], nearest first within a node
+    metres   float32  walking distance from the node to the site (incl. its snap leg)
+
+"Which sites are within X of here" is then a snap plus one slice, whatever the
+number of sites. The arrays are saved under the graph store's directory
+(``<store>/isochrones/<name>/``) and memory-mapped, so rebuilding the store also
+discards indexes that would no longer match it. Build with
+``manage.py build_isochrones``. An index covers one build of the graph store and
+one fixed list of sites: it records the store's ``build_id`` and a signature of
+the list, and ``covers`` tells callers when either has changed and the index
+must be rebuilt.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from . import graphstore
+from .routing import within
+
+logger = logging.getLogger(__name__)
+
+ARRAYS = ('indptr', 'sites', 'metres')
+DEFAULT_MAX_METRES = 20000  # LocationForm allows up to 20 km
+BAND_METRES = 1000
+
+_indexes = {}  # path -> (meta.json mtime, index)
+_indexes_lock = threading.Lock()
+
+
+def sites_signature(sites):
+    """Stable hash of a [(name, (lat, lon)), ...] site list"""
+    canonical = [[name, round(float(lat), 6), round(float(lon), 6)] for name, (lat, lon) in sites]
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()[:16]
+
+
+class IsochroneIndex:
+    def __init__(self, indptr, sites, metres, meta):
+        self.indptr = indptr
+        self.sites = sites
+        self.metres = metres
+        self.meta = meta
+
+    @property
+    def max_metres(self):
+        return self.meta['max_metres']
+
+    @property
+    def site_names(self):
+        return [site['name'] for site in self.meta['sites']]
+
+    @classmethod
+    def build(cls, store, sites, max_metres=DEFAULT_MAX_METRES):
+        """Index ``sites`` ([(name, (lat, lon)), ...]) on ``store`` out to ``max_metres``"""
+        started = time.perf_counter()
+        site_nodes, site_offsets = store.snap([lat for _, (lat, _) in sites], [lon for _, (_, lon) in sites])
+        node_parts, site_parts, metre_parts = [], [], []
+        for position, (node, offset) in enumerate(zip(site_nodes.tolist(), site_offsets.tolist())):
+            if offset > max_metres:
+                continue
+            nodes, metres = within(store, node, max_metres - offset, reverse=True)
+            node_parts.append(nodes)
+            site_parts.append(np.full(len(nodes), position, dtype=np.int32))
+            metre_parts.append(metres + offset)
+
+        nodes = np.concatenate(node_parts) if node_parts else np.zeros(0, dtype=np.int64)
+        site_ids = np.concatenate(site_parts) if site_parts else np.zeros(0, dtype=np.int32)
+        metres = np.concatenate(metre_parts) if metre_parts else np.zeros(0)
+        order = np.lexsort((metres, nodes))
+        indptr = np.zeros(store.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(nodes, minlength=store.node_count), out=indptr[1:])
+        meta = {
+            'sites': [{'name': name, 'lat': float(lat), 'lon': float(lon)} for name, (lat, lon) in sites],
+            'signature': sites_signature(sites),
+            'store_build_id': store.build_id,
+            'max_metres': float(max_metres),
+            'built_at': time.time(),
+        }
+        index = cls(indptr, site_ids[order], metres[order].astype(np.float32), meta)
+        logger.info(f"Built isochrone index for {len(sites)} sites ({len(nodes)} entries) "
+                    f"in {time.perf_counter() - started:.1f}s")
+        return index
+
+    def covers(self, store, sites, max_metres):
+        """Whether this index answers queries about ``sites`` on ``store`` up to ``max_metres``"""
+        return (self.meta.get('store_build_id') == store.build_id
+                and self.meta['signature'] == sites_signature(sites)
+                and max_metres <= self.max_metres)
+
+    def reachable(self, store, lat, lon, max_metres):
+        """[(site name, metres)] within ``max_metres`` of (lat, lon), nearest first"""
+        nodes, offsets = store.snap(lat, lon)
+        node, offset = int(nodes[0]), float(offsets[0])
+        start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+        metres = np.asarray(self.metres[start:end], dtype=np.float64) + offset
+        sites = np.asarray(self.sites[start:end])
+        keep = metres <= max_metres
+        names = self.meta['sites']
+        return [(names[site]['name'], float(m)) for site, m in zip(sites[keep].tolist(), metres[keep].tolist())]
+
+    def band_counts(self, store, lat, lon, band_metres=BAND_METRES):
+        """Number of sites first reachable in each band_metres step from (lat, lon), up to max_metres"""
+        reached = self.reachable(store, lat, lon, self.max_metres)
+        bands = int(np.ceil(self.max_metres / band_metres))
+        counts = np.bincount([min(int(m // band_metres), bands - 1) for _, m in reached], minlength=bands)
+        return counts.tolist()
+
+    def save(self, path):
+        temp_path = f'{path}.tmp-{os.getpid()}'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for name in ARRAYS:
+            np.save(os.path.join(temp_path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(temp_path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+        old_path = f'{path}.old-{os.getpid()}'
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return cls(meta=meta, **{name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS})
+
+
+def index_path(place, name, network_type='walk'):
+    return os.path.join(graphstore.store_path(place, network_type), 'isochrones', name)
+
+
+def build_index(place, name, sites, max_metres=DEFAULT_MAX_METRES, network_type='walk'):
+    """Build and save the index of ``sites`` for the place's graph store. Returns the index."""
+    store = graphstore.get_graph_store(place, network_type)
+    index = IsochroneIndex.build(store, sites, max_metres)
+    path = index_path(place, name, network_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    index.save(path)
+    return index
+
+
+def get_index(place, name, network_type='walk'):
+    """The saved index, reloaded when it has been rebuilt since, or None when there is none"""
+    path = index_path(place, name, network_type)
+    try:
+        mtime = os.stat(os.path.join(path, 'meta.json')).st_mtime
+    except OSError:
+        return None
+    cached = _indexes.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    index = IsochroneIndex.load(path)
+    with _indexes_lock:
+        _indexes[path] = (mtime, index)
+    return index
@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dead.graphstore import load_graph_store
+from dead.routing import ContractionHierarchy, bidirectional_astar, dijkstra
+
+
+class Command(BaseCommand):
+    help = ("Time shortest-path queries between random node pairs of a graph store: NetworkX "
+            "(the old per-request path), Dijkstra, bidirectional A* and the contraction hierarchy")
+
+    def add_arguments(self, parser):
+        parser.add_argument('place', nargs='?', help="Place to benchmark (default: first of settings.GRAPH_STORE_PLACES)")
+        parser.add_argument('--network-type', default='walk')
+        parser.add_argument('--pairs', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--build-ch', action='store_true',
+                            help="Contract the graph in memory when the store has no hierarchy")
+        parser.add_argument('--skip-networkx', action='store_true')
+
+    def handle(self, *args, **options):
+        place = options['place'] or settings.GRAPH_STORE_PLACES[0]
+        store = load_graph_store(place, options['network_type'])
+        if store is None:
+            raise CommandError(f"No graph store for {place}; run 'manage.py build_graph_store' first")
+        self.stdout.write(f"{place}: {store.node_count} nodes, {store.edge_count} edges, {options['pairs']} pairs")
+
+        if store.ch is None and options['build_ch']:
+            started = time.perf_counter()
+            store.ch = ContractionHierarchy.build(store)
+            self.stdout.write(f"Contracted in {time.perf_counter() - started:.1f}s "
+                              f"({store.ch.shortcut_count} shortcuts)")
+
+        rng = np.random.default_rng(options['seed'])
+        pairs = [(int(s), int(t)) for s, t in rng.integers(0, store.node_count, size=(options['pairs'], 2))]
+
+        engines = []
+        if not options['skip_networkx']:
+            engines.append(('networkx', self.networkx_engine(store)))
+        engines.append(('dijkstra', lambda s, t: dijkstra(store, s, t)))
+        engines.append(('bidirectional A*', lambda s, t: bidirectional_astar(store, s, t)))
+        if store.ch is not None:
+            # The first pass also reads the hierarchy rows it touches; the second is the steady state
+            engines.append(('CH (cold)', store.ch.query))
+            engines.append(('CH (warm)', store.ch.query))
+
+        reference = None
+        baseline = None
+        for name, engine in engines:
+            lengths, latencies = [], []
+            for source, target in pairs:
+                started = time.perf_counter()
+                found = engine(source, target)
+                latencies.append(time.perf_counter() - started)
+                lengths.append(found[1] if found is not None else np.inf)
+            lengths = np.array(lengths)
+            latencies = np.array(latencies) * 1000
+
+            mean = latencies.mean()
+            baseline = baseline or mean
+            line = (f"  {name:<17} mean {mean:8.2f} ms, p50 {np.percentile(latencies, 50):8.2f} ms, "
+                    f"p95 {np.percentile(latencies, 95):8.2f} ms, {baseline / mean:6.1f}x")
+            if reference is None:
+                reference = lengths
+            else:
+                finite = np.isfinite(reference)
+                mismatched = int((np.isfinite(lengths) != finite).sum()
+                                 + (np.abs(lengths[finite] - reference[finite]) > 1e-3 * np.maximum(reference[finite], 1)).sum())
+                line += f", {mismatched} mismatched lengths"
+            self.stdout.write(line)
+
+    def networkx_engine(self, store):
+        """What get_route did before the graph store: shortest_path, then shortest_path_length"""
+        import networkx as nx
+
+        G = nx.DiGraph()
+        G.add_nodes_from(range(store.node_count))
+        sources = np.repeat(np.arange(store.node_count), np.diff(store.indptr))
+        G.add_weighted_edges_from(zip(sources.tolist(), np.asarray(store.indices).tolist(),
+                                      np.asarray(store.weights).tolist()), weight='length')
+
+        def route(source, target):
+            try:
+                path = nx.shortest_path(G, source, target, weight='length')
+                return path, nx.shortest_path_length(G, source, target, weight='length')
+            except nx.NetworkXNoPath:
+                return None
+
+        return route
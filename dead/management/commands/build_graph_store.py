@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dead.graphstore import GraphStore, build_graph_store
+
+
+class Command(BaseCommand):
+    help = "Download street networks with osmnx and save them as memory-mappable graph stores"
+
+    def add_arguments(self, parser):
+        parser.add_argument('places', nargs='*', help="Places to build (default: settings.GRAPH_STORE_PLACES)")
+        parser.add_argument('--network-type', default='walk')
+        parser.add_argument('--ch', action='store_true',
+                            help="Also build a contraction hierarchy for faster queries (slow to build)")
+
+    def handle(self, *args, **options):
+        for place in options['places'] or settings.GRAPH_STORE_PLACES:
+            path = build_graph_store(place, options['network_type'], contract=options['ch'])
+            store = GraphStore.load(path)
+            self.stdout.write(self.style.SUCCESS(
+                f"{place}: {store.node_count} nodes, {store.edge_count} edges"
+                f"{f', {store.ch.shortcut_count} shortcuts' if store.ch is not None else ''} -> {path}"))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dead.tiles import TILE_DEGREES, TiledGraphStore, build_region
+
+
+class Command(BaseCommand):
+    help = "Download regional street networks with osmnx and save them as tiled graph stores"
+
+    def add_arguments(self, parser):
+        parser.add_argument('regions', nargs='*', help="Regions to build (default: every key of settings.GRAPH_REGIONS)")
+        parser.add_argument('--tile-degrees', type=float, default=TILE_DEGREES)
+
+    def handle(self, *args, **options):
+        for region in options['regions'] or settings.GRAPH_REGIONS:
+            path = build_region(region, options['tile_degrees'])
+            tiled = TiledGraphStore.load(path)
+            self.stdout.write(self.style.SUCCESS(
+                f"{region}: {tiled.meta['nodes']} nodes, {tiled.meta['edges']} edges "
+                f"in {len(tiled.tile_ids)} tiles -> {path}"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from dead.isochrones import DEFAULT_MAX_METRES, build_index, index_path
+from dead.views import FOOD_BANK_ISOCHRONES, MAP_PLACE, food_bank_sites
+
+
+class Command(BaseCommand):
+    help = "Precompute which food banks are within walking reach of every node of the map's graph store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-km', type=float, default=DEFAULT_MAX_METRES / 1000,
+                            help="Furthest walking distance the index answers for")
+
+    def handle(self, *args, **options):
+        sites = [(bank['name'], bank['coords']) for bank in food_bank_sites()]
+        index = build_index(MAP_PLACE, FOOD_BANK_ISOCHRONES, sites, options['max_km'] * 1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(sites)} food banks, {len(index.metres)} reachable (node, bank) pairs within "
+            f"{options['max_km']:g} km -> {index_path(MAP_PLACE, FOOD_BANK_ISOCHRONES)}"))
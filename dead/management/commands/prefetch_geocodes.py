@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from dead import geocoding
+
+
+class Command(BaseCommand):
+    help = "Geocode every known address into the GeocodeResult cache (food banks and, optionally, donations)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donations', action='store_true', help="Also geocode FoodDonation locations")
+        parser.add_argument('--file', help="Also geocode the addresses in this file, one per line")
+        parser.add_argument('--force', action='store_true', help="Refresh addresses that are still fresh")
+
+    def handle(self, *args, **options):
+        from dead.views import load_sample_food_banks
+
+        addresses = list(load_sample_food_banks()['address'])
+        if options['donations']:
+            from donation.models import FoodDonation
+
+            addresses += FoodDonation.objects.values_list('location', flat=True).distinct()
+        if options['file']:
+            with open(options['file']) as f:
+                addresses += [line.strip() for line in f if line.strip()]
+
+        addresses = list(dict.fromkeys(addresses))
+        results = geocoding.geocode_many(addresses, force=options['force'])
+        found = sum(1 for coords in results.values() if coords is not None)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(addresses)} addresses: {found} geocoded, {len(addresses) - found} not found or unavailable "
+            f"(backend: {geocoding.get_backend().name})"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dead.forecast import refresh_forecasts
+
+
+class Command(BaseCommand):
+    help = "Recompute consumption forecasts for every food item (run nightly)"
+
+    def handle(self, *args, **options):
+        count = refresh_forecasts()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} consumption forecasts"))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("user", "0008_monthlyconsumption"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConsumptionForecast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("forecast_consumption", models.FloatField()),
+                ("waste_ratio", models.FloatField(default=0)),
+                ("recommended_quantity", models.PositiveIntegerField(default=0)),
+                ("method", models.CharField(max_length=20)),
+                ("months_of_history", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "food_item",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="forecast",
+                        to="user.fooditem",
+                    ),
+                ),
+            ],
+        ),
+    ]
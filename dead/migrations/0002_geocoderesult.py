@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dead", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeocodeResult",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("address_key", models.CharField(max_length=255, unique=True)),
+                ("address", models.CharField(max_length=255)),
+                ("lat", models.FloatField(blank=True, null=True)),
+                ("lon", models.FloatField(blank=True, null=True)),
+                ("provider", models.CharField(max_length=20)),
+                ("fetched_at", models.DateTimeField()),
+            ],
+        ),
+    ]
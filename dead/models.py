@@ -1,3 +1,33 @@
 from django.db import models
 
 # Create your models here.
+from user.models import FoodItem
+
+
+class ConsumptionForecast(models.Model):
+    """Precomputed next-month consumption forecast per food item, written by dead.forecast"""
+    food_item = models.OneToOneField(FoodItem, on_delete=models.CASCADE, related_name='forecast')
+    forecast_consumption = models.FloatField()  # Expected net consumption (bought - wasted) next month
+    waste_ratio = models.FloatField(default=0)  # Share of purchases wasted over recent months
+    recommended_quantity = models.PositiveIntegerField(default=0)
+    method = models.CharField(max_length=20)  # 'holt' or 'holt+seasonal'
+    months_of_history = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.food_item_id}: buy {self.recommended_quantity} ({self.method})"
+
+
+class GeocodeResult(models.Model):
+    """Cached geocoder answer for one normalized address, kept by dead.geocoding"""
+    address_key = models.CharField(max_length=255, unique=True)  # normalize_address() of the query
+    address = models.CharField(max_length=255)  # As first queried
+    lat = models.FloatField(null=True, blank=True)  # Null when the geocoder found nothing
+    lon = models.FloatField(null=True, blank=True)
+    provider = models.CharField(max_length=20)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        if self.lat is None:
+            return f"{self.address}: not found"
+        return f"{self.address}: {self.lat:.5f}, {self.lon:.5f}"
@@ -0,0 +1,405 @@
+"""Shortest-path searches over a GraphStore's CSR arrays.
+
+``bidirectional_astar`` needs no preprocessing. It searches forward from the
+source and backward from the target at once, both guided by the average
+potential p(v) = (h_t(v) - h_s(v)) / 2, where h_x is the straight-line distance
+to x. Using the same potential (negated) in both directions keeps them
+consistent, so the search can stop as soon as the two frontiers' smallest keys
+add up to the best path found so far.
+
+``ContractionHierarchy`` is an optional preprocessing step. Nodes are contracted
+one by one in order of importance, adding shortcut edges that preserve shortest
+distances among the remaining nodes. A query then only climbs the hierarchy
+from both ends and settles a few hundred nodes instead of a large share of the
+city. Shortcuts remember the node they bypass, so paths
+unpack back to original edges. The arrays are saved with the graph store (see
+``manage.py build_graph_store --ch``).
+"""
+import heapq
+import logging
+import math
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The heuristic uses the store's equirectangular projection, which can stretch
+# distances by a fraction of a percent across a region. Scaling it down keeps it
+# below every real edge length, so the search stays exact.
+HEURISTIC_SCALE = 0.99
+WITNESS_SETTLE_LIMIT = 60
+
+
+def reverse_csr(indptr, indices, weights):
+    """CSR of the reversed graph: the in-edges of node i are rindptr[i]:rindptr[i+1]"""
+    n = len(indptr) - 1
+    sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    rindptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n), out=rindptr[1:])
+    return rindptr, sources[order], np.asarray(weights)[order]
+
+
+def dijkstra(store, source, target):
+    """Plain one-directional Dijkstra. Returns ``(path, metres)`` or None."""
+    indptr, indices, weights = _arrays(store.indptr, store.indices, store.weights)
+    dist = {source: 0.0}
+    parent = {source: -1}
+    done = set()
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        if node == target:
+            break
+        done.add(node)
+        start, end = indptr[node], indptr[node + 1]
+        for neighbour, weight in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            candidate = d + weight
+            if candidate < dist.get(neighbour, math.inf):
+                dist[neighbour] = candidate
+                parent[neighbour] = node
+                heapq.heappush(heap, (candidate, neighbour))
+    if target not in dist:
+        return None
+    return _walk_back(parent, target)[::-1], dist[target]
+
+
+def one_to_many(store, source, targets, cutoff=math.inf):
+    """Dijkstra sweep from ``source`` that stops once every node in ``targets`` is
+    settled or the frontier passes ``cutoff`` metres. Returns {target: metres} for
+    the targets reached."""
+    indptr, indices, weights = _arrays(store.indptr, store.indices, store.weights)
+    remaining = set(targets)
+    found = {}
+    dist = {source: 0.0}
+    done = set()
+    heap = [(0.0, source)]
+    while heap and remaining:
+        d, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        if d > cutoff:
+            break
+        done.add(node)
+        if node in remaining:
+            remaining.discard(node)
+            found[node] = d
+        start, end = indptr[node], indptr[node + 1]
+        for neighbour, weight in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            candidate = d + weight
+            if candidate < dist.get(neighbour, math.inf):
+                dist[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+    return found
+
+
+def within(store, source, cutoff, reverse=False):
+    """Every node within ``cutoff`` metres of ``source`` as (nodes, metres) arrays.
+    With ``reverse`` the distances are from each node to ``source`` instead."""
+    indptr, indices, weights = _arrays(*store.reverse) if reverse else \
+        _arrays(store.indptr, store.indices, store.weights)
+    dist = {source: 0.0}
+    done = {}
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        if d > cutoff:
+            break
+        done[node] = d
+        start, end = indptr[node], indptr[node + 1]
+        for neighbour, weight in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            candidate = d + weight
+            if candidate < dist.get(neighbour, math.inf):
+                dist[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+    return np.fromiter(done.keys(), dtype=np.int64, count=len(done)), \
+        np.fromiter(done.values(), dtype=np.float64, count=len(done))
+
+
+def bidirectional_astar(store, source, target):
+    """Bidirectional A* with average potentials. Returns ``(path, metres)`` or None."""
+    if source == target:
+        return [source], 0.0
+    x, y = _arrays(store.index.grid_x, store.index.grid_y)
+    sx, sy = float(x[source]), float(y[source])
+    tx, ty = float(x[target]), float(y[target])
+    potentials = {}
+
+    def potential(node):
+        p = potentials.get(node)
+        if p is None:
+            nx, ny = float(x[node]), float(y[node])
+            p = potentials[node] = HEURISTIC_SCALE * 0.5 * (math.hypot(tx - nx, ty - ny) - math.hypot(sx - nx, sy - ny))
+        return p
+
+    graphs = (_arrays(store.indptr, store.indices, store.weights), _arrays(*store.reverse))
+    dist = ({source: 0.0}, {target: 0.0})
+    parent = ({source: -1}, {target: -1})
+    done = (set(), set())
+    heaps = ([(potential(source), source)], [(-potential(target), target)])
+    sign = (1.0, -1.0)
+    best, meeting = math.inf, -1
+    while heaps[0] and heaps[1]:
+        # Forward keys are d_f + p, backward keys d_b - p, so a path through an
+        # unsettled node costs at least the sum of the two smallest keys
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        _, node = heapq.heappop(heaps[side])
+        if node in done[side]:
+            continue
+        done[side].add(node)
+
+        d = dist[side][node]
+        indptr, indices, weights = graphs[side]
+        seen, other = dist[side], dist[1 - side]
+        start, end = indptr[node], indptr[node + 1]
+        for neighbour, weight in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            candidate = d + weight
+            if candidate < seen.get(neighbour, math.inf):
+                seen[neighbour] = candidate
+                parent[side][neighbour] = node
+                heapq.heappush(heaps[side], (candidate + sign[side] * potential(neighbour), neighbour))
+                if neighbour in other and candidate + other[neighbour] < best:
+                    best, meeting = candidate + other[neighbour], neighbour
+    if meeting < 0:
+        return None
+    path = _walk_back(parent[0], meeting)[::-1] + _walk_back(parent[1], meeting)[1:]
+    return path, best
+
+
+def _arrays(*arrays):
+    """Plain ndarray views: slicing a np.memmap goes through a slow Python-level __getitem__"""
+    return tuple(np.asarray(array) for array in arrays)
+
+
+def _walk_back(parent, node):
+    path = [node]
+    while parent[path[-1]] != -1:
+        path.append(parent[path[-1]])
+    return path
+
+
+class ContractionHierarchy:
+    """Upward and downward shortcut graphs of a contracted GraphStore.
+
+    ``up_*`` is a CSR over edges u -> v with rank[v] > rank[u], indexed by u;
+    ``down_*`` is a CSR over edges u -> v with rank[u] > rank[v], indexed by v.
+    ``*_middle`` is the node a shortcut bypasses, or -1 for an original edge.
+    """
+
+    ARRAYS = ('rank', 'up_indptr', 'up_indices', 'up_weights', 'up_middle',
+              'down_indptr', 'down_indices', 'down_weights', 'down_middle')
+
+    def __init__(self, rank, up_indptr, up_indices, up_weights, up_middle,
+                 down_indptr, down_indices, down_weights, down_middle):
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_indices = up_indices
+        self.up_weights = up_weights
+        self.up_middle = up_middle
+        self.down_indptr = down_indptr
+        self.down_indices = down_indices
+        self.down_weights = down_weights
+        self.down_middle = down_middle
+        # Rows already read as lists of (neighbour, weight, middle); the top of the
+        # hierarchy is in nearly every query, so its rows are only converted once
+        self._rows = ({}, {})
+
+    @property
+    def shortcut_count(self):
+        return int((np.asarray(self.up_middle) >= 0).sum() + (np.asarray(self.down_middle) >= 0).sum())
+
+    @classmethod
+    def build(cls, store, witness_settle_limit=WITNESS_SETTLE_LIMIT):
+        """Contract every node of ``store``. Takes a while; run it offline."""
+        started = time.perf_counter()
+        n = store.node_count
+        out = [{} for _ in range(n)]  # out[u][v] = (length, middle)
+        inn = [{} for _ in range(n)]  # inn[v][u] = (length, middle)
+        indptr, indices, weights = np.asarray(store.indptr), np.asarray(store.indices), np.asarray(store.weights)
+        sources = np.repeat(np.arange(n), np.diff(indptr))
+        for u, v, length in zip(sources.tolist(), indices.tolist(), weights.tolist()):
+            out[u][v] = (length, -1)
+            inn[v][u] = (length, -1)
+
+        def witness_distances(u, skip, targets, limit):
+            """Tentative distances from u avoiding ``skip``, searched up to ``limit`` metres"""
+            dist = {u: 0.0}
+            heap = [(0.0, u)]
+            remaining = set(targets)
+            settled = 0
+            while heap and remaining and settled < witness_settle_limit:
+                d, node = heapq.heappop(heap)
+                if d > dist[node]:
+                    continue
+                if d > limit:
+                    break
+                remaining.discard(node)
+                settled += 1
+                for neighbour, (length, _) in out[node].items():
+                    if neighbour != skip and d + length < dist.get(neighbour, math.inf):
+                        dist[neighbour] = d + length
+                        heapq.heappush(heap, (d + length, neighbour))
+            return dist
+
+        def shortcuts(v):
+            """Shortcuts needed to contract v: (u, w, length) with no witness path u -> w"""
+            needed = []
+            for u, (to_v, _) in inn[v].items():
+                targets = {w: to_v + length for w, (length, _) in out[v].items() if w != u}
+                if not targets:
+                    continue
+                dist = witness_distances(u, v, targets, max(targets.values()))
+                needed.extend((u, w, length) for w, length in targets.items() if dist.get(w, math.inf) > length)
+            return needed
+
+        deleted = [0] * n  # contracted neighbours, which spreads contraction evenly
+
+        def priority(v):
+            return len(shortcuts(v)) - len(inn[v]) - len(out[v]) + deleted[v]
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        rank = np.full(n, -1, dtype=np.int32)
+        up, down = [None] * n, [None] * n
+        next_rank = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if rank[v] >= 0:
+                continue
+            # Lazy update: re-queue v if its priority went stale and it is no longer the minimum
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+
+            for u, w, length in shortcuts(v):
+                if length < out[u].get(w, (math.inf,))[0]:
+                    out[u][w] = (length, v)
+                    inn[w][u] = (length, v)
+            up[v] = list(out[v].items())
+            down[v] = list(inn[v].items())
+            for w in out[v]:
+                del inn[w][v]
+                deleted[w] += 1
+            for u in inn[v]:
+                del out[u][v]
+                deleted[u] += 1
+            out[v], inn[v] = None, None
+            rank[v] = next_rank
+            next_rank += 1
+            if next_rank % 10000 == 0:
+                logger.info(f"Contracted {next_rank}/{n} nodes in {time.perf_counter() - started:.0f}s")
+
+        ch = cls(rank, *_edge_csr(up), *_edge_csr(down))
+        logger.info(f"Built contraction hierarchy for {n} nodes with {ch.shortcut_count} shortcuts "
+                    f"in {time.perf_counter() - started:.1f}s")
+        return ch
+
+    def query(self, source, target):
+        """Shortest path between node indices. Returns ``(path, metres)`` or None."""
+        if source == target:
+            return [source], 0.0
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({source: None}, {target: None})  # node -> (previous node, middle)
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best, meeting = math.inf, -1
+        side = 1
+        while heaps[0] or heaps[1]:
+            side = 1 - side if heaps[1 - side] else side
+            heap, seen, other = heaps[side], dist[side], dist[1 - side]
+            d, node = heapq.heappop(heap)
+            if d >= best:
+                # Everything left on this side is at least as long; only the other side can still help
+                heap.clear()
+                continue
+            if d > seen[node]:
+                continue
+            if node in other and d + other[node] < best:
+                best, meeting = d + other[node], node
+
+            # The forward search climbs up edges and the backward search down edges.
+            # Stall-on-demand: if a higher node already reaches this one more cheaply,
+            # d is not its true distance and nothing past it is on a shortest path.
+            stalled = False
+            for neighbour, weight, _ in self._row(1 - side, node):
+                if seen.get(neighbour, math.inf) + weight < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+            parents = parent[side]
+            for neighbour, weight, via in self._row(side, node):
+                candidate = d + weight
+                if candidate < seen.get(neighbour, math.inf):
+                    seen[neighbour] = candidate
+                    parents[neighbour] = (node, via)
+                    heapq.heappush(heap, (candidate, neighbour))
+        if meeting < 0:
+            return None
+
+        path = [meeting]
+        node = meeting
+        while parent[0][node] is not None:
+            previous, via = parent[0][node]
+            path.extend(reversed(self._unpack(previous, node, via)[:-1]))
+            node = previous
+        path.reverse()
+        node = meeting
+        while parent[1][node] is not None:
+            following, via = parent[1][node]
+            path.extend(self._unpack(node, following, via)[1:])
+            node = following
+        return path, best
+
+    def _row(self, direction, node):
+        """Up (direction 0) or down (1) edges of ``node`` as a list of tuples"""
+        row = self._rows[direction].get(node)
+        if row is None:
+            if direction == 0:
+                arrays = (self.up_indptr, self.up_indices, self.up_weights, self.up_middle)
+            else:
+                arrays = (self.down_indptr, self.down_indices, self.down_weights, self.down_middle)
+            indptr, indices, weights, middle = _arrays(*arrays)
+            start, end = indptr[node], indptr[node + 1]
+            row = self._rows[direction][node] = list(zip(
+                indices[start:end].tolist(), weights[start:end].tolist(), middle[start:end].tolist()))
+        return row
+
+    def _unpack(self, u, w, middle):
+        """Original-edge node sequence u .. w for the (possibly shortcut) edge u -> w"""
+        path = [u]
+        stack = [(u, w, middle)]
+        while stack:
+            a, b, via = stack.pop()
+            if via < 0:
+                path.append(b)
+                continue
+            # via was contracted before a and b: a -> via is one of its down edges, via -> b one of its up edges
+            stack.append((via, b, self._middle(0, via, b)))
+            stack.append((a, via, self._middle(1, via, a)))
+        return path
+
+    def _middle(self, direction, row, column):
+        for neighbour, _, via in self._row(direction, row):
+            if neighbour == column:
+                return via
+        raise KeyError((row, column))
+
+
+def _edge_csr(edges):
+    """Pack per-node lists of (neighbour, (length, middle)) into CSR arrays"""
+    counts = np.array([len(row) for row in edges], dtype=np.int64)
+    indptr = np.zeros(len(edges) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    flat = [edge for row in edges for edge in row]
+    indices = np.array([neighbour for neighbour, _ in flat], dtype=np.int32)
+    weights = np.array([length for _, (length, _) in flat], dtype=np.float64)
+    middle = np.array([via for _, (_, via) in flat], dtype=np.int32)
+    return indptr, indices, weights, middle
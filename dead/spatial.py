@@ -0,0 +1,146 @@
+"""Uniform-grid spatial index for snapping coordinates to graph nodes.
+
+Node coordinates are projected to metres (equirectangular around the graph's
+centre, accurate to well under a metre at city scale) and bucketed into square
+cells sized for a handful of nodes each. The nodes are stored sorted by cell
+with a CSR-style pointer per cell, so the index is a few flat arrays that are
+saved and memory-mapped with the graph (see dead.graphstore).
+
+Queries are vectorized over any number of points. Each round looks at the
+(2r+1)^2 block of cells around every unresolved point and keeps the nearest
+candidate. A point is resolved once that candidate is closer than any node
+outside the block could be; otherwise r doubles for the next round.
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+NODES_PER_CELL = 4
+INDEX_ARRAYS = ('grid_x', 'grid_y', 'grid_order', 'grid_start')
+MAX_CANDIDATE_CELLS = 1_000_000  # cells examined per vectorized step, bounding memory
+
+
+class GridIndex:
+    def __init__(self, grid_x, grid_y, grid_order, grid_start, meta):
+        self.grid_x = grid_x  # projected node coordinates in metres, by node index
+        self.grid_y = grid_y
+        self.grid_order = grid_order  # node indices sorted by cell
+        self.grid_start = grid_start  # nodes of cell c are grid_order[grid_start[c]:grid_start[c + 1]]
+        self.lat0 = meta['lat0']
+        self.lon0 = meta['lon0']
+        self.cell = meta['cell']
+        self.xmin = meta['xmin']
+        self.ymin = meta['ymin']
+        self.nx = meta['nx']
+        self.ny = meta['ny']
+
+    @property
+    def meta(self):
+        return {'lat0': self.lat0, 'lon0': self.lon0, 'cell': self.cell, 'xmin': self.xmin,
+                'ymin': self.ymin, 'nx': self.nx, 'ny': self.ny}
+
+    @classmethod
+    def build(cls, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        lat0 = float(lat.mean()) if len(lat) else 0.0
+        lon0 = float(lon.mean()) if len(lon) else 0.0
+        x, y = _project(lat, lon, lat0, lon0)
+
+        xmin, ymin = (float(x.min()), float(y.min())) if len(x) else (0.0, 0.0)
+        width = float(x.max()) - xmin if len(x) else 0.0
+        height = float(y.max()) - ymin if len(y) else 0.0
+        # A 1 m floor on each side keeps nodes along a single straight street from
+        # producing a zero-height grid of tiny cells
+        area = max(width, 1.0) * max(height, 1.0)
+        cell = max(np.sqrt(area * NODES_PER_CELL / max(len(x), 1)), 1.0)
+        nx = int(width // cell) + 1
+        ny = int(height // cell) + 1
+
+        cells = ((y - ymin) // cell).astype(np.int64) * nx + ((x - xmin) // cell).astype(np.int64)
+        order = np.argsort(cells, kind='stable').astype(np.int32)
+        start = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=nx * ny), out=start[1:])
+        meta = {'lat0': lat0, 'lon0': lon0, 'cell': cell, 'xmin': xmin, 'ymin': ymin, 'nx': nx, 'ny': ny}
+        return cls(x, y, order, start, meta)
+
+    def nearest(self, lat, lon):
+        """Nearest node index and distance in metres for arrays of points"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        px, py = _project(lat, lon, self.lat0, self.lon0)
+
+        gx = (px - self.xmin) / self.cell
+        gy = (py - self.ymin) / self.cell
+        cx = np.clip(np.floor(gx), 0, self.nx - 1).astype(np.int64)
+        cy = np.clip(np.floor(gy), 0, self.ny - 1).astype(np.int64)
+
+        best = np.full(len(px), -1, dtype=np.int64)
+        best_d = np.full(len(px), np.inf)
+        pending = np.arange(len(px))
+        r = 1
+        while len(pending):
+            step = max(MAX_CANDIDATE_CELLS // self._block_cells(r), 1)
+            for chunk_start in range(0, len(pending), step):
+                chunk = pending[chunk_start:chunk_start + step]
+                node, dist, point = self._candidates(chunk, cx, cy, px, py, r)
+                if not len(point):
+                    continue
+                # Nearest candidate per point: sort by (point, distance), take the first of each run
+                order = np.lexsort((dist, point))
+                point, node, dist = point[order], node[order], dist[order]
+                first = np.ones(len(point), dtype=bool)
+                first[1:] = point[1:] != point[:-1]
+                improve = dist[first] < best_d[point[first]]
+                best[point[first][improve]] = node[first][improve]
+                best_d[point[first][improve]] = dist[first][improve]
+
+            resolved = best_d[pending] <= self._searched_radius(pending, cx, cy, gx, gy, r)
+            pending = pending[~resolved]
+            r *= 2
+        return best, best_d
+
+    def _searched_radius(self, points, cx, cy, gx, gy, r):
+        """Lower bound on the distance from each point to any node outside its searched block.
+
+        Past each side of the block that lies inside the grid, a node is at least that
+        side's distance away along one axis, and at least the point's distance from
+        the grid along the other. Sides on the grid boundary have no nodes beyond them.
+        """
+        cx, cy, gx, gy = cx[points], cy[points], gx[points], gy[points]
+        out_x = np.maximum(np.maximum(-gx, gx - self.nx), 0)
+        out_y = np.maximum(np.maximum(-gy, gy - self.ny), 0)
+        inf = np.inf
+        left = np.where(cx - r <= 0, inf, np.hypot(gx - (cx - r), out_y))
+        right = np.where(cx + r + 1 >= self.nx, inf, np.hypot((cx + r + 1) - gx, out_y))
+        below = np.where(cy - r <= 0, inf, np.hypot(gy - (cy - r), out_x))
+        above = np.where(cy + r + 1 >= self.ny, inf, np.hypot((cy + r + 1) - gy, out_x))
+        return np.minimum(np.minimum(left, right), np.minimum(below, above)) * self.cell
+
+    def _block_cells(self, r):
+        return (2 * min(r, self.nx - 1) + 1) * (2 * min(r, self.ny - 1) + 1)
+
+    def _candidates(self, points, cx, cy, px, py, r):
+        # Offsets past the grid's extent never land on a cell, so don't enumerate them
+        rx, ry = min(r, self.nx - 1), min(r, self.ny - 1)
+        dx, dy = np.meshgrid(np.arange(-rx, rx + 1), np.arange(-ry, ry + 1))
+        ccx = cx[points][:, None] + dx.ravel()[None, :]
+        ccy = cy[points][:, None] + dy.ravel()[None, :]
+        valid = (ccx >= 0) & (ccx < self.nx) & (ccy >= 0) & (ccy < self.ny)
+        cell_ids = np.where(valid, ccy * self.nx + ccx, 0)
+        starts = np.where(valid, self.grid_start[cell_ids], 0)
+        counts = np.where(valid, self.grid_start[cell_ids + 1] - starts, 0).ravel()
+        starts = starts.ravel()
+
+        total = int(counts.sum())
+        point = np.repeat(np.repeat(points, dx.size), counts)
+        # Position within each cell's run: 0..count-1, laid out back to back
+        run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        node = np.asarray(self.grid_order)[np.repeat(starts, counts) + run_offsets].astype(np.int64)
+        dist = np.hypot(np.asarray(self.grid_x)[node] - px[point], np.asarray(self.grid_y)[node] - py[point])
+        return node, dist, point
+
+
+def _project(lat, lon, lat0, lon0):
+    x = np.radians(lon - lon0) * np.cos(np.radians(lat0)) * EARTH_RADIUS_M
+    y = np.radians(lat - lat0) * EARTH_RADIUS_M
+    return x, y
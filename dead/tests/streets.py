@@ -0,0 +1,36 @@
+"""Synthetic street networks for the routing, isochrone and tile tests"""
+import math
+
+import networkx as nx
+import numpy as np
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371009 * math.asin(math.sqrt(h))
+
+
+def street_grid(n, seed):
+    """Jittered n x n street grid with some one-way streets, diagonals and missing
+    nodes. Edges are at least as long as the straight line, as on a real map."""
+    rng = np.random.default_rng(seed)
+    G = nx.MultiDiGraph()
+    for i in range(n):
+        for j in range(n):
+            G.add_node(1000 + i * n + j, y=40.7 + i * 1e-3 + rng.normal() * 1e-5,
+                       x=-74.0 + j * 1.3e-3 + rng.normal() * 1e-5)
+    for i in range(n):
+        for j in range(n):
+            u = 1000 + i * n + j
+            if rng.random() < 0.03:
+                continue
+            for di, dj in ((0, 1), (1, 0), (1, 1)):
+                if i + di < n and j + dj < n and (di + dj < 2 or rng.random() < 0.05):
+                    v = 1000 + (i + di) * n + j + dj
+                    a, b = G.nodes[u], G.nodes[v]
+                    length = haversine(a['y'], a['x'], b['y'], b['x']) * rng.uniform(1.0, 1.3)
+                    G.add_edge(u, v, length=length)
+                    if rng.random() < 0.95:
+                        G.add_edge(v, u, length=length)
+    return G
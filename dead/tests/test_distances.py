@@ -0,0 +1,126 @@
+import math
+import random
+from datetime import date, timedelta
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase
+
+from dead import geocoding, views
+from dead.graphstore import GraphStore
+from dead.routing import dijkstra
+from donation.models import FoodDonation
+
+from .streets import street_grid
+
+
+class DistanceMatrixTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.store = GraphStore.from_networkx(street_grid(20, seed=5))
+
+    def setUp(self):
+        self.store.distances.clear()
+
+    def expected(self, origin, destination, cutoff=math.inf):
+        """Snap both ends by brute force, then one plain Dijkstra query"""
+        (source, target), offsets = self.store.snap([origin[0], destination[0]], [origin[1], destination[1]])
+        found = dijkstra(self.store, int(source), int(target))
+        metres = found[1] + offsets.sum() if found is not None else math.inf
+        return metres if metres <= cutoff else math.inf
+
+    def points(self, rng, count):
+        return [(rng.uniform(40.699, 40.72), rng.uniform(-74.001, -73.975)) for _ in range(count)]
+
+    def test_matches_dijkstra(self):
+        rng = random.Random(11)
+        origins, destinations = self.points(rng, 6), self.points(rng, 15)
+        for cutoff in (math.inf, 1500):
+            matrix = self.store.distances.compute(origins, destinations, cutoff=cutoff)
+            self.assertEqual(matrix.shape, (6, 15))
+            for i, origin in enumerate(origins):
+                for j, destination in enumerate(destinations):
+                    with self.subTest(cutoff=cutoff, origin=i, destination=j):
+                        expected = self.expected(origin, destination, cutoff)
+                        if expected == math.inf:
+                            self.assertEqual(matrix[i, j], math.inf)
+                        else:
+                            self.assertAlmostEqual(matrix[i, j], expected, delta=expected * 1e-5 + 0.01)
+        self.assertEqual(self.store.distances.compute([], destinations).shape, (0, 15))
+
+    def test_sweeps_are_reused(self):
+        rng = random.Random(12)
+        origin, destinations = self.points(rng, 1), self.points(rng, 8)
+        distances = self.store.distances
+        hits, misses = distances.hits, distances.misses
+        first = distances.compute(origin, destinations, cutoff=2000)
+        self.assertEqual((distances.hits - hits, distances.misses - misses), (0, 1))
+        # Same corner, fewer destinations and a shorter cutoff: answered from the cached sweep
+        second = distances.compute(origin, destinations[:4], cutoff=1000)
+        self.assertEqual((distances.hits - hits, distances.misses - misses), (1, 1))
+        np.testing.assert_array_equal(second[0], np.where(first[0, :4] > 1000, np.inf, first[0, :4]))
+        # A longer cutoff needs a new, wider sweep
+        distances.compute(origin, destinations, cutoff=5000)
+        self.assertEqual(distances.misses - misses, 2)
+
+class FakeGeocoder:
+    name = 'fake'
+
+    def __init__(self, places):
+        self.places = places
+
+    def geocode(self, address):
+        return self.places.get(address)
+
+
+class GenerateMapTests(TransactionTestCase):
+    def setUp(self):
+        self.store = GraphStore.from_networkx(street_grid(20, seed=5))
+        lat, lon = self.store.lat, self.store.lon
+        banks = views.load_sample_food_banks()
+        places = {address: (float(lat[i * 37]), float(lon[i * 37])) for i, address in enumerate(banks['address'])}
+        places['home'] = (float(lat[200]), float(lon[200]))
+        places['pickup point'] = (float(lat[210]), float(lon[210]))
+        geocoding.set_backend(FakeGeocoder(places))
+        geocoding.clear_lru()
+        cache.clear()
+        self.addCleanup(geocoding.set_backend, None)
+        self.addCleanup(geocoding.clear_lru)
+        for patcher in (mock.patch('dead.graphstore.get_graph_store', return_value=self.store),
+                        mock.patch('dead.isochrones.get_index', return_value=None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, **data):
+        data = {'user_address': 'home', 'max_distance': '5', 'selected_food_bank': 'City Harvest', **data}
+        return self.client.post('/generate_map/', data).json()
+
+    def test_invalid_input_is_rejected(self):
+        for data in ({'max_distance': 'far'}, {'max_distance': '0'}, {'max_distance': '50'},
+                     {'max_distance': ''}, {'selected_food_bank': 'Nowhere'}, {'user_address': ''}):
+            with self.subTest(data=data):
+                response = self.post(**data)
+                self.assertEqual(response['status'], 'error')
+
+    def test_nearby_sites_and_donation_cache(self):
+        geocoding.geocode('pickup point')  # as prefetch_geocodes --donations would
+        FoodDonation.objects.create(food_name='soup', quantity=3, category='Vegan',
+                                    expiry_date=date.today() + timedelta(days=2), location='pickup point')
+        response = self.post()
+        self.assertEqual(response['status'], 'success')
+        self.assertIsNotNone(response['route'])
+        names = [site['name'] for site in response['nearby']]
+        self.assertIn('soup (pickup point)', names)
+        self.assertEqual([site['distance_km'] for site in response['nearby']],
+                         sorted(site['distance_km'] for site in response['nearby']))
+
+        with mock.patch('dead.views.donation_sites', wraps=views.donation_sites) as sites:
+            self.post()
+            sites.assert_not_called()
+            FoodDonation.objects.create(food_name='bread', quantity=1, category='Vegan',
+                                        expiry_date=date.today() + timedelta(days=2), location='pickup point')
+            names = [site['name'] for site in self.post()['nearby']]
+            sites.assert_called_once()
+        self.assertIn('bread (pickup point)', names)
@@ -0,0 +1,93 @@
+import math
+from datetime import date
+
+import numpy as np
+from django.test import SimpleTestCase, TransactionTestCase
+
+from dead import forecast
+from dead.models import ConsumptionForecast
+from user.models import FoodItem, MonthlyConsumption
+
+
+def holt_reference(values, alpha=forecast.ALPHA, beta=forecast.BETA, phi=forecast.PHI):
+    """Textbook damped-trend Holt over one series, one month at a time"""
+    level = trend = None
+    for y in values:
+        if math.isnan(y):
+            continue
+        if level is None:
+            level, trend = y, 0.0
+            continue
+        previous = level
+        level = alpha * y + (1 - alpha) * (previous + phi * trend)
+        trend = beta * (level - previous) + (1 - beta) * phi * trend
+    return level + phi * trend
+
+
+class ForecastModelTests(SimpleTestCase):
+    def test_vectorized_holt_matches_reference(self):
+        rng = np.random.default_rng(1)
+        series = rng.poisson(8, size=(50, 30)).astype(float)
+        for row, start in enumerate(rng.integers(0, 29, size=50)):
+            series[row, :start] = np.nan
+        expected = [holt_reference(row) for row in series]
+        np.testing.assert_allclose(forecast.holt_forecast(series), expected)
+
+    def test_waste_is_taken_out_once(self):
+        bought = np.full((1, 12), 10.0)
+        wasted = np.full((1, 12), 4.0)
+        results = forecast.compute_forecasts(bought, wasted)
+        self.assertAlmostEqual(results['forecast'][0], 6.0)
+        self.assertEqual(results['recommended'][0], 6)
+        self.assertAlmostEqual(results['waste_ratio'][0], 0.4)
+
+    def test_seasonal_blend(self):
+        months = np.arange(36)
+        bought = np.where(months % 12 == 11, 30.0, 5.0)[None, :]  # December spike, 3 years
+        bought = bought[:, :35]  # next month to forecast is the third December
+        results = forecast.compute_forecasts(bought, np.zeros_like(bought))
+        self.assertTrue(results['seasonal'][0])
+        plain = forecast.holt_forecast(bought)[0]
+        self.assertGreater(results['forecast'][0], plain + 5)
+        self.assertEqual(results['history'][0], 35)
+
+
+class ForecastRefreshTests(TransactionTestCase):
+    def add_month(self, item, year, month, bought, wasted=0):
+        MonthlyConsumption.objects.create(food_item=item, year=year, month=month, period=year * 100 + month,
+                                          total_bought=bought, total_wasted=wasted, purchases=1)
+
+    def test_axis_runs_to_the_current_month(self):
+        milk = FoodItem.objects.create(name='milk', expiry_text='2025-06-01')
+        rice = FoodItem.objects.create(name='rice', expiry_text='2025-06-01')
+        for month in range(1, 7):
+            self.add_month(milk, 2024, month, 10)
+        self.add_month(rice, 2024, 5, 4)
+
+        item_ids, first_month, bought, _ = forecast.load_series(today=date(2025, 3, 15))
+        self.assertEqual(list(item_ids), [milk.id, rice.id])
+        self.assertEqual(first_month, 2024 * 12)
+        self.assertEqual(bought.shape, (2, 15))  # January 2024 to March 2025
+        self.assertTrue(np.isnan(bought[1, :4]).all())
+        self.assertEqual(bought[0, 6:].sum(), 0)
+
+        # Months without purchases since June pull milk's forecast well below 10
+        results = forecast.compute_forecasts(bought, np.zeros_like(bought))
+        self.assertLess(results['forecast'][0], 1)
+
+    def test_refresh_and_calculate(self):
+        milk = FoodItem.objects.create(name='milk', expiry_text='2025-06-01')
+        FoodItem.objects.create(name='salt', expiry_text='2025-06-01')
+        today = date.today()
+        for back in range(6):
+            month_number = today.year * 12 + today.month - 1 - back
+            self.add_month(milk, month_number // 12, month_number % 12 + 1, 12, 2)
+
+        # Before the first refresh: zeros, and the request computes nothing
+        self.assertEqual([item['quantity'] for item in self.client.get('/calculate/').json()], [0, 0])
+        self.assertFalse(ConsumptionForecast.objects.exists())
+
+        self.assertEqual(forecast.refresh_forecasts(), 1)
+        stored = ConsumptionForecast.objects.get(food_item=milk)
+        self.assertEqual((stored.recommended_quantity, stored.method), (10, 'holt'))
+        self.assertEqual([item['quantity'] for item in self.client.get('/calculate/').json()], [10, 0])
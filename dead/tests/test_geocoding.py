@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils import timezone
+
+from dead import geocoding
+from dead.models import GeocodeResult
+
+
+class FakeGeocoder:
+    name = 'fake'
+
+    def __init__(self, places):
+        self.places = places
+        self.calls = []
+        self.fail = False
+
+    def geocode(self, address):
+        self.calls.append(address)
+        if self.fail:
+            raise ConnectionError('quota exceeded')
+        return self.places.get(geocoding.normalize_address(address))
+
+
+class NormalizeAddressTests(SimpleTestCase):
+    def test_variants_share_a_key(self):
+        key = geocoding.normalize_address('12 High St., London')
+        self.assertEqual(key, '12 high st london')
+        self.assertEqual(geocoding.normalize_address('  12  HIGH st London '), key)
+        self.assertEqual(geocoding.normalize_address('Flat #4-2'), 'flat #4-2')
+
+
+class GeocodingTests(TransactionTestCase):
+    def setUp(self):
+        self.backend = FakeGeocoder({'12 high st london': (51.5, -0.12), 'pune': (18.52, 73.85)})
+        geocoding.set_backend(self.backend)
+        geocoding.clear_lru()
+        self.addCleanup(geocoding.set_backend, None)
+        self.addCleanup(geocoding.clear_lru)
+
+    def test_backend_called_once_per_address(self):
+        self.assertEqual(geocoding.geocode('12 High St, London'), (51.5, -0.12))
+        self.assertEqual(geocoding.geocode('12 high st london'), (51.5, -0.12))
+        geocoding.clear_lru()
+        self.assertEqual(geocoding.geocode('12 HIGH ST LONDON'), (51.5, -0.12))  # from the table
+        self.assertEqual(len(self.backend.calls), 1)
+        row = GeocodeResult.objects.get()
+        self.assertEqual((row.address_key, row.provider), ('12 high st london', 'fake'))
+
+    def test_not_found_is_cached(self):
+        self.assertIsNone(geocoding.geocode('Atlantis'))
+        self.assertIsNone(geocoding.geocode('atlantis'))
+        self.assertEqual(len(self.backend.calls), 1)
+        self.assertIsNone(GeocodeResult.objects.get().lat)
+
+    def test_many_and_expiry(self):
+        results = geocoding.geocode_many(['Pune', '12 High St, London', '', 'Nowhere'])
+        self.assertEqual(results, {'Pune': (18.52, 73.85), '12 High St, London': (51.5, -0.12),
+                                   '': None, 'Nowhere': None})
+        self.assertEqual(len(self.backend.calls), 3)
+
+        # Expired rows are fetched again; not-found rows expire sooner than found ones
+        GeocodeResult.objects.update(fetched_at=timezone.now() - geocoding.NEGATIVE_TTL - timedelta(hours=1))
+        geocoding.clear_lru()
+        geocoding.geocode_many(['Pune', 'Nowhere'])
+        self.assertEqual(self.backend.calls[3:], ['Nowhere'])
+
+    def test_stale_row_served_when_backend_fails(self):
+        geocoding.geocode('Pune')
+        GeocodeResult.objects.update(fetched_at=timezone.now() - geocoding.GEOCODE_TTL - timedelta(days=1))
+        geocoding.clear_lru()
+        self.backend.fail = True
+        self.assertEqual(geocoding.geocode('Pune'), (18.52, 73.85))
+        self.assertIsNone(geocoding.geocode('12 High St, London'))
+
+    def test_cache_only_lookups(self):
+        geocoding.geocode('Pune')
+        geocoding.clear_lru()
+        self.assertEqual(geocoding.geocode('pune', allow_remote=False), (18.52, 73.85))
+        self.assertIsNone(geocoding.geocode('12 High St, London', allow_remote=False))
+        self.assertEqual(len(self.backend.calls), 1)
+
+        geocoding.set_backend(geocoding.OfflineGeocoder())
+        self.assertIsNone(geocoding.geocode('12 High St, London'))
+        self.assertFalse(GeocodeResult.objects.filter(address_key='12 high st london').exists())
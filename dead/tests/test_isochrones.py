@@ -0,0 +1,113 @@
+import random
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from dead import graphstore, isochrones
+from dead.graphstore import GraphStore
+from dead.isochrones import IsochroneIndex
+from dead.routing import dijkstra
+
+from .streets import street_grid
+
+
+class IsochroneIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.store = GraphStore.from_networkx(street_grid(20, seed=9))
+        rng = random.Random(4)
+        cls.sites = [(f'site {i}', (rng.uniform(40.7, 40.719), rng.uniform(-74.0, -73.975))) for i in range(6)]
+        cls.index = IsochroneIndex.build(cls.store, cls.sites, max_metres=1500)
+
+    def expected(self, node, max_metres):
+        """{site name: metres} from ``node`` by one plain Dijkstra query per site"""
+        site_nodes, offsets = self.store.snap([lat for _, (lat, _) in self.sites], [lon for _, (_, lon) in self.sites])
+        reached = {}
+        for (name, _), site_node, offset in zip(self.sites, site_nodes.tolist(), offsets.tolist()):
+            found = dijkstra(self.store, node, site_node)
+            if found is not None and found[1] + offset <= max_metres:
+                reached[name] = found[1] + offset
+        return reached
+
+    def test_reachable_matches_dijkstra(self):
+        for node in random.Random(5).sample(range(self.store.node_count), 40):
+            lat, lon = float(self.store.lat[node]), float(self.store.lon[node])
+            for max_metres in (600, 1500):
+                with self.subTest(node=node, max_metres=max_metres):
+                    reached = self.index.reachable(self.store, lat, lon, max_metres)
+                    self.assertEqual([m for _, m in reached], sorted(m for _, m in reached))
+                    expected = self.expected(node, max_metres)
+                    # Sites right at the limit may fall either side of it in float32
+                    found = {name: m for name, m in reached if m < max_metres - 0.1}
+                    self.assertLessEqual(found.keys(), expected.keys())
+                    for name, metres in expected.items():
+                        if metres < max_metres - 0.1:
+                            self.assertAlmostEqual(dict(reached)[name], metres, delta=metres * 1e-5 + 0.01)
+
+    def test_band_counts(self):
+        lat, lon = float(self.store.lat[150]), float(self.store.lon[150])
+        counts = self.index.band_counts(self.store, lat, lon, band_metres=500)
+        self.assertEqual(len(counts), 3)
+        self.assertEqual(sum(counts), len(self.index.reachable(self.store, lat, lon, 1500)))
+
+    def test_covers(self):
+        self.assertTrue(self.index.covers(self.store, self.sites, 1500))
+        self.assertTrue(self.index.covers(self.store, self.sites, 1000))
+        self.assertFalse(self.index.covers(self.store, self.sites, 2000))
+        self.assertFalse(self.index.covers(self.store, self.sites[:-1], 1000))
+        moved = self.sites[:-1] + [(self.sites[-1][0], (40.71, -73.99))]
+        self.assertFalse(self.index.covers(self.store, moved, 1000))
+
+
+class SavedIndexTests(SimpleTestCase):
+    place = 'Testville'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(GRAPH_STORE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(graphstore._stores.clear)
+        self.addCleanup(isochrones._indexes.clear)
+        self.sites = [('north', (40.715, -73.99)), ('south', (40.702, -73.995))]
+
+    def save_store(self, seed):
+        GraphStore.from_networkx(street_grid(15, seed=seed)).save(graphstore.store_path(self.place))
+
+    def test_index_follows_the_store_build(self):
+        self.save_store(seed=1)
+        store = graphstore.get_graph_store(self.place)
+        self.assertIsNotNone(store.build_id)
+        self.assertIs(graphstore.get_graph_store(self.place), store)
+
+        isochrones.build_index(self.place, 'banks', self.sites, max_metres=1000)
+        index = isochrones.get_index(self.place, 'banks')
+        self.assertEqual(index.meta['store_build_id'], store.build_id)
+        self.assertTrue(index.covers(store, self.sites, 1000))
+        self.assertIs(isochrones.get_index(self.place, 'banks'), index)
+
+        # A rebuilt store is picked up on the next lookup, and the old index no longer covers it
+        self.save_store(seed=2)
+        rebuilt = graphstore.get_graph_store(self.place)
+        self.assertIsNot(rebuilt, store)
+        self.assertNotEqual(rebuilt.build_id, store.build_id)
+        self.assertFalse(index.covers(rebuilt, self.sites, 1000))
+        self.assertIsNone(isochrones.get_index(self.place, 'banks'))  # saved inside the old store
+
+    def test_index_built_for_another_build_is_not_used(self):
+        self.save_store(seed=1)
+        old = graphstore.get_graph_store(self.place)
+        index = IsochroneIndex.build(old, self.sites, 1000)
+        self.save_store(seed=1)  # same network, new build
+        self.assertFalse(index.covers(graphstore.get_graph_store(self.place), self.sites, 1000))
+
+    def test_store_built_on_first_use(self):
+        with mock.patch('dead.graphstore.build_graph_store',
+                        side_effect=lambda place, network_type: self.save_store(seed=3)) as build:
+            store = graphstore.get_graph_store(self.place)
+            self.assertIs(graphstore.get_graph_store(self.place), store)
+        build.assert_called_once()
+        self.assertEqual(store.node_count, 15 * 15)
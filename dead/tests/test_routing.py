@@ -0,0 +1,80 @@
+import random
+import tempfile
+
+import networkx as nx
+from django.test import SimpleTestCase
+
+from dead.graphstore import GraphStore, route_geometry
+from dead.routing import ContractionHierarchy, bidirectional_astar, dijkstra, one_to_many
+
+from .streets import street_grid
+
+
+class RoutingTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.G = street_grid(25, seed=1)
+        cls.store = GraphStore.from_networkx(cls.G)
+        cls.ch = ContractionHierarchy.build(cls.store)
+        cls.position = {node: i for i, node in enumerate(cls.store.node_ids.tolist())}
+
+    def assertValidPath(self, path, source, target, metres):
+        self.assertEqual((path[0], path[-1]), (source, target))
+        node_ids = self.store.node_ids
+        length = sum(min(data['length'] for data in self.G[node_ids[u]][node_ids[v]].values())
+                     for u, v in zip(path, path[1:]))
+        self.assertAlmostEqual(length, metres, delta=0.01)
+
+    def test_matches_networkx(self):
+        rng = random.Random(7)
+        nodes = list(self.G.nodes)
+        for _ in range(60):
+            u, v = rng.choice(nodes), rng.choice(nodes)
+            try:
+                expected = nx.shortest_path_length(self.G, u, v, weight='length')
+            except nx.NetworkXNoPath:
+                expected = None
+            source, target = self.position[u], self.position[v]
+            for name, find in (('dijkstra', dijkstra), ('bidirectional_astar', bidirectional_astar),
+                               ('contraction hierarchy', lambda store, s, t: self.ch.query(s, t))):
+                with self.subTest(algorithm=name, source=u, target=v):
+                    found = find(self.store, source, target)
+                    if expected is None:
+                        self.assertIsNone(found)
+                        continue
+                    path, metres = found
+                    # Weights are stored as float32
+                    self.assertAlmostEqual(metres, expected, delta=expected * 1e-5 + 0.01)
+                    self.assertValidPath(path, source, target, metres)
+
+    def test_one_to_many(self):
+        source = self.position[1000 + 12 * 25 + 12]
+        expected = nx.single_source_dijkstra_path_length(self.G, self.store.node_ids[source], weight='length')
+        targets = random.Random(2).sample(range(self.store.node_count), 40)
+        found = one_to_many(self.store, source, targets, cutoff=800)
+        for target in targets:
+            metres = expected.get(self.store.node_ids[target])
+            with self.subTest(target=target):
+                if metres is None or metres > 800:
+                    self.assertNotIn(target, found)
+                else:
+                    self.assertAlmostEqual(found[target], metres, delta=metres * 1e-5 + 0.01)
+
+    def test_saved_store_routes_the_same(self):
+        self.store.ch = self.ch
+        self.addCleanup(setattr, self.store, 'ch', None)
+        with tempfile.TemporaryDirectory() as directory:
+            self.store.save(f'{directory}/store')
+            loaded = GraphStore.load(f'{directory}/store')
+            self.assertIsNotNone(loaded.ch)
+            lats, lons = self.store.lat, self.store.lon
+            origin, destination = (float(lats[3]), float(lons[3])), (float(lats[600]), float(lons[600]))
+            route = loaded.route(origin, destination)
+            expected = dijkstra(self.store, 3, 600)
+            self.assertAlmostEqual(route['distance'], expected[1], delta=0.01)
+            self.assertEqual(route['path'][0], int(self.store.node_ids[3]))
+            self.assertIs(loaded.route(origin, destination), route)  # cached by end nodes
+            simplified = route_geometry(route, zoom=12)
+            self.assertLessEqual(len(simplified['coords']), len(route['coords']))
+            self.assertEqual(simplified['coords'][0], route['coords'][0])
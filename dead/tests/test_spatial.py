@@ -0,0 +1,59 @@
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from dead.graphstore import GraphStore
+from dead.spatial import GridIndex, _project
+
+
+def brute_force(index, lats, lons):
+    """Nearest node and distance for every point by comparing against every node"""
+    px, py = _project(np.asarray(lats), np.asarray(lons), index.lat0, index.lon0)
+    dist = np.hypot(np.asarray(index.grid_x)[None, :] - px[:, None], np.asarray(index.grid_y)[None, :] - py[:, None])
+    return dist.argmin(axis=1), dist.min(axis=1)
+
+
+class GridIndexTests(SimpleTestCase):
+    def assertMatchesBruteForce(self, index, lats, lons):
+        nodes, dist = index.nearest(lats, lons)
+        expected_nodes, expected_dist = brute_force(index, lats, lons)
+        np.testing.assert_allclose(dist, expected_dist, rtol=1e-9, atol=1e-6)
+        # Ties may resolve to either node, but never to a farther one
+        mismatched = nodes != expected_nodes
+        np.testing.assert_allclose(dist[mismatched], expected_dist[mismatched])
+
+    def test_uniform_and_clustered_nodes(self):
+        rng = np.random.default_rng(4)
+        lat = np.concatenate([rng.uniform(19.0, 19.1, 3000), rng.normal(19.05, 1e-4, 2000)])
+        lon = np.concatenate([rng.uniform(72.8, 72.95, 3000), rng.normal(72.9, 1e-4, 2000)])
+        index = GridIndex.build(lat, lon)
+        # Points inside, near and far outside the grid
+        lats = np.concatenate([rng.uniform(19.0, 19.1, 500), rng.uniform(18.5, 19.6, 200)])
+        lons = np.concatenate([rng.uniform(72.8, 72.95, 500), rng.uniform(72.3, 73.4, 200)])
+        self.assertMatchesBruteForce(index, lats, lons)
+
+    def test_small_and_degenerate_graphs(self):
+        for lat, lon in [([19.0], [72.8]), ([19.0, 19.0], [72.8, 72.8]), ([19.0, 19.0, 19.0], [72.8, 72.9, 73.0])]:
+            with self.subTest(lat=lat, lon=lon):
+                index = GridIndex.build(lat, lon)
+                self.assertMatchesBruteForce(index, [18.9, 19.0, 19.5], [72.85, 73.1, 72.0])
+
+    def test_nodes_along_one_straight_street(self):
+        lon = np.linspace(72.8, 73.0, 2000)
+        index = GridIndex.build(np.full(2000, 19.0), lon)
+        self.assertEqual(index.ny, 1)
+        self.assertMatchesBruteForce(index, [18.9, 19.0, 19.5, 19.0], [72.85, 73.1, 72.0, 72.9])
+
+    def test_saved_index_is_memory_mapped(self):
+        rng = np.random.default_rng(6)
+        lat, lon = rng.uniform(40.7, 40.8, 800), rng.uniform(-74.0, -73.9, 800)
+        store = GraphStore.from_edges(np.arange(800), lat, lon, np.array([0]), np.array([1]), np.array([10.0]))
+        with tempfile.TemporaryDirectory() as directory:
+            store.save(f'{directory}/store')
+            loaded = GraphStore.load(f'{directory}/store')
+            self.assertIsInstance(loaded.index.grid_order, np.memmap)
+            lats, lons = rng.uniform(40.69, 40.81, 300), rng.uniform(-74.01, -73.89, 300)
+            np.testing.assert_array_equal(loaded.snap(lats, lons)[0], store.snap(lats, lons)[0])
+            self.assertMatchesBruteForce(loaded.index, lats, lons)
+            self.assertEqual(loaded.nearest_node(lat[17], lon[17]), 17)
@@ -0,0 +1,92 @@
+import random
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from dead import tiles
+from dead.graphstore import GraphStore
+from dead.tiles import StaleRegionError, TileCache, TiledGraphStore
+
+from .streets import street_grid
+
+
+class TileCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used_by_size(self):
+        cache = TileCache(budget_bytes=100)
+        load = mock.Mock(side_effect=lambda: ('value', 40))
+        for key in 'abc':
+            cache.get(key, load)
+        self.assertEqual((cache.bytes, list(cache._entries)), (80, ['b', 'c']))
+        cache.get('b', load)
+        cache.get('d', load)
+        self.assertEqual(list(cache._entries), ['b', 'd'])
+        self.assertEqual((cache.hits, cache.misses, load.call_count), (1, 4, 4))
+
+        cache.get('huge', lambda: ('value', 500))  # kept while it is the one asked for
+        self.assertEqual(list(cache._entries), ['huge'])
+
+
+class TiledGraphStoreTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.store = GraphStore.from_networkx(street_grid(30, seed=2))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/region'
+
+    def test_routes_match_whole_graph(self):
+        store = self.store
+        # Small tiles, so most routes cross several of them
+        tiled = TiledGraphStore.build(store, self.path, tile_degrees=0.004, meta={})
+        tiled = TiledGraphStore.load(tiled.path, TileCache(4 * 1024 * 1024))
+        self.assertGreater(len(tiled.tile_ids), 20)
+        rng = random.Random(3)
+        lats, lons = store.lat.tolist(), store.lon.tolist()
+        for _ in range(40):
+            a, b = rng.randrange(store.node_count), rng.randrange(store.node_count)
+            origin, destination = (lats[a], lons[a]), (lats[b], lons[b])
+            with self.subTest(origin=origin, destination=destination):
+                expected = store.route(origin, destination)
+                route = tiled.route(origin, destination)
+                if expected is None:
+                    self.assertIsNone(route)
+                    continue
+                self.assertAlmostEqual(route['distance'], expected['distance'], delta=0.01)
+                self.assertEqual((route['path'][0], route['path'][-1]),
+                                 (expected['path'][0], expected['path'][-1]))
+
+    def test_tiles_in(self):
+        tiled = TiledGraphStore.build(self.store, self.path, tile_degrees=0.01, meta={})
+        everything = tiled.tiles_in(-90, -180, 90, 180)
+        self.assertEqual(everything, sorted(tiled.tile_ids.tolist()))
+        self.assertEqual(tiled.tiles_in(0, 0, 1, 1), [])
+        corner = tiled.tiles_in(40.7, -74.0, 40.705, -73.995)
+        self.assertTrue(corner)
+        self.assertLess(len(corner), len(everything))
+
+    def test_stale_build_is_detected(self):
+        TiledGraphStore.build(self.store, self.path, tile_degrees=0.01, meta={})
+        old = TiledGraphStore.load(self.path, TileCache(64 * 1024 * 1024))
+        new = TiledGraphStore.build(self.store, self.path, tile_degrees=0.01, meta={})
+        self.assertNotEqual(old.build_id, new.build_id)
+        with self.assertRaises(StaleRegionError):
+            old.tile(int(old.tile_ids[0]))
+        self.assertIsNotNone(TiledGraphStore.load(self.path).tile(int(new.tile_ids[0])))
+
+    def test_get_region_reopens_a_rebuilt_region(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(GRAPH_STORE_DIR=directory, GRAPH_REGIONS={'Test': {'places': ['x']}}):
+            self.addCleanup(tiles._regions.clear)
+            self.assertIsNone(tiles.get_region('Test'))
+            path = tiles.region_path('Test')
+            TiledGraphStore.build(self.store, path, tile_degrees=0.01, meta={})
+            first = tiles.get_region('Test')
+            self.assertIs(tiles.get_region('Test'), first)
+            TiledGraphStore.build(self.store, path, tile_degrees=0.01, meta={})
+            second = tiles.get_region('Test')
+            self.assertIsNot(second, first)
+            self.assertNotEqual(second.build_id, first.build_id)
@@ -0,0 +1,313 @@
+"""Region graphs split into square tiles on disk, loaded on demand under a memory budget.
+
+A whole metropolitan region (Mumbai, Thane and Kalyan together, say) is too big
+to hold in every worker. ``TiledGraphStore.build`` renumbers the region's nodes
+tile by tile, on a grid of ``tile_degrees`` squares, and saves each tile's nodes
+and out-edges under ``<GRAPH_STORE_DIR>/tiles/<region-slug>/<tile id>/``:
+
+    node_ids, lat, lon, weights  as in dead.graphstore
+    indptr                       local CSR row pointers over the tile's nodes
+    indices                      region-wide target ids, so edges leaving the tile
+                                 keep pointing at their nodes in the neighbour tile
+
+A node's region id is its tile's offset plus its position in the tile, so the
+tile that holds any edge target is one searchsorted away. ``route`` loads only
+the tiles under the padded bounding box of its two ends and stitches them into
+an ordinary GraphStore (edges into tiles left out are dropped), widening the box
+when no path fits inside it. Tiles and stitched views share one process-wide
+LRU capped at ``settings.GRAPH_TILE_BUDGET_MB``, so the memory a worker spends on
+graphs stays bounded however many regions it serves. Build regions listed in
+``settings.GRAPH_REGIONS`` with ``manage.py build_graph_tiles``.
+
+Every build gets a fresh ``build_id``, which is part of the cache keys. A tile
+read from disk is checked against the build it was asked for, and
+``get_region`` reopens a region whose meta.json has changed, so a rebuild
+while workers are serving never mixes one build's offsets with another's tiles.
+"""
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from foodsaver.singleflight import SingleFlight
+
+from .graphstore import ARRAYS, GraphStore, place_slug
+from .spatial import INDEX_ARRAYS
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+TILE_DEGREES = 0.05  # about 5.5 km north-south
+ROUTE_MARGIN_METRES = 2000
+ROUTE_MARGIN_FRACTION = 0.25  # of the larger side of the route's bounding box
+ROUTE_WIDENINGS = 2
+METRES_PER_DEGREE = 111195.0
+
+_regions = {}  # region -> (meta.json mtime, TiledGraphStore)
+_regions_lock = threading.Lock()
+
+
+class StaleRegionError(RuntimeError):
+    """The region was rebuilt on disk since this TiledGraphStore was opened"""
+
+
+class TileCache:
+    """LRU of loaded tiles and stitched views, evicted by their total size in bytes"""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load):
+        """The cached value for ``key``, or ``load()`` -> (value, nbytes) cached under it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value, nbytes = self._flight.do(repr(key), load)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, nbytes)
+                self.bytes += nbytes
+            self._entries.move_to_end(key)
+            # Never evict the entry just asked for, even when it alone is over budget
+            while self.bytes > self.budget_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+tile_cache = TileCache(getattr(settings, 'GRAPH_TILE_BUDGET_MB', 256) * 1024 * 1024)
+
+
+class TiledGraphStore:
+    def __init__(self, path, meta, cache=None):
+        self.path = path
+        self.meta = meta
+        self.cache = cache if cache is not None else tile_cache
+        self.tile_degrees = meta['tile_degrees']
+        self.lat_origin = meta['lat_origin']
+        self.lon_origin = meta['lon_origin']
+        self.columns = meta['columns']
+        self.build_id = meta['build_id']
+        tiles = np.array(meta['tiles'], dtype=np.int64).reshape(-1, 3)  # [tile id, offset, nodes]
+        self.tile_ids = tiles[:, 0]
+        self.offsets = tiles[:, 1]
+        self.counts = tiles[:, 2]
+
+    @classmethod
+    def build(cls, store, path, tile_degrees=TILE_DEGREES, meta=None):
+        """Split GraphStore ``store`` into tiles saved under ``path``, replacing any previous build"""
+        lat, lon = np.asarray(store.lat), np.asarray(store.lon)
+        indptr, indices, weights = np.asarray(store.indptr), np.asarray(store.indices), np.asarray(store.weights)
+        lat_origin = math.floor(lat.min() / tile_degrees) * tile_degrees
+        lon_origin = math.floor(lon.min() / tile_degrees) * tile_degrees
+        rows = np.floor((lat - lat_origin) / tile_degrees).astype(np.int64)
+        cols = np.floor((lon - lon_origin) / tile_degrees).astype(np.int64)
+        columns = int(cols.max()) + 1 if len(cols) else 1
+        tile_of = rows * columns + cols
+
+        # New region order: nodes grouped by tile, edges following their sources
+        order = np.argsort(tile_of, kind='stable')
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        degree = np.diff(indptr)[order]
+        new_indptr = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(degree, out=new_indptr[1:])
+        edges = np.repeat(indptr[:-1][order] - new_indptr[:-1], degree) + np.arange(new_indptr[-1])
+        new_indices = position[indices[edges]].astype(np.int32)
+        new_weights = weights[edges]
+        node_ids, lat, lon = np.asarray(store.node_ids)[order], lat[order], lon[order]
+
+        tile_ids, offsets, counts = np.unique(tile_of[order], return_index=True, return_counts=True)
+        temp_path = f'{path}.tmp-{os.getpid()}'
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for tile_id, start, count in zip(tile_ids.tolist(), offsets.tolist(), counts.tolist()):
+            end = start + count
+            first, last = new_indptr[start], new_indptr[end]
+            arrays = {
+                'node_ids': node_ids[start:end], 'lat': lat[start:end], 'lon': lon[start:end],
+                'indptr': new_indptr[start:end + 1] - first,
+                'indices': new_indices[first:last], 'weights': new_weights[first:last],
+            }
+            tile_path = os.path.join(temp_path, str(tile_id))
+            os.makedirs(tile_path)
+            for name in ARRAYS:
+                np.save(os.path.join(tile_path, f'{name}.npy'), arrays[name])
+        meta = dict(meta or {}, format=FORMAT_VERSION, build_id=uuid.uuid4().hex, tile_degrees=tile_degrees, lat_origin=lat_origin,
+                    lon_origin=lon_origin, columns=columns, nodes=len(order), edges=int(new_indptr[-1]),
+                    tiles=np.column_stack([tile_ids, offsets, counts]).tolist())
+        with open(os.path.join(temp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        old_path = f'{path}.old-{os.getpid()}'
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return cls(path, meta)
+
+    @classmethod
+    def load(cls, path, cache=None):
+        """Open a saved region. Only its metadata is read; tiles load as queries need them."""
+        meta = read_meta(path)
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Tiled graph store {path} has format {meta.get('format')}, expected {FORMAT_VERSION}")
+        return cls(path, meta, cache)
+
+    def tiles_in(self, south, west, north, east):
+        """Ids of the saved tiles overlapping a bounding box, ascending"""
+        row0, row1 = (math.floor((v - self.lat_origin) / self.tile_degrees) for v in (south, north))
+        col0, col1 = (math.floor((v - self.lon_origin) / self.tile_degrees) for v in (west, east))
+        col0, col1 = max(col0, 0), min(col1, self.columns - 1)
+        if row1 < 0 or col0 > col1:
+            return []
+        wanted = [row * self.columns + col for row in range(max(row0, 0), row1 + 1) for col in range(col0, col1 + 1)]
+        return self.tile_ids[np.isin(self.tile_ids, wanted)].tolist()
+
+    def tiles_around(self, points, margin_metres):
+        """Saved tiles under the bounding box of (lat, lon) ``points`` padded by ``margin_metres``"""
+        lats, lons = [p[0] for p in points], [p[1] for p in points]
+        dlat = margin_metres / METRES_PER_DEGREE
+        dlon = dlat / max(math.cos(math.radians(max(abs(v) for v in lats))), 0.01)
+        return self.tiles_in(min(lats) - dlat, min(lons) - dlon, max(lats) + dlat, max(lons) + dlon)
+
+    def tile(self, tile_id):
+        """Arrays of one tile, loaded into memory through the shared cache"""
+        return self.cache.get(('tile', self.path, self.build_id, tile_id), lambda: self._load_tile(tile_id))
+
+    def view(self, tile_ids):
+        """GraphStore over the given tiles with their shared borders stitched, through the shared cache"""
+        tile_ids = tuple(sorted(tile_ids))
+        return self.cache.get(('view', self.path, self.build_id, tile_ids), lambda: self._stitch(tile_ids))
+
+    def around(self, points, margin_metres):
+        """Stitched GraphStore covering (lat, lon) ``points`` and ``margin_metres`` around them, or None"""
+        tile_ids = self.tiles_around(points, margin_metres)
+        return self.view(tile_ids) if tile_ids else None
+
+    def route(self, origin, destination):
+        """Shortest path between two (lat, lon) points, as GraphStore.route returns it. Starts
+        from the tiles under their padded bounding box and widens it while no path fits."""
+        span = max(abs(origin[0] - destination[0]), abs(origin[1] - destination[1])) * METRES_PER_DEGREE
+        margin = max(ROUTE_MARGIN_METRES, ROUTE_MARGIN_FRACTION * span)
+        tried = None
+        for _ in range(ROUTE_WIDENINGS + 1):
+            tile_ids = self.tiles_around([origin, destination], margin)
+            if tile_ids and tile_ids != tried:
+                route = self.view(tile_ids).route(origin, destination)
+                if route is not None:
+                    return route
+                tried = tile_ids
+            margin *= 2
+        return None
+
+    def _load_tile(self, tile_id):
+        tile_path = os.path.join(self.path, str(tile_id))
+        try:
+            arrays = {name: np.load(os.path.join(tile_path, f'{name}.npy')) for name in ARRAYS}
+        except FileNotFoundError:
+            arrays = None
+        # Builds replace the whole directory at once, so if meta.json still names
+        # this build after the read, the arrays came from it too
+        if arrays is None or read_meta(self.path).get('build_id') != self.build_id:
+            raise StaleRegionError(f"{self.path} was rebuilt; reopen it with get_region")
+        return arrays, sum(array.nbytes for array in arrays.values())
+
+    def _stitch(self, tile_ids):
+        positions = np.searchsorted(self.tile_ids, tile_ids)
+        tiles = [self.tile(tile_id) for tile_id in tile_ids]
+        # Where each included tile starts in the view; -1 for tiles left out
+        base = np.full(len(self.tile_ids), -1, dtype=np.int64)
+        base[positions] = np.concatenate([[0], np.cumsum(self.counts[positions])[:-1]])
+
+        targets = np.concatenate([tile['indices'] for tile in tiles]).astype(np.int64)
+        owner = np.searchsorted(self.offsets, targets, side='right') - 1
+        keep = base[owner] >= 0
+        n = int(self.counts[positions].sum())
+        sources = np.repeat(np.arange(n), np.concatenate([np.diff(tile['indptr']) for tile in tiles]))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources[keep], minlength=n), out=indptr[1:])
+        store = GraphStore(
+            np.concatenate([tile['node_ids'] for tile in tiles]),
+            np.concatenate([tile['lat'] for tile in tiles]),
+            np.concatenate([tile['lon'] for tile in tiles]),
+            indptr,
+            (base[owner] + targets - self.offsets[owner])[keep].astype(np.int32),
+            np.concatenate([tile['weights'] for tile in tiles])[keep],
+            meta={'region': self.meta.get('region'), 'tiles': list(tile_ids)},
+        )
+        # Its in-edges get built on first route, about doubling the edge arrays
+        edge_bytes = store.indptr.nbytes + store.indices.nbytes + store.weights.nbytes
+        nbytes = sum(getattr(store, name).nbytes for name in ARRAYS) + edge_bytes + \
+            sum(getattr(store.index, name).nbytes for name in INDEX_ARRAYS)
+        return store, nbytes
+
+
+def read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        return json.load(f)
+
+
+def region_path(region, network_type='drive'):
+    return os.path.join(settings.GRAPH_STORE_DIR, 'tiles', place_slug(region, network_type))
+
+
+def build_region(region, tile_degrees=TILE_DEGREES):
+    """Download the places of ``settings.GRAPH_REGIONS[region]`` with osmnx as one graph
+    and save it as tiles. Returns the path."""
+    import osmnx as ox
+
+    config = settings.GRAPH_REGIONS[region]
+    network_type = config.get('network_type', 'drive')
+    started = time.perf_counter()
+    G = ox.graph_from_place(config['places'], network_type=network_type)
+    store = GraphStore.from_networkx(G)
+    path = region_path(region, network_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tiled = TiledGraphStore.build(store, path, tile_degrees, meta={
+        'region': region, 'places': config['places'], 'network_type': network_type, 'built_at': time.time(),
+    })
+    logger.info(f"Built tiled graph store for {region} ({store.node_count} nodes, {len(tiled.tile_ids)} tiles) "
+                f"in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def get_region(region):
+    """The tiled store of a region in ``settings.GRAPH_REGIONS``, reopened when it has been
+    rebuilt since, or None when it has not been built"""
+    path = region_path(region, settings.GRAPH_REGIONS[region].get('network_type', 'drive'))
+    try:
+        mtime = os.stat(os.path.join(path, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        logger.info(f"No tiled graph store for {region} yet; run 'manage.py build_graph_tiles {region}'")
+        return None
+    cached = _regions.get(region)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    tiled = TiledGraphStore.load(path)
+    with _regions_lock:
+        _regions[region] = (mtime, tiled)
+    return tiled
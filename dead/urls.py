@@ -4,6 +4,7 @@ from .views import *
 urlpatterns = [
     path('hello/', hello, name='hello'),
     path('generate_map/', generate_map, name='generate_map'),
+    path('map/food_banks.geojson', food_banks_geojson, name='food_banks_geojson'),
     path('calculate/', calculate, name='calculate'),
     path('cart/', cart, name='cart'),
     path('spline/',spline, name='spline')
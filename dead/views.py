@@ -1,17 +1,27 @@
 from django.shortcuts import render, HttpResponse
 from django import forms
+from django.core.cache import cache
+from django.db.models import Count, Max
 from django.http import JsonResponse
+from django.views.decorators.http import condition
 from datetime import datetime
+import pandas as pd
+import logging
 import os
 
+from foodsaver import geodistance, geojson, polyline
+
+from . import geocoding, graphstore, isochrones
+
+logger = logging.getLogger(__name__)
+
 
 # Create your views here.
 def hello(request):
     return HttpResponse("Hello")
 
 
-def get_street_network(area):
-    return ox.graph_from_place(area, network_type='walk')
+MAP_PLACE = 'Manhattan, New York, USA'
 
 def load_sample_food_banks():
     data = {
@@ -79,98 +89,92 @@ def load_sample_food_banks():
     return pd.DataFrame(data)
 
 def geocode_address(address):
-    try:
-        geocode_result = gmaps.geocode(address)
-        if geocode_result:
-            location = geocode_result[0]['geometry']['location']
-            return location['lat'], location['lng']
-        return None
-    except Exception as e:
-        st.error(f"Error geocoding address: {str(e)}")
-        return None
+    # Cached in-process and in the GeocodeResult table (see dead.geocoding)
+    return geocoding.geocode(address)
 
-def get_route(G, origin_coords, dest_coords):
+def get_route(graph, origin_coords, dest_coords):
     try:
-        orig_node = ox.nearest_nodes(G, X=origin_coords[1], Y=origin_coords[0])
-        dest_node = ox.nearest_nodes(G, X=dest_coords[1], Y=dest_coords[0])
-        route = nx.shortest_path(G, orig_node, dest_node, weight='length')
-        route_coords = [(G.nodes[node]['y'], G.nodes[node]['x']) for node in route]
-        route_length = nx.shortest_path_length(G, orig_node, dest_node, weight='length')
-        return {
-            'coords': route_coords,
-            'distance': route_length,
-            'path': route
-        }
+        return graph.route(origin_coords, dest_coords)
     except Exception as e:
-        st.error(f"Error calculating route: {str(e)}")
+        logger.error(f"Error calculating route: {str(e)}")
         return None
 
-def create_geopandas_df(df):
-    geometries = []
-    coordinates = []
-    for address in df['address']:
-        coords = geocode_address(address)
-        if coords:
-            geometries.append(Point(coords[1], coords[0]))
-            coordinates.append(coords)
-        else:
-            geometries.append(None)
-            coordinates.append(None)
-    gdf = gpd.GeoDataFrame(df, geometry=geometries)
-    gdf['coordinates'] = coordinates
-    return gdf.dropna(subset=["geometry"])
-
-def create_map(gdf, user_location=None, max_distance=None, route_details=None):
-    if user_location:
-        center = user_location
+def food_bank_sites():
+    """Sample food banks that geocode, as dicts with their (lat, lon) under 'coords'"""
+    df = load_sample_food_banks()
+    # One cache lookup for every address; only unknown ones go to the geocoder
+    found = geocoding.geocode_many(df['address'])
+    return [dict(row, coords=found[row['address']]) for row in df.to_dict('records') if found[row['address']]]
+
+def build_food_banks_layer():
+    return geojson.collection(
+        geojson.point(*bank['coords'], **{key: value for key, value in bank.items() if key != 'coords'})
+        for bank in food_bank_sites()
+    )
+
+# Markers change only when the sample list or its geocodes do; see foodsaver.geojson
+food_banks_layer = geojson.StaticLayer(build_food_banks_layer)
+
+@condition(etag_func=food_banks_layer.etag)
+def food_banks_geojson(request):
+    return food_banks_layer.response()
+
+def donation_sites(today=None):
+    """(name, (lat, lon)) of unexpired donations whose pickup location is already geocoded"""
+    from donation.models import FoodDonation
+
+    donations = list(FoodDonation.objects.filter(expiry_date__gte=today or datetime.now().date())
+                     .values_list('food_name', 'location'))
+    # Cache only: prefetch_geocodes --donations fills it, so requests never wait on the geocoder
+    found = geocoding.geocode_many([location for _, location in donations], allow_remote=False)
+    return [(f"{name} ({location})", found[location]) for name, location in donations if found[location]]
+
+# Edits that keep a donation's id and the counts below are picked up after this long
+DONATION_SITES_TTL = 300
+
+def donation_sites_version(today):
+    """Changes whenever a donation is added, removed or expires, or a geocode is stored"""
+    from donation.models import FoodDonation
+    from .models import GeocodeResult
+
+    donations = FoodDonation.objects.filter(expiry_date__gte=today).aggregate(count=Count('id'), last=Max('id'))
+    geocodes = GeocodeResult.objects.aggregate(count=Count('id'), last=Max('fetched_at'))
+    stamp = geocodes['last'].timestamp() if geocodes['last'] else 0
+    return f"{today.isoformat()}:{donations['count']}:{donations['last']}:{geocodes['count']}:{stamp}"
+
+def cached_donation_sites():
+    """donation_sites(), cached under a key built from donation_sites_version"""
+    today = datetime.now().date()
+    key = f'donation_sites:{donation_sites_version(today)}'
+    sites = cache.get(key)
+    if sites is None:
+        sites = donation_sites(today)
+        cache.set(key, sites, DONATION_SITES_TTL)
+    return sites
+
+FOOD_BANK_ISOCHRONES = 'food_banks'
+
+def nearby_sites(graph, user_coords, banks, max_distance):
+    """Food banks and donation sites within max_distance km on foot, nearest first.
+    Food banks come from the precomputed isochrone index when it covers the current
+    list (manage.py build_isochrones); the rest from one batched matrix computation."""
+    cutoff = max_distance * 1000
+    bank_sites = [(bank['name'], bank['coords']) for bank in banks]
+    nearby = []
+    index = isochrones.get_index(MAP_PLACE, FOOD_BANK_ISOCHRONES)
+    if index is not None and index.covers(graph, bank_sites, cutoff):
+        nearby += [('food_bank', name, m) for name, m in index.reachable(graph, *user_coords, cutoff)]
+        sites = []
     else:
-        center = [gdf.geometry.y.mean(), gdf.geometry.x.mean()]
-    
-    m = folium.Map(location=center, zoom_start=12)
-    marker_cluster = MarkerCluster().add_to(m)
-    
-    for idx, row in gdf.iterrows():
-        if row.geometry:
-            distance_text = ""
-            if user_location:
-                distance = calculate_distance(user_location, (row.geometry.y, row.geometry.x))
-                if max_distance and distance > max_distance:
-                    continue
-                distance_text = f"<br>Distance: {distance:.1f} km"
-            
-            popup_content = f"""
-                <b>{row['name']}</b><br>
-                Address: {row['address']}<br>
-                Phone: {row['phone']}<br>
-                Hours: {row['hours']}<br>
-                Needs: {row['needs']}{distance_text}
-            """
-            
-            folium.Marker(
-                location=[row.geometry.y, row.geometry.x],
-                popup=folium.Popup(popup_content, max_width=300),
-                icon=folium.Icon(color='red', icon='info-sign')
-            ).add_to(marker_cluster)
-    
-    if user_location:
-        folium.Marker(
-            location=user_location,
-            popup='Your Location',
-            icon=folium.Icon(color='blue', icon='user')
-        ).add_to(m)
-    
-    if route_details:
-        folium.PolyLine(
-            locations=route_details['coords'],
-            weight=4,
-            color='blue',
-            opacity=0.5
-        ).add_to(m)
-    
-    return m
+        sites = [('food_bank', name, coords) for name, coords in bank_sites]
+    sites += [('donation', name, coords) for name, coords in cached_donation_sites()]
+    metres = graph.distances.compute([user_coords], [coords for _, _, coords in sites], cutoff=cutoff)[0]
+    nearby += [(kind, name, m) for (kind, name, _), m in zip(sites, metres) if m != float('inf')]
+    return sorted(({'type': kind, 'name': name, 'distance_km': round(float(m) / 1000, 2)} for kind, name, m in nearby),
+                  key=lambda site: site['distance_km'])
 
 def calculate_distance(point1, point2):
-    return geodesic(point1, point2).kilometers
+    return geodistance.distance(point1, point2)
 
 # Django Form for handling user inputs
 class LocationForm(forms.Form):
@@ -180,84 +184,76 @@ class LocationForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Load food bank names for selection
+        # Names only, so building the form needs no geocoding
         df = load_sample_food_banks()
-        gdf = create_geopandas_df(df)
-        self.fields['selected_food_bank'].choices = [(name, name) for name in gdf['name']]
+        self.fields['selected_food_bank'].choices = [(name, name) for name in df['name']]
 
 def generate_map(request):
-    # Load the data once when the view is accessed
-    G = get_street_network('Manhattan, New York, USA')
-    print(1)
-    df = load_sample_food_banks()
-    gdf = create_geopandas_df(df)
-
-    # Render the initial form
+    # Render the initial form. The page draws the base map itself and loads the
+    # markers from food_banks_geojson, so only routes travel per interaction.
     if request.method == "GET":
-        return render(request, 'dead/location_form.html', {'food_banks': gdf['name'].tolist()})
+        df = load_sample_food_banks()
+        return render(request, 'dead/location_form.html', {'food_banks': df['name'].tolist()})
 
     # Handle form submission using AJAX
     elif request.method == "POST":
-        user_address = request.POST.get("user_address")
-        max_distance = int(request.POST.get("max_distance"))
-        selected_food_bank = request.POST.get("selected_food_bank")
-        
-        user_coords = geocode_address(user_address) if user_address else None
-        dest_coords = gdf.loc[gdf['name'] == selected_food_bank, 'coordinates'].values[0] if selected_food_bank else None
-        print(2)
-        # Generate the route details and map if both locations are valid
+        form = LocationForm(request.POST)
+        if not form.is_valid():
+            field, errors = next(iter(form.errors.items()))
+            return JsonResponse({'status': 'error', 'message': f"{form.fields[field].label} {errors[0]}"})
+        user_address = form.cleaned_data['user_address']
+        max_distance = form.cleaned_data['max_distance']
+        selected_food_bank = form.cleaned_data['selected_food_bank']
+        zoom = request.POST.get("zoom")
+        zoom = int(zoom) if zoom and zoom.isdigit() else None
+
+        banks = food_bank_sites()
+        user_coords = geocode_address(user_address)
+        dest_coords = next((bank['coords'] for bank in banks if bank['name'] == selected_food_bank), None)
+        # Route and nearby sites if both locations are valid
         if user_coords and dest_coords:
-            route_details = get_route(G, user_coords, dest_coords)
-            map_view = create_map(gdf, user_location=user_coords, max_distance=max_distance, route_details=route_details)
-            print(3)
-            # Convert Folium map to HTML
-            map_html = map_view._repr_html_()
-            return JsonResponse({'map_html': map_html, 'status': 'success'})
+            # Memory-mapped once per process (see dead.graphstore), not rebuilt per request
+            graph = graphstore.get_graph_store(MAP_PLACE)
+            route_details = get_route(graph, user_coords, dest_coords)
+            route = None
+            if route_details:
+                # Simplified for the client's zoom level and cached with the route (see graphstore.route_geometry)
+                geometry = graphstore.route_geometry(route_details, zoom)
+                distance_km = round(route_details['distance'] / 1000, 2)
+                if request.POST.get("geometry") == "geojson":
+                    route = geojson.line(geometry['coords'], distance_km=distance_km, zoom=zoom)
+                else:
+                    route = {'polyline': geometry['polyline'], 'precision': polyline.PRECISION,
+                             'zoom': zoom, 'distance_km': distance_km}
+            return JsonResponse({
+                'status': 'success',
+                'user': list(user_coords),
+                'route': route,
+                'nearby': nearby_sites(graph, user_coords, banks, max_distance),
+            })
 
         return JsonResponse({'status': 'error', 'message': 'Unable to find location or route'})
     
 
-from user.models import FoodItem, FoodItemPurchase
+from user.models import FoodItem
 
-from django.db.models import Sum, F
-from django.db.models.functions import Coalesce
-from statistics import mean
-
-# Assuming `FoodItem` and `FoodItemPurchase` models are defined as above
+from foodsaver import media
 
 def calculate(request):
-    # Step 1: Get all food items from the FoodItem model
-    food_items = FoodItem.objects.all()
-
-    # Step 2: Prepare a list to hold the calculated data for each item
-    result = []
-
-    for food_item in food_items:
-        # Step 3: Retrieve monthly purchase data for the specific food item
-        monthly_data = (
-            FoodItemPurchase.objects
-            .filter(food_item=food_item)
-            .values('year_bought', 'month_bought')  # Group by year and month
-            .annotate(
-                total_bought=Coalesce(Sum('quantity_bought'), 0),
-                total_wasted=Coalesce(Sum('amount_wasted'), 0),
-                net_consumed=F('total_bought') - F('total_wasted')
-            )
-        )
-
-        # Step 4: Calculate net consumption for each month and get the mean
-        monthly_consumption = [entry['net_consumed'] for entry in monthly_data]
-        optimal_consumption = int(mean(monthly_consumption)) if monthly_consumption else 0
-
-        # Step 5: Append the item name and its optimal consumption to the result list
-        result.append({
-            'name': food_item.name,
-            'quantity': optimal_consumption,
-            'image_url': food_item.image.url if food_item.image else None
-        })
-    print(result)
-
-    # Step 6: Return the result as a JSON response
+    # Recommended monthly quantities are precomputed by dead.forecast (nightly and
+    # after rollup changes), so this is a single indexed join. Items without a
+    # forecast yet, including all of them before the first refresh, get 0.
+    food_items = FoodItem.objects.order_by('id').values('name', 'image', 'image_variants', 'forecast__recommended_quantity')
+
+    result = [
+        {
+            'name': item['name'],
+            'quantity': item['forecast__recommended_quantity'] or 0,
+            'image_url': media.image_url(item['image'], 'thumb', variants=item['image_variants']),
+        }
+        for item in food_items
+    ]
+
     return JsonResponse(result, safe=False)
 
 # Render the main chatbot page
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("donation", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fooddonation",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
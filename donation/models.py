@@ -2,6 +2,8 @@ from django.db import models
 
 from django.db import models
 
+from foodsaver import media
+
 class FoodDonation(models.Model):
     FOOD_CATEGORIES = [
         ('Vegetarian', 'Vegetarian'),
@@ -17,7 +19,28 @@ class FoodDonation(models.Model):
     expiry_date = models.DateField()
     location = models.CharField(max_length=255)
     food_image = models.ImageField(upload_to='food_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=list, blank=True)  # Built derivatives, see foodsaver.media
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'food_image' in field_names:
+            instance._loaded_image = str(values[field_names.index('food_image')] or '')
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Looking for variants stats storage, so only do it for a new image
+        if ((update_fields is None or 'food_image' in update_fields)
+                and 'food_image' not in self.get_deferred_fields()
+                and str(self.food_image or '') != getattr(self, '_loaded_image', None)):
+            self.image_variants = media.available_variants(self.food_image)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'image_variants'}
+        super().save(*args, **kwargs)
+        if 'food_image' not in self.get_deferred_fields():
+            self._loaded_image = str(self.food_image or '')
+
     def __str__(self):
         return f"{self.food_name} - {self.quantity} units"
\ No newline at end of file
@@ -0,0 +1,12 @@
+from django.dispatch import receiver
+
+from foodsaver import media
+from foodsaver.db import writer as db_writer
+
+from .models import FoodDonation
+
+
+@receiver(media.derivatives_built)
+def record_image_variants(sender, name, variants, **kwargs):
+    """Note the finished variants on every donation showing the image"""
+    db_writer.submit(lambda: FoodDonation.objects.filter(food_image=name).update(image_variants=variants))
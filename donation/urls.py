@@ -8,5 +8,6 @@ urlpatterns = [
     path('ngo_list', ngo_list, name='ngo_list'),
     path('route_optimize', index, name='index'),
     path('locations/',get_locations, name='locations'),
+    path('locations.geojson', locations_geojson, name='locations_geojson'),
     path('route/', generate_route, name='generate_route'),
 ]
\ No newline at end of file
@@ -2,6 +2,8 @@ from django.shortcuts import render
 
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from foodsaver import media
+from foodsaver.db import WRITE_TIMEOUT, writer as db_writer
 from .models import FoodDonation
 
 def food_donation_form(request):
@@ -17,6 +19,9 @@ def food_donation_form(request):
         if not (food_name and quantity and category and expiry_date and location):
             messages.error(request, "Please fill out all required fields.")
         else:
+            if food_image:
+                # Stored once under its content hash, with thumbnails built in the background
+                food_image = media.store_upload(food_image, 'food_images').name
             # Save donation to database
             food_donation = FoodDonation(
                 food_name=food_name,
@@ -26,7 +31,7 @@ def food_donation_form(request):
                 location=location,
                 food_image=food_image,
             )
-            food_donation.save()
+            db_writer.submit(food_donation.save).result(WRITE_TIMEOUT)
             messages.success(request, "Your food donation has been submitted successfully.")
             return redirect('food_donations_list')
 
@@ -42,14 +47,30 @@ from .models import FoodDonation
 
 def food_donations_list(request):
     donations = FoodDonation.objects.all()  # Fetch all food donations
+    for donation in donations:
+        # Cards show the medium-size variants, not the full camera image
+        donation.image_webp_url = media.image_url(donation.food_image, 'medium', 'webp', donation.image_variants)
+        donation.image_jpg_url = media.image_url(donation.food_image, 'medium', 'jpg', donation.image_variants)
     return render(request, 'donation/order_list.html', {'donations': donations})
 
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.template.loader import render_to_string
-from geopy.distance import geodesic
-import folium
+from django.views.decorators.http import condition
 import json
+import logging
+import time
+import numpy as np
+
+from dead import tiles
+from foodsaver import geodistance, geojson, polyline
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_REGION = 'mumbai'  # settings.GRAPH_REGIONS key covering these sites
+ROUTE_ZOOM = 13  # simplify road routes to about a pixel at metro-wide zoom
+MAX_ROAD_LEGS = 12  # legs routed over roads per request; any further legs are drawn straight
+ROAD_ROUTING_BUDGET = 3.0  # seconds of road routing per request before the rest are drawn straight
 
 # Create the IndianFoodDeliverySystem class to manage the logic
 class IndianFoodDeliverySystem:
@@ -78,51 +99,75 @@ class IndianFoodDeliverySystem:
         }
 
     def calculate_distance(self, point1, point2):
-        return geodesic(point1, point2).kilometers
+        return geodistance.distance(point1, point2)
 
     def create_delivery_route(self, start_location, destinations):
+        # Greedy nearest-next tour over one precomputed distance matrix
+        stops = [start_location] + destinations
+        matrix = geodistance.pairwise([(loc['lat'], loc['lon']) for loc in stops])
+        visited = np.zeros(len(stops), dtype=bool)
+        visited[0] = True
         route = [start_location]
-        remaining_destinations = destinations.copy()
-        
-        while remaining_destinations:
-            current = route[-1]
-            current_pos = (current['lat'], current['lon'])
-            nearest = min(remaining_destinations, key=lambda x: self.calculate_distance(current_pos, (x['lat'], x['lon'])))
-            route.append(nearest)
-            remaining_destinations.remove(nearest)
+        current = 0
+        for _ in destinations:
+            current = int(np.argmin(np.where(visited, np.inf, matrix[current])))
+            visited[current] = True
+            route.append(stops[current])
         
         return route
 
-def create_map(delivery_system, selected_route=None):
-    # Generate folium map
-    all_lats = [loc['lat'] for category in delivery_system.locations.values() for loc in category]
-    all_lons = [loc['lon'] for category in delivery_system.locations.values() for loc in category]
-    
-    center_lat, center_lon = sum(all_lats) / len(all_lats), sum(all_lons) / len(all_lons)
-    m = folium.Map(location=[center_lat, center_lon], zoom_start=10)
-    
-    colors = {'Food Banks': 'green', 'Restaurants & Hotels': 'red', 'NGOs & Shelters': 'blue', 'Community Kitchens': 'purple'}
-    icons = {'Food Banks': 'home', 'Restaurants & Hotels': 'cutlery', 'NGOs & Shelters': 'heart', 'Community Kitchens': 'fire'}
-    
-    for category, locations in delivery_system.locations.items():
-        for loc in locations:
-            popup_content = f"{loc['name']}, {category}"
-            folium.Marker(
-                [loc['lat'], loc['lon']], 
-                popup=popup_content,
-                icon=folium.Icon(color=colors[category], icon=icons[category], prefix='fa')
-            ).add_to(m)
-    
-    if selected_route:
-        route_coords = [(loc['lat'], loc['lon']) for loc in selected_route]
-        folium.PolyLine(route_coords, color="red", weight=2.5, opacity=1).add_to(m)
-        
-    return m
+    def route_coords(self, route):
+        """(lat, lon) points along the roads through the stops of ``route``, when the
+        delivery region's tiled graph has been built; straight lines otherwise.
+        At most MAX_ROAD_LEGS legs and ROAD_ROUTING_BUDGET seconds go to road routing."""
+        points = [(loc['lat'], loc['lon']) for loc in route]
+        try:
+            region = tiles.get_region(DELIVERY_REGION)
+        except Exception as e:
+            logger.error(f"Error opening the {DELIVERY_REGION} graph tiles: {e}")
+            region = None
+        if region is None:
+            return points
+        deadline = time.monotonic() + ROAD_ROUTING_BUDGET
+        coords = points[:1]
+        for n, (origin, destination) in enumerate(zip(points, points[1:])):
+            leg = None
+            if n < MAX_ROAD_LEGS and time.monotonic() < deadline:
+                try:
+                    leg = region.route(origin, destination)
+                except tiles.StaleRegionError:
+                    region = tiles.get_region(DELIVERY_REGION) or region  # rebuilt; later legs use the new one
+                except Exception as e:
+                    logger.error(f"Error routing {origin} -> {destination}: {e}")
+            coords += (leg['coords'] if leg else []) + [destination]
+        tolerance = polyline.tolerance_for_zoom(ROUTE_ZOOM, points[0][0])
+        return [tuple(point) for point in polyline.simplify(coords, tolerance).tolist()]
+
+CATEGORY_STYLES = {
+    'Food Banks': {'color': 'green', 'icon': 'home'},
+    'Restaurants & Hotels': {'color': 'red', 'icon': 'cutlery'},
+    'NGOs & Shelters': {'color': 'blue', 'icon': 'heart'},
+    'Community Kitchens': {'color': 'purple', 'icon': 'fire'},
+}
+
+def build_locations_layer():
+    delivery_system = IndianFoodDeliverySystem()
+    return geojson.collection(
+        geojson.point(loc['lat'], loc['lon'], name=loc['name'], category=category, **CATEGORY_STYLES[category])
+        for category, locations in delivery_system.locations.items()
+        for loc in locations
+    )
+
+# Fixed set of sites: built once per process and revalidated by ETag (see foodsaver.geojson)
+locations_layer = geojson.StaticLayer(build_locations_layer, ttl=24 * 3600)
+
+@condition(etag_func=locations_layer.etag)
+def locations_geojson(request):
+    return locations_layer.response()
 
 def index(request):
-    delivery_system = IndianFoodDeliverySystem()
-    m = create_map(delivery_system)
-    return render(request, 'donation/route.html', {'map_html': m._repr_html_()})
+    # The page renders the base map client-side and loads locations_geojson once
+    return render(request, 'donation/route.html')
 
 def get_locations(request):
     delivery_system = IndianFoodDeliverySystem()
@@ -146,7 +191,8 @@ def generate_route(request):
         return JsonResponse({"error": "Invalid locations selected."}, status=400)
 
     route = delivery_system.create_delivery_route(start_location, destinations)
-    m = create_map(delivery_system, route)
-    
-    return JsonResponse({"map_html": m._repr_html_()})
+    # Only the new polyline; the markers are already on the client's map
+    stops = [loc['name'] for loc in route]
+    return JsonResponse({"route": geojson.line(delivery_system.route_coords(route), stops=stops),
+                         "stops": stops})
 
@@ -0,0 +1,176 @@
+"""SQLite connection tuning and a single-threaded batching writer.
+
+``configure_sqlite`` runs on every new connection (connected to Django's
+``connection_created`` signal in UserConfig.ready). It switches the database to
+WAL, so readers no longer block the writer or each other, and applies the other
+pragmas in ``SQLITE_PRAGMAS``.
+
+SQLite still allows only one writer at a time. ``BatchWriter`` funnels writes
+from every thread through one background thread, which applies whatever has
+queued up in a single transaction. Writers therefore queue in memory instead of
+spinning on the file lock, and a burst of small writes costs one commit.
+
+    item = FoodItem(name='milk', expiry_text='12 Jan 2025')
+    writer.submit(item.save).result(WRITE_TIMEOUT)   # wait for the commit
+    writer.add(LLMCall(...))                         # fire and forget, bulk inserted
+
+Every queued write's Future is resolved, with its exception if the batch could
+not be written, and a writer thread that died is restarted by the next submit.
+Callers still wait with a timeout, so a stuck database fails a request instead
+of hanging it.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+WRITE_TIMEOUT = 30  # seconds a request waits for its write to commit
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # safe with WAL: a power cut can lose the last commits, never corrupt
+    'busy_timeout': 20000,  # ms to wait for the write lock before "database is locked"
+    'cache_size': -64000,  # negative means KiB, so 64 MB of page cache per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to a new SQLite connection (connection_created receiver)"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+class BatchWriter:
+    """Apply queued writes from many threads on one thread, in batched transactions.
+
+    ``submit(fn, *args)`` queues a callable and returns a Future for its result;
+    ``add(obj)`` queues a model instance for ``bulk_create``. Consecutive adds of
+    the same model are inserted together. Each callable runs in its own savepoint,
+    so one failing write does not undo the rest of its batch. Queued callables run
+    on the writer thread and must not wait on other Futures from the same writer.
+    """
+
+    def __init__(self, name='db-writer', max_batch=500, max_delay=0.0, max_pending=10000):
+        self.name = name
+        self.max_batch = max_batch
+        # Seconds to wait for more work before committing. The default 0 is plain
+        # group commit: take what queued up during the previous commit and go.
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)``. Blocks only while the queue is full."""
+        future = Future()
+        self._start()
+        self._queue.put((future, fn, args, kwargs, None))
+        return future
+
+    def add(self, obj, block=True):
+        """Queue ``obj`` for bulk insertion. Raises queue.Full when ``block`` is False and the queue is full."""
+        future = Future()
+        self._start()
+        self._queue.put((future, None, (), {}, obj), block=block)
+        return future
+
+    def flush(self, timeout=WRITE_TIMEOUT):
+        """Wait until everything queued so far has been written"""
+        self.submit(lambda: None).result(timeout)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                                     else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                close_old_connections()
+                self._write(batch)
+            except BaseException as e:
+                # Never leave a caller waiting on a write this thread dropped
+                logger.error(f"Error writing a batch of {len(batch)} writes: {e}")
+                for future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise  # the thread exits; the next submit starts a new one
+
+    def _write(self, batch):
+        results = []
+        try:
+            with transaction.atomic():
+                i = 0
+                while i < len(batch):
+                    future, fn, args, kwargs, obj = batch[i]
+                    if obj is not None:
+                        # Group this run of adds for one model into a bulk insert
+                        run = [batch[i]]
+                        while i + len(run) < len(batch) and type(batch[i + len(run)][4]) is type(obj):
+                            run.append(batch[i + len(run)])
+                        outcome = self._insert(run)
+                        results.extend((entry[0], outcome) for entry in run)
+                        i += len(run)
+                        continue
+                    try:
+                        with transaction.atomic():
+                            results.append((future, (True, fn(*args, **kwargs))))
+                    except Exception as e:
+                        results.append((future, (False, e)))
+                    i += 1
+        except Exception as e:
+            logger.error(f"Error committing a batch of {len(batch)} writes: {e}")
+            results = [(entry[0], (False, e)) for entry in batch]
+
+        self.batches += 1
+        self.writes += len(batch)
+        for future, (ok, value) in results:
+            if future.done():
+                continue  # cancelled by its caller
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    def _insert(run):
+        objs = [entry[4] for entry in run]
+        try:
+            with transaction.atomic():
+                type(objs[0]).objects.bulk_create(objs)
+            return True, None
+        except Exception as e:
+            logger.error(f"Error inserting {len(objs)} {type(objs[0]).__name__} rows: {e}")
+            return False, e
+
+
+# Shared writer for the whole process
+writer = BatchWriter()
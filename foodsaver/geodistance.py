@@ -0,0 +1,105 @@
+"""Vectorized great-circle distances in kilometres.
+
+Drop-in for ``geopy.distance.geodesic(p1, p2).kilometers`` that works on whole
+arrays at once, so distance matrices over thousands of sites cost one NumPy
+call instead of a Python loop of geodesic calls.
+
+    distance((40.71, -74.0), (40.75, -73.99))   # one pair, like geodesic
+    one_to_many(user, sites)                      # vector of len(sites)
+    pairwise(sites)                               # len(sites) x len(sites)
+    cdist(origins, destinations)                  # len(origins) x len(destinations)
+
+Points are (lat, lon) pairs or an (n, 2) array. Two methods:
+
+    'haversine'  sphere of the mean Earth radius; off by up to ~0.5% against WGS84
+    'ellipsoid'  Andoyer-Lambert correction on WGS84; the default. Against Karney's
+                 geodesic it is within ~1.5 ppm up to ~6,000 km (well under a metre
+                 across a city) and ~5 ppm up to ~16,000 km. The approximation breaks
+                 down towards antipodal points (tens of km off for equatorial pairs
+                 ~180 degrees apart), so pairs with a central angle beyond
+                 NEAR_ANTIPODAL_ANGLE are measured with geopy's geodesic instead,
+                 one by one.
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # mean radius
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+NEAR_ANTIPODAL_ANGLE = 2.5  # radians of arc, ~16,000 km
+
+HAVERSINE = 'haversine'
+ELLIPSOID = 'ellipsoid'
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance on the mean sphere, broadcasting over array arguments"""
+    return EARTH_RADIUS_KM * _central_angle(np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2))
+
+
+def ellipsoidal(lat1, lon1, lat2, lon2):
+    """Andoyer-Lambert distance on the WGS84 ellipsoid, broadcasting over array arguments"""
+    # Reduced (parametric) latitudes put both points on the auxiliary sphere
+    beta1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    beta2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sigma = _central_angle(beta1, np.radians(lon1), beta2, np.radians(lon2))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        km = WGS84_A_KM * (sigma - WGS84_F / 2 * (x + y))
+    # Coincident points divide 0 by 0 above
+    km = np.where(sigma > 0, km, 0.0)
+    far = sigma > NEAR_ANTIPODAL_ANGLE
+    if np.any(far):
+        km = _geodesic_where(far, km, lat1, lon1, lat2, lon2)
+    return km
+
+
+KERNELS = {HAVERSINE: haversine, ELLIPSOID: ellipsoidal}
+
+
+def distance(point1, point2, method=ELLIPSOID):
+    """Kilometres between two (lat, lon) points"""
+    return float(KERNELS[method](point1[0], point1[1], point2[0], point2[1]))
+
+
+def one_to_many(origin, points, method=ELLIPSOID):
+    """Kilometres from ``origin`` to each of ``points``"""
+    lat, lon = _split(points)
+    return KERNELS[method](origin[0], origin[1], lat, lon)
+
+
+def cdist(origins, destinations, method=ELLIPSOID):
+    """len(origins) x len(destinations) matrix of kilometres"""
+    lat1, lon1 = _split(origins)
+    lat2, lon2 = _split(destinations)
+    return KERNELS[method](lat1[:, None], lon1[:, None], lat2[None, :], lon2[None, :])
+
+
+def pairwise(points, method=ELLIPSOID):
+    """Symmetric matrix of kilometres between every pair of ``points``"""
+    return cdist(points, points, method)
+
+
+def _geodesic_where(mask, km, lat1, lon1, lat2, lon2):
+    """``km`` with the entries under ``mask`` replaced by geopy's (Karney's) geodesic"""
+    from geopy.distance import geodesic
+
+    km = np.array(km, dtype=np.float64)
+    shape = km.shape
+    lat1, lon1, lat2, lon2 = (np.broadcast_to(v, shape) for v in (lat1, lon1, lat2, lon2))
+    for index in map(tuple, np.argwhere(mask)):
+        km[index] = geodesic((lat1[index], lon1[index]), (lat2[index], lon2[index])).km
+    return km
+
+
+def _central_angle(lat1, lon1, lat2, lon2):
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def _split(points):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return points[:, 0], points[:, 1]
@@ -0,0 +1,77 @@
+"""GeoJSON builders and cached, ETagged map layers.
+
+Map pages draw their Leaflet base map once in the browser and fetch their
+markers from layer endpoints, so an interaction only has to send what changed
+(a route polyline, a list of nearby sites) instead of a whole folium document.
+
+A ``StaticLayer`` builds its FeatureCollection at most once per ``ttl`` seconds
+per process and keeps the encoded body with a content-hash ETag:
+
+    food_banks_layer = StaticLayer(build_food_banks)
+
+    @condition(etag_func=food_banks_layer.etag)
+    def food_banks_geojson(request):
+        return food_banks_layer.response()
+
+Revalidating clients get a bodiless 304 until the content actually changes.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+
+CONTENT_TYPE = 'application/geo+json'
+
+
+def point(lat, lon, **properties):
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': properties}
+
+
+def line(coords, **properties):
+    """LineString feature from (lat, lon) pairs. GeoJSON itself is [lon, lat]."""
+    return {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': [[lon, lat] for lat, lon in coords]},
+            'properties': properties}
+
+
+def collection(features):
+    return {'type': 'FeatureCollection', 'features': list(features)}
+
+
+class StaticLayer:
+    def __init__(self, build, ttl=600, max_age=300):
+        self.build = build  # () -> FeatureCollection dict
+        self.ttl = ttl
+        self.max_age = max_age  # how long browsers may reuse it before revalidating
+        self._body = None
+        self._etag = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """(encoded body, etag), rebuilding when older than ttl"""
+        if self._body is None or time.monotonic() - self._built_at > self.ttl:
+            with self._lock:
+                if self._body is None or time.monotonic() - self._built_at > self.ttl:
+                    body = json.dumps(self.build(), separators=(',', ':')).encode()
+                    self._etag = hashlib.sha256(body).hexdigest()[:32]
+                    self._body = body
+                    self._built_at = time.monotonic()
+        return self._body, self._etag
+
+    def etag(self, request, *args, **kwargs):
+        """etag_func for django.views.decorators.http.condition"""
+        return self.get()[1]
+
+    def response(self):
+        body, _ = self.get()
+        response = HttpResponse(body, content_type=CONTENT_TYPE)
+        patch_cache_control(response, public=True, max_age=self.max_age)
+        return response
+
+    def invalidate(self):
+        with self._lock:
+            self._body = None
@@ -0,0 +1,178 @@
+"""Content-addressed image uploads with background-built derivatives.
+
+Each upload is stored once, at a path derived from the SHA-256 of its bytes
+(``food_images/ab/cd/abcd....jpg``), so uploading the same photo again reuses the
+existing file. Downscaled JPEG and WebP variants for each size in ``SIZES`` are
+then built in a small worker pool and written next to the original
+(``abcd..._thumb.webp``). Rows that point at an image record which variants
+exist (``available_variants`` when they are saved, then ``derivatives_built``
+once the pool finishes), and ``image_url`` builds URLs from that list without
+touching storage, falling back to the original until a variant is recorded.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Size name -> longest edge in pixels
+SIZES = {
+    'thumb': 320,
+    'medium': 960,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp'}
+DERIVATIVE_WORKERS = 2
+
+StoredFile = namedtuple('StoredFile', ['name', 'digest', 'created'])
+
+# Sent with ``name`` and ``variants`` (see available_variants) once every variant of a file exists
+derivatives_built = Signal()
+
+_executor = ThreadPoolExecutor(max_workers=DERIVATIVE_WORKERS, thread_name_prefix='derivatives')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def content_name(digest, original_name, prefix):
+    ext = os.path.splitext(original_name or '')[1].lower()
+    if ext not in IMAGE_EXTENSIONS:
+        ext = '.bin'
+    return f'{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+
+def file_digest(file):
+    sha = hashlib.sha256()
+    for chunk in file.chunks():
+        sha.update(chunk)
+    return sha.hexdigest()
+
+
+def store_upload(uploaded_file, prefix='food_images', derivatives=True, digest=None):
+    """Store an uploaded file under its content hash, once. Returns a StoredFile.
+
+    Pass ``digest`` when the SHA-256 is already known to skip hashing again. The
+    file is rewound afterwards so callers can read it again.
+    """
+    digest = digest or file_digest(uploaded_file)
+    name = content_name(digest, uploaded_file.name, prefix)
+
+    created = False
+    if not default_storage.exists(name):
+        uploaded_file.seek(0)
+        saved = default_storage.save(name, uploaded_file)
+        if saved != name:
+            # Lost a race with an identical upload; keep the first copy
+            default_storage.delete(saved)
+        created = True
+    uploaded_file.seek(0)
+
+    if derivatives and os.path.splitext(name)[1] in IMAGE_EXTENSIONS:
+        schedule_derivatives(name)
+    return StoredFile(name, digest, created)
+
+
+def derivative_name(name, size, fmt):
+    return f'{os.path.splitext(name)[0]}_{size}.{fmt}'
+
+
+def variant_key(size, fmt):
+    return f'{size}_{fmt}'
+
+
+def available_variants(name):
+    """Keys ('thumb_webp', ...) of the variants of ``name`` already in storage.
+    Checks storage, so call it when saving a row and keep the result on the row."""
+    if not name:
+        return []
+    name = str(name)
+    return [variant_key(size, fmt) for size in SIZES for fmt in FORMATS
+            if default_storage.exists(derivative_name(name, size, fmt))]
+
+
+def build_derivatives(name):
+    """Write every missing size/format variant of ``name``, then send derivatives_built.
+    Returns the names written."""
+    wanted = [(size, fmt) for size in SIZES for fmt in FORMATS
+              if not default_storage.exists(derivative_name(name, size, fmt))]
+    if not wanted:
+        _announce(name)
+        return []
+
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+
+    written = []
+    for size, fmt in wanted:
+        variant = image.copy()
+        variant.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+        pil_format, options = FORMATS[fmt]
+        buffer = io.BytesIO()
+        variant.save(buffer, pil_format, **options)
+        target = derivative_name(name, size, fmt)
+        saved = default_storage.save(target, ContentFile(buffer.getvalue()))
+        if saved != target:
+            default_storage.delete(saved)  # built concurrently elsewhere
+        written.append(target)
+    _announce(name)
+    return written
+
+
+def _announce(name):
+    variants = [variant_key(size, fmt) for size in SIZES for fmt in FORMATS]
+    derivatives_built.send(sender=None, name=str(name), variants=variants)
+
+
+def _build_in_background(name):
+    try:
+        build_derivatives(name)
+    except Exception as e:
+        logger.error(f"Error building image derivatives for {name}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def schedule_derivatives(name):
+    """Build the variants of ``name`` in the worker pool, once per file at a time"""
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _executor.submit(_build_in_background, name)
+
+
+def image_url(name, size=None, fmt='webp', variants=()):
+    """URL of the ``size`` variant of a stored image when ``variants`` (as recorded on
+    its row) lists it, else of the original. Never touches storage."""
+    if not name:
+        return None
+    name = str(name)
+    if size is not None and variant_key(size, fmt) in variants:
+        return default_storage.url(derivative_name(name, size, fmt))
+    return default_storage.url(name)
+
+
+def image_urls(name, variants=()):
+    """All variant URLs of a stored image plus the original, keyed 'original' and '<size>_<fmt>'"""
+    if not name:
+        return None
+    urls = {'original': default_storage.url(str(name))}
+    for size in SIZES:
+        for fmt in FORMATS:
+            urls[variant_key(size, fmt)] = image_url(name, size, fmt, variants)
+    return urls
@@ -0,0 +1,84 @@
+"""Route geometry compaction: Douglas-Peucker simplification and encoded polylines.
+
+A walking route has one point per graph node, far more than a map can show at
+most zoom levels. ``simplify`` drops points that stay within ``tolerance``
+metres of the simplified line, and ``tolerance_for_zoom`` picks that tolerance
+as about a pixel at a web-map zoom level. ``encode`` then packs the points into
+Google's encoded polyline format (delta-encoded integers, about 5 bytes per
+point instead of ~40 as JSON floats), which Leaflet pages decode in a few lines.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_PIXEL_AT_ZOOM_0 = 156543.03392  # web-mercator ground resolution at the equator
+PIXEL_TOLERANCE = 1.0
+PRECISION = 5
+
+
+def tolerance_for_zoom(zoom, lat, pixels=PIXEL_TOLERANCE):
+    """Metres that ``pixels`` screen pixels cover at ``zoom`` and latitude ``lat``"""
+    return pixels * METRES_PER_PIXEL_AT_ZOOM_0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def simplify(coords, tolerance):
+    """Douglas-Peucker over (lat, lon) points with ``tolerance`` in metres. Keeps both ends."""
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+    # Local equirectangular metres; plenty for route-length spans
+    lat0 = math.radians(float(points[:, 0].mean()))
+    x = np.radians(points[:, 1]) * math.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(points[:, 0]) * EARTH_RADIUS_M
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length_sq = dx * dx + dy * dy
+        # Distance from each inner point to the segment (not the infinite line)
+        t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0) if length_sq > 0 else 0.0
+        distances = np.hypot(px - t * dx, py - t * dy)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def encode(coords, precision=PRECISION):
+    """Google encoded polyline string for (lat, lon) points"""
+    values = np.round(np.asarray(coords, dtype=np.float64).reshape(-1, 2) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    chunks = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def decode(text, precision=PRECISION):
+    """(lat, lon) points from an encoded polyline"""
+    values = []
+    value = shift = 0
+    for char in text:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    coords = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return [tuple(point) for point in coords.tolist()]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -84,10 +85,27 @@ WSGI_APPLICATION = 'foodsaver.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# foodsaver.db applies WAL and the other SQLite pragmas to every new connection.
+# Connections are kept open between requests for DB_CONN_MAX_AGE seconds.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Holds the rendered dashboard fragment and the inventory version that invalidates
+# it. With several worker processes use a shared backend (Redis, Memcached or
+# FileBasedCache) so a change made in one worker invalidates the others.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -145,3 +163,32 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cross-process lock file for foodsaver.singleflight. Leave as None for a single
+# process; point it at a shared SQLite file when running several workers.
+SINGLEFLIGHT_LOCK_PATH = os.getenv('SINGLEFLIGHT_LOCK_PATH') or None
+
+# Partial files and state for chunked, resumable uploads (user.resumable). Kept
+# outside MEDIA_ROOT so incomplete uploads are never served.
+RESUMABLE_UPLOAD_DIR = os.getenv('RESUMABLE_UPLOAD_DIR') or os.path.join(BASE_DIR, 'uploads_partial')
+
+# Rejected rows of bulk imports (user.views.bulk_import_api). They hold raw user
+# records, so they live outside MEDIA_ROOT and are only served to logged-in users.
+IMPORT_REJECT_DIR = os.getenv('IMPORT_REJECT_DIR') or os.path.join(BASE_DIR, 'import_rejects')
+
+# Memory-mapped street-network graphs for routing (dead.graphstore). Places listed
+# here are loaded at startup; build them with 'manage.py build_graph_store'.
+GRAPH_STORE_DIR = os.getenv('GRAPH_STORE_DIR') or os.path.join(BASE_DIR, 'cache', 'graphs')
+GRAPH_STORE_PLACES = ['Manhattan, New York, USA']
+
+# Regions too large to map whole into every worker are split into tiles that load
+# per route (dead.tiles); build them with 'manage.py build_graph_tiles'. Loaded
+# tiles of all regions share one LRU of GRAPH_TILE_BUDGET_MB per process.
+GRAPH_REGIONS = {
+    'mumbai': {'places': ['Mumbai, India', 'Thane, India', 'Kalyan-Dombivli, India'], 'network_type': 'drive'},
+}
+GRAPH_TILE_BUDGET_MB = int(os.getenv('GRAPH_TILE_BUDGET_MB', '256'))
+
+# Geocoder behind the dead.geocoding cache: 'google' (needs GOOGLE_MAPS_API_KEY) or
+# 'offline' to answer only from addresses already in the GeocodeResult table.
+GEOCODER = os.getenv('GEOCODER', 'google')
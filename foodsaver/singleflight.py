@@ -0,0 +1,121 @@
+"""Single-flight: collapse concurrent identical computations into one.
+
+When several requests ask for the same expensive result at once (the same recipe
+payload, the same OCR image, the street graph on a cold start), the first caller
+runs the computation and the rest wait for it and share its result or error.
+
+    recipe_flight = SingleFlight()
+    text = recipe_flight.do(cache_key, call_gemini, prompt)
+
+Within a process this is coordinated with threads. When ``SINGLEFLIGHT_LOCK_PATH``
+is set in settings, the running computation also holds a lock row in a small
+SQLite database, so the leaders in different worker processes take turns. The
+computation should then check a shared store (database, disk) first, so that
+only the first process actually does the work.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, lock_path=None):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._lock_path = lock_path
+
+    @property
+    def lock_path(self):
+        return self._lock_path or getattr(settings, 'SINGLEFLIGHT_LOCK_PATH', None)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` unless a call for ``key`` is already running,
+        in which case wait for it and return (or raise) its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_path:
+                with sqlite_lock(self.lock_path, key):
+                    call.result = fn(*args, **kwargs)
+            else:
+                call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """Keys currently being computed, with how many callers are waiting on each"""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+
+@contextmanager
+def sqlite_lock(path, key, timeout=300.0, ttl=600.0, poll_interval=0.05):
+    """Hold a named lock shared by every process using the same SQLite file.
+
+    Locks expire after ``ttl`` seconds, so a crashed holder can't block others forever.
+    Raises ``TimeoutError`` if the lock can't be taken within ``timeout`` seconds.
+    """
+    owner = f'{os.getpid()}:{uuid.uuid4().hex}'
+    conn = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+    try:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS flight_locks (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)'
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM flight_locks WHERE key = ? AND expires_at < ?', (key, now))
+                acquired = conn.execute(
+                    'INSERT OR IGNORE INTO flight_locks (key, owner, expires_at) VALUES (?, ?, ?)',
+                    (key, owner, now + ttl),
+                ).rowcount == 1
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            if acquired:
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Timed out waiting for single-flight lock {key!r}')
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, 1.0)
+
+        try:
+            yield
+        finally:
+            conn.execute('DELETE FROM flight_locks WHERE key = ? AND owner = ?', (key, owner))
+    finally:
+        conn.close()
@@ -0,0 +1,82 @@
+import threading
+from unittest import mock
+
+from django.db import IntegrityError, connection
+from django.test import TransactionTestCase
+
+from foodsaver.db import SQLITE_PRAGMAS, BatchWriter
+from user.models import FoodItem
+
+
+class WriterCrash(BaseException):
+    pass
+
+
+class BatchWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.writer = BatchWriter(name='test-writer')
+
+    def hold(self):
+        """Keep the writer thread busy so that what is queued next lands in one batch"""
+        release = threading.Event()
+        started = threading.Event()
+
+        def wait():
+            started.set()
+            release.wait(10)
+        self.writer.submit(wait)
+        started.wait(10)
+        return release
+
+    def test_writes_and_results(self):
+        item = FoodItem(name='milk', expiry_text='2025-06-01')
+        self.assertIsNone(self.writer.submit(item.save).result(10))
+        self.assertEqual(self.writer.submit(FoodItem.objects.count).result(10), 1)
+        futures = [self.writer.add(FoodItem(name=f'item {i}')) for i in range(20)]
+        self.writer.flush()
+        self.assertTrue(all(f.done() and f.exception() is None for f in futures))
+        self.assertEqual(FoodItem.objects.count(), 21)
+
+    def test_one_failing_write_keeps_the_rest_of_its_batch(self):
+        release = self.hold()
+        before = self.writer.submit(FoodItem.objects.create, name='before')
+        failing = self.writer.submit(FoodItem.objects.create, name=None)
+        bad_insert = self.writer.add(FoodItem(name=None))
+        self.writer.submit(FoodItem.objects.count)  # ends the run of adds, which share one insert
+        after = self.writer.add(FoodItem(name='after'))
+        batches = self.writer.batches
+        release.set()
+        self.writer.flush()
+
+        self.assertEqual(self.writer.batches, batches + 2)  # the queued writes went in one batch (+ flush)
+        self.assertIsInstance(failing.exception(10), IntegrityError)
+        self.assertIsInstance(bad_insert.exception(10), IntegrityError)
+        self.assertIsNone(after.exception(10))
+        self.assertEqual(before.result(10).name, 'before')
+        self.assertEqual(sorted(FoodItem.objects.values_list('name', flat=True)), ['after', 'before'])
+
+    def test_futures_resolved_when_a_batch_fails(self):
+        release = self.hold()
+        futures = [self.writer.submit(FoodItem.objects.count) for _ in range(3)]
+        futures.append(self.writer.add(FoodItem(name='milk')))
+        with mock.patch('foodsaver.db.close_old_connections', side_effect=RuntimeError('no connection')):
+            release.set()
+            for future in futures:
+                self.assertIsInstance(future.exception(10), RuntimeError)
+        self.assertEqual(self.writer.submit(FoodItem.objects.count).result(10), 0)
+
+    def test_dead_thread_is_restarted(self):
+        release = self.hold()
+        lost = self.writer.submit(FoodItem.objects.count)
+        with mock.patch('foodsaver.db.close_old_connections', side_effect=WriterCrash), \
+                mock.patch('threading.excepthook'):
+            release.set()
+            self.assertIsInstance(lost.exception(10), WriterCrash)
+            self.writer._thread.join(10)
+        self.assertFalse(self.writer._thread.is_alive())
+        self.assertEqual(self.writer.submit(FoodItem.objects.count).result(10), 0)
+
+    def test_connections_get_the_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], SQLITE_PRAGMAS['busy_timeout'])
@@ -0,0 +1,54 @@
+import numpy as np
+from django.test import SimpleTestCase
+from geopy.distance import geodesic, great_circle
+
+from foodsaver import geodistance
+
+
+class GeodistanceTests(SimpleTestCase):
+    def random_pairs(self, count, seed):
+        rng = np.random.default_rng(seed)
+        lat1, lat2 = rng.uniform(-80, 80, count), rng.uniform(-80, 80, count)
+        lon1, lon2 = rng.uniform(-180, 180, count), rng.uniform(-180, 180, count)
+        return lat1, lon1, lat2, lon2
+
+    def test_ellipsoid_within_documented_error(self):
+        lat1, lon1, lat2, lon2 = self.random_pairs(400, seed=1)
+        km = geodistance.ellipsoidal(lat1, lon1, lat2, lon2)
+        for i in range(len(km)):
+            expected = geodesic((lat1[i], lon1[i]), (lat2[i], lon2[i])).km
+            ppm = 1.5 if expected < 6000 else 5
+            with self.subTest(pair=i, km=expected):
+                self.assertLessEqual(abs(km[i] - expected), expected * ppm * 1e-6 + 1e-6)
+
+    def test_city_scale(self):
+        rng = np.random.default_rng(2)
+        origin = (40.7128, -74.006)
+        points = np.column_stack([origin[0] + rng.normal(0, 0.05, 200), origin[1] + rng.normal(0, 0.05, 200)])
+        km = geodistance.one_to_many(origin, points)
+        expected = [geodesic(origin, point).km for point in points]
+        np.testing.assert_allclose(km, expected, atol=1e-3)  # under a metre
+        self.assertEqual(geodistance.distance(origin, origin), 0.0)
+
+    def test_near_antipodal_pairs_fall_back_to_geodesic(self):
+        pairs = [((0.0, 0.0), (0.5, 179.7)), ((10.0, 20.0), (-10.0, -160.0)), ((0.0, 0.0), (0.0, 180.0))]
+        for a, b in pairs:
+            with self.subTest(a=a, b=b):
+                self.assertAlmostEqual(geodistance.distance(a, b), geodesic(a, b).km, places=6)
+
+    def test_haversine_matches_great_circle(self):
+        lat1, lon1, lat2, lon2 = self.random_pairs(100, seed=3)
+        km = geodistance.haversine(lat1, lon1, lat2, lon2)
+        expected = [great_circle((lat1[i], lon1[i]), (lat2[i], lon2[i]), radius=geodistance.EARTH_RADIUS_KM).km
+                    for i in range(100)]
+        np.testing.assert_allclose(km, expected, rtol=1e-9)
+
+    def test_matrix_shapes(self):
+        sites = [(40.7, -74.0), (40.8, -73.9), (34.05, -118.24)]
+        matrix = geodistance.pairwise(sites)
+        self.assertEqual(matrix.shape, (3, 3))
+        np.testing.assert_allclose(matrix, matrix.T)
+        np.testing.assert_array_equal(np.diag(matrix), 0)
+        cdist = geodistance.cdist(sites[:1], sites, method=geodistance.HAVERSINE)
+        self.assertEqual(cdist.shape, (1, 3))
+        self.assertAlmostEqual(cdist[0, 2], geodistance.distance(sites[0], sites[2], geodistance.HAVERSINE))
@@ -0,0 +1,48 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from dead import views
+from foodsaver import geojson
+
+
+class GeoJSONTests(SimpleTestCase):
+    def test_features_are_lon_lat(self):
+        feature = geojson.point(40.7, -74.0, name='bank')
+        self.assertEqual(feature['geometry'], {'type': 'Point', 'coordinates': [-74.0, 40.7]})
+        self.assertEqual(feature['properties'], {'name': 'bank'})
+        line = geojson.line([(40.7, -74.0), (40.8, -73.9)], distance_km=1.2)
+        self.assertEqual(line['geometry']['coordinates'], [[-74.0, 40.7], [-73.9, 40.8]])
+        self.assertEqual(geojson.collection(iter([feature]))['features'], [feature])
+
+    def test_static_layer_builds_once_per_ttl(self):
+        build = mock.Mock(return_value=geojson.collection([geojson.point(1, 2)]))
+        layer = geojson.StaticLayer(build, ttl=600)
+        body, etag = layer.get()
+        self.assertEqual(layer.get(), (body, etag))
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(json.loads(body)['features'][0]['geometry']['coordinates'], [2, 1])
+
+        build.return_value = geojson.collection([geojson.point(3, 4)])
+        layer.invalidate()
+        self.assertNotEqual(layer.get()[1], etag)
+        with mock.patch('foodsaver.geojson.time.monotonic', return_value=layer._built_at + 601):
+            layer.get()
+        self.assertEqual(build.call_count, 3)
+
+
+class FoodBanksLayerTests(TestCase):
+    def test_conditional_get(self):
+        coords = {address: (40.7 + i / 100, -74.0) for i, address in enumerate(views.load_sample_food_banks()['address'])}
+        with mock.patch('dead.geocoding.geocode_many', return_value=coords):
+            views.food_banks_layer.invalidate()
+            self.addCleanup(views.food_banks_layer.invalidate)
+            response = self.client.get('/map/food_banks.geojson')
+            self.assertEqual(response['Content-Type'], geojson.CONTENT_TYPE)
+            self.assertIn('max-age=300', response['Cache-Control'])
+            self.assertEqual(len(json.loads(response.content)['features']), len(coords))
+
+            again = self.client.get('/map/food_banks.geojson', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
@@ -0,0 +1,111 @@
+import io
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from donation.models import FoodDonation
+from foodsaver import media
+from foodsaver.db import writer as db_writer
+from user.models import FoodItem
+
+
+def photo(name='photo.jpg', size=(1200, 800), color=(200, 40, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+class MediaStorageMixin:
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(MEDIA_ROOT=directory.name, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class MediaTests(MediaStorageMixin, SimpleTestCase):
+    def test_names(self):
+        digest = 'abcdef' + '0' * 58
+        self.assertEqual(media.content_name(digest, 'Photo.JPG', 'food_images'),
+                         f'food_images/ab/cd/{digest}.jpg')
+        self.assertTrue(media.content_name(digest, 'notes.exe', 'x').endswith('.bin'))
+        self.assertEqual(media.derivative_name('food_images/a/b/abc.jpg', 'thumb', 'webp'),
+                         'food_images/a/b/abc_thumb.webp')
+        self.assertEqual(media.variant_key('thumb', 'webp'), 'thumb_webp')
+
+    def test_store_upload_dedups_by_content(self):
+        first = media.store_upload(photo('a.jpg'), derivatives=False)
+        second = media.store_upload(photo('b.jpg'), derivatives=False)
+        other = media.store_upload(photo('c.jpg', color=(0, 0, 0)), derivatives=False)
+        self.assertTrue(first.created)
+        self.assertFalse(second.created)
+        self.assertEqual(first.name, second.name)
+        self.assertNotEqual(first.name, other.name)
+
+    def test_build_derivatives(self):
+        stored = media.store_upload(photo(), derivatives=False)
+        self.assertEqual(media.available_variants(stored.name), [])
+        sent = []
+
+        def receiver(sender, **kwargs):
+            sent.append(kwargs)
+        media.derivatives_built.connect(receiver)
+        self.addCleanup(media.derivatives_built.disconnect, receiver)
+
+        written = media.build_derivatives(stored.name)
+        every = [media.variant_key(size, fmt) for size in media.SIZES for fmt in media.FORMATS]
+        self.assertEqual(len(written), len(every))
+        self.assertEqual(sorted(media.available_variants(stored.name)), sorted(every))
+        with default_storage.open(media.derivative_name(stored.name, 'thumb', 'webp')) as f:
+            self.assertEqual(Image.open(f).size, (320, 213))
+        self.assertEqual(media.build_derivatives(stored.name), [])  # nothing left to build
+        self.assertEqual([s['name'] for s in sent], [stored.name, stored.name])
+        self.assertEqual(sent[0]['variants'], every)
+
+    def test_image_url_does_not_touch_storage(self):
+        name = 'food_images/ab/cd/abcd.jpg'
+        with mock.patch.object(default_storage, 'exists', side_effect=AssertionError('storage touched')):
+            self.assertEqual(media.image_url(name, 'thumb'), '/media/food_images/ab/cd/abcd.jpg')
+            self.assertEqual(media.image_url(name, 'thumb', variants=['thumb_webp']),
+                             '/media/food_images/ab/cd/abcd_thumb.webp')
+            urls = media.image_urls(name, variants=['medium_jpg'])
+        self.assertEqual(urls['medium_jpg'], '/media/food_images/ab/cd/abcd_medium.jpg')
+        self.assertEqual(urls['thumb_webp'], urls['original'])
+        self.assertIsNone(media.image_url(''))
+
+
+class VariantRecordingTests(MediaStorageMixin, TransactionTestCase):
+    def test_built_variants_are_recorded_on_rows(self):
+        stored = media.store_upload(photo(), derivatives=False)
+        item = FoodItem.objects.create(name='milk', expiry_text='2025-06-01', image=stored.name)
+        donation = FoodDonation.objects.create(food_name='soup', quantity=3, category='Vegan',
+                                               expiry_date='2025-06-01', location='here', food_image=stored.name)
+        self.assertEqual((item.image_variants, donation.image_variants), ([], []))
+
+        media.build_derivatives(stored.name)
+        db_writer.flush()
+        item.refresh_from_db()
+        donation.refresh_from_db()
+        self.assertEqual(len(item.image_variants), len(media.SIZES) * len(media.FORMATS))
+        self.assertEqual(donation.image_variants, item.image_variants)
+
+    def test_donation_save_checks_storage_only_for_a_new_image(self):
+        donation = FoodDonation.objects.create(food_name='soup', quantity=3, category='Vegan',
+                                               expiry_date='2025-06-01', location='here', food_image='a.jpg')
+        with mock.patch('foodsaver.media.available_variants', return_value=['thumb_webp']) as variants:
+            donation = FoodDonation.objects.get(pk=donation.pk)
+            donation.quantity = 2
+            donation.save()
+            variants.assert_not_called()
+
+            donation.food_image = 'b.jpg'
+            donation.save(update_fields=['food_image'])
+            variants.assert_called_once()
+        donation.refresh_from_db()
+        self.assertEqual(donation.image_variants, ['thumb_webp'])
@@ -0,0 +1,60 @@
+import math
+import random
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from foodsaver import polyline
+
+
+def segment_distance(point, a, b, lat0):
+    """Metres from ``point`` to segment a-b, in the same local projection simplify uses"""
+    def project(p):
+        return (math.radians(p[1]) * math.cos(lat0) * polyline.EARTH_RADIUS_M,
+                math.radians(p[0]) * polyline.EARTH_RADIUS_M)
+    (px, py), (ax, ay), (bx, by) = project(point), project(a), project(b)
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = min(max(((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0), 1.0) if length_sq else 0.0
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
+
+
+class PolylineTests(SimpleTestCase):
+    def test_reference_example(self):
+        coords = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        text = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+        self.assertEqual(polyline.encode(coords), text)
+        self.assertEqual(polyline.decode(text), coords)
+
+    def test_round_trip(self):
+        rng = random.Random(5)
+        coords = [(round(rng.uniform(-85, 85), 5), round(rng.uniform(-180, 180), 5)) for _ in range(200)]
+        decoded = polyline.decode(polyline.encode(coords))
+        self.assertEqual(len(decoded), len(coords))
+        for (lat, lon), (expected_lat, expected_lon) in zip(decoded, coords):
+            self.assertAlmostEqual(lat, expected_lat, places=5)
+            self.assertAlmostEqual(lon, expected_lon, places=5)
+        self.assertEqual(polyline.decode(polyline.encode([])), [])
+
+    def test_simplify_keeps_endpoints(self):
+        line = [(19.0 + i * 1e-4, 72.8 + (i % 2) * 1e-7) for i in range(50)]
+        simplified = [tuple(point) for point in polyline.simplify(line, polyline.tolerance_for_zoom(12, 19.0)).tolist()]
+        self.assertEqual(simplified[0], line[0])
+        self.assertEqual(simplified[-1], line[-1])
+        self.assertLess(len(simplified), len(line))
+
+    def test_simplify_stays_within_tolerance(self):
+        rng = np.random.default_rng(8)
+        steps = rng.normal(0, 1e-4, size=(400, 2)).cumsum(axis=0)
+        route = [tuple(p) for p in (np.array([40.75, -73.98]) + steps).tolist()]
+        lat0 = math.radians(np.mean([p[0] for p in route]))
+        for zoom in (12, 15, 18):
+            tolerance = polyline.tolerance_for_zoom(zoom, route[0][0])
+            kept = [tuple(p) for p in polyline.simplify(route, tolerance).tolist()]
+            positions = [route.index(p) for p in kept]
+            self.assertEqual(positions, sorted(positions))
+            for a, b in zip(positions, positions[1:]):
+                for i in range(a + 1, b):
+                    self.assertLessEqual(segment_distance(route[i], route[a], route[b], lat0), tolerance + 1e-6)
+        self.assertEqual(len(polyline.simplify(route[:2], 100)), 2)
+        self.assertAlmostEqual(polyline.tolerance_for_zoom(0, 0.0), polyline.METRES_PER_PIXEL_AT_ZOOM_0)
@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from foodsaver.singleflight import SingleFlight, sqlite_lock
+
+
+def _try_lock(path, key, queue):
+    try:
+        with sqlite_lock(path, key, timeout=0.3):
+            queue.put('acquired')
+    except TimeoutError:
+        queue.put('timeout')
+
+
+@override_settings(SINGLEFLIGHT_LOCK_PATH=None)
+class SingleFlightTests(SimpleTestCase):
+    def run_callers(self, flight, n, key, fn):
+        outcomes = [None] * n
+
+        def call(i):
+            try:
+                outcomes[i] = flight.do(key, fn)
+            except Exception as e:
+                outcomes[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+        for thread in threads:
+            thread.start()
+        return threads, outcomes
+
+    def wait_for_waiters(self, flight, key, count):
+        deadline = time.monotonic() + 5
+        while flight.in_flight().get(key) != count:
+            self.assertLess(time.monotonic(), deadline, 'callers never queued up')
+            time.sleep(0.005)
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return object()
+
+        threads, outcomes = self.run_callers(flight, 8, 'recipe', compute)
+        self.wait_for_waiters(flight, 'recipe', 7)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(outcome is outcomes[0] for outcome in outcomes))
+        self.assertEqual(flight.in_flight(), {})
+        # Nothing is cached once the call is over
+        self.assertIsNot(flight.do('recipe', compute), outcomes[0])
+
+    def test_error_reaches_every_caller(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ValueError('upstream down')
+
+        threads, outcomes = self.run_callers(flight, 4, 'ocr', fail)
+        self.wait_for_waiters(flight, 'ocr', 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(isinstance(outcome, ValueError) for outcome in outcomes))
+        self.assertEqual(flight.in_flight(), {})
+
+    def test_lock_path_serializes_leaders(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Two flights stand in for two processes: each has its own leader for the key
+            flights = [SingleFlight(lock_path=os.path.join(directory, 'locks.sqlite3')) for _ in range(2)]
+            holding, peak = [0], [0]
+            lock = threading.Lock()
+
+            def compute():
+                with lock:
+                    holding[0] += 1
+                    peak[0] = max(peak[0], holding[0])
+                time.sleep(0.05)
+                with lock:
+                    holding[0] -= 1
+
+            threads = [threading.Thread(target=flight.do, args=('graph', compute)) for flight in flights]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(peak[0], 1)
+
+
+class SqliteLockTests(SimpleTestCase):
+    def test_excludes_other_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'locks.sqlite3')
+            context = multiprocessing.get_context('fork')
+            queue = context.Queue()
+            with sqlite_lock(path, 'upload:1'):
+                process = context.Process(target=_try_lock, args=(path, 'upload:1', queue))
+                process.start()
+                process.join(10)
+                self.assertEqual(queue.get(timeout=1), 'timeout')
+                # Other keys are independent
+                with sqlite_lock(path, 'upload:2', timeout=0.3):
+                    pass
+            process = context.Process(target=_try_lock, args=(path, 'upload:1', queue))
+            process.start()
+            process.join(10)
+            self.assertEqual(queue.get(timeout=1), 'acquired')
+
+    def test_expired_lock_is_taken_over(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'locks.sqlite3')
+            with sqlite_lock(path, 'stuck', ttl=0.05):
+                time.sleep(0.1)
+                with sqlite_lock(path, 'stuck', timeout=1):
+                    pass
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from.models import FoodItem, FoodItemPurchase
+from.models import FoodItem, FoodItemPurchase, LLMCall
 # Register your models here.
 admin.site.register(FoodItemPurchase)
 admin.site.register(FoodItem)
+admin.site.register(LLMCall)
@@ -0,0 +1,129 @@
+"""Waste analytics served from the materialized rollups in user.rollups.
+
+Every query here reads ``HouseholdMonthlyWaste`` or ``MonthlyConsumption`` by
+period range, so a report costs an index range scan over at most one row per
+month (household) or per item-month, however many raw purchases lie behind it.
+"""
+from datetime import date
+
+from django.db.models import Sum
+
+from .models import HouseholdMonthlyWaste, MonthlyConsumption
+from .rollups import waste_ratio
+
+DEFAULT_MONTHS = 12
+DEFAULT_TOP = 10
+MAX_TOP = 100
+
+
+class AnalyticsQueryError(ValueError):
+    """Raised for malformed time-range or limit parameters"""
+
+
+def parse_period(value, name):
+    """'YYYY-MM' -> year * 100 + month"""
+    try:
+        year, month = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise AnalyticsQueryError(f'{name} must be a YYYY-MM month')
+    if not 1 <= month <= 12:
+        raise AnalyticsQueryError(f'{name} must be a YYYY-MM month')
+    return year * 100 + month
+
+
+def format_period(period):
+    return f'{period // 100:04d}-{period % 100:02d}'
+
+
+def default_range(today=None):
+    """The last DEFAULT_MONTHS months, including the current one"""
+    today = today or date.today()
+    end = today.year * 100 + today.month
+    months = today.year * 12 + today.month - DEFAULT_MONTHS
+    start = (months // 12) * 100 + months % 12 + 1
+    return start, end
+
+
+def household_months(start, end):
+    rows = (
+        HouseholdMonthlyWaste.objects
+        .filter(period__range=(start, end))
+        .order_by('period')
+        .values('period', 'total_bought', 'total_wasted', 'waste_ratio', 'purchases', 'items')
+    )
+    return [dict(row, month=format_period(row.pop('period'))) for row in rows]
+
+
+def top_wasted_items(start, end, limit=DEFAULT_TOP):
+    rows = (
+        MonthlyConsumption.objects
+        .filter(period__range=(start, end))
+        .values('food_item_id', 'food_item__name')
+        .annotate(bought=Sum('total_bought'), wasted=Sum('total_wasted'))
+        .filter(wasted__gt=0)
+        .order_by('-wasted', 'food_item_id')[:limit]
+    )
+    return [
+        {
+            'id': row['food_item_id'],
+            'name': row['food_item__name'],
+            'total_bought': row['bought'],
+            'total_wasted': row['wasted'],
+            'waste_ratio': waste_ratio(row['bought'], row['wasted']),
+        }
+        for row in rows
+    ]
+
+
+def item_months(item_id, start, end):
+    rows = (
+        MonthlyConsumption.objects
+        .filter(food_item_id=item_id, period__range=(start, end))
+        .order_by('period')
+        .values('period', 'total_bought', 'total_wasted', 'purchases')
+    )
+    return [
+        dict(row, month=format_period(row.pop('period')),
+             waste_ratio=waste_ratio(row['total_bought'], row['total_wasted']))
+        for row in rows
+    ]
+
+
+def waste_report(params, today=None):
+    """Waste report for the query parameters in ``params``.
+
+    Supported parameters: ``from`` and ``to`` (inclusive YYYY-MM months, default
+    the last twelve months), ``top`` (number of most-wasted items) and ``item``
+    (a food item id whose monthly waste ratios to include).
+    """
+    start, end = default_range(today)
+    if params.get('from'):
+        start = parse_period(params['from'], 'from')
+    if params.get('to'):
+        end = parse_period(params['to'], 'to')
+    if start > end:
+        raise AnalyticsQueryError('from must not be after to')
+    try:
+        top = min(max(int(params.get('top', DEFAULT_TOP)), 1), MAX_TOP)
+        item_id = int(params['item']) if params.get('item') else None
+    except ValueError:
+        raise AnalyticsQueryError('top and item must be numbers')
+
+    months = household_months(start, end)
+    bought = sum(month['total_bought'] for month in months)
+    wasted = sum(month['total_wasted'] for month in months)
+    report = {
+        'from': format_period(start),
+        'to': format_period(end),
+        'totals': {
+            'total_bought': bought,
+            'total_wasted': wasted,
+            'waste_ratio': waste_ratio(bought, wasted),
+            'purchases': sum(month['purchases'] for month in months),
+        },
+        'months': months,
+        'top_wasted': top_wasted_items(start, end, top),
+    }
+    if item_id is not None:
+        report['item'] = {'id': item_id, 'months': item_months(item_id, start, end)}
+    return report
@@ -0,0 +1,249 @@
+"""Streaming bulk import of FoodItem and FoodItemPurchase rows from CSV or JSONL.
+
+Input is read one record at a time, validated, and inserted with ``bulk_create``
+in batches, so memory use is bounded by the batch size rather than the file size.
+Every write goes through the shared database writer (foodsaver.db): the importer
+waits for each batch to commit before reading on, and the other writers in the
+process queue behind it instead of failing on SQLite's file lock. Don't call the
+importers inside a transaction of your own, which the writer would have to wait on. Rows that fail validation are written, with the reason,
+to a reject file as JSON lines and the import carries on.
+
+Food item files need ``name`` and ``expiry`` (free text, parsed like the web form)
+and may have ``image`` (a path under MEDIA_ROOT). Purchase files need
+``food_item`` (or ``name``), ``quantity_bought`` and either ``month_bought`` /
+``year_bought`` or a ``purchase_date``, and may have ``amount_wasted``.
+"""
+import csv
+import io
+import json
+import time
+from datetime import date
+
+from foodsaver.db import WRITE_TIMEOUT, writer as db_writer
+
+from .dashboard_cache import bump_inventory_version
+from .dates import MONTHS, parse_expiry_date
+from .models import FoodItem, FoodItemPurchase
+from .rollups import refresh_rollups
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class RejectedRow(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.created_items = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.sample_rejects = []  # first few rejects, for API responses
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'created_items': self.created_items,
+            'seconds': round(self.seconds, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+            'sample_rejects': self.sample_rejects,
+        }
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def iter_records(text_stream, fmt):
+    """Yield ``(line_number, record_dict_or_error)`` from a text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, {k.strip(): (v.strip() if isinstance(v, str) else v)
+                                    for k, v in record.items() if k}
+    else:
+        for line_number, line in enumerate(text_stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, RejectedRow(f'Invalid JSON: {e}')
+                continue
+            if not isinstance(record, dict):
+                yield line_number, RejectedRow('Expected a JSON object')
+                continue
+            yield line_number, record
+
+
+def open_text(binary_file):
+    """Wrap an uploaded or opened binary file for line-by-line text reading"""
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def _int(record, field, default=None, minimum=0):
+    value = record.get(field)
+    if value in (None, ''):
+        if default is None:
+            raise RejectedRow(f'Missing {field}')
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise RejectedRow(f'{field} must be a whole number')
+    if number < minimum:
+        raise RejectedRow(f'{field} must be at least {minimum}')
+    return number
+
+
+def _month(value):
+    if isinstance(value, str) and not value.isdigit():
+        month = MONTHS.get(value.strip().lower())
+        if month is None:
+            raise RejectedRow(f'Unknown month {value!r}')
+        return month
+    try:
+        month = int(value)
+    except (TypeError, ValueError):
+        raise RejectedRow('month_bought must be 1-12 or a month name')
+    if not 1 <= month <= 12:
+        raise RejectedRow('month_bought must be 1-12 or a month name')
+    return month
+
+
+def _purchase_date(value):
+    try:
+        return date.fromisoformat(value)  # fast path for POS exports
+    except (TypeError, ValueError):
+        parsed = parse_expiry_date(value)
+        if parsed is None:
+            raise RejectedRow(f'Unrecognised purchase_date {value!r}')
+        return parsed
+
+
+class _Importer:
+    def __init__(self, batch_size, reject_file):
+        self.batch_size = batch_size
+        self.reject_file = reject_file
+        self.result = ImportResult()
+        self.batch = []
+
+    def reject(self, line_number, error, record):
+        self.result.rejected += 1
+        entry = {'line': line_number, 'error': str(error)}
+        if len(self.result.sample_rejects) < 20:
+            self.result.sample_rejects.append(entry)
+        if self.reject_file is not None:
+            entry['record'] = record if isinstance(record, dict) else None
+            self.reject_file.write(json.dumps(entry, default=str) + '\n')
+
+    def add(self, obj):
+        self.batch.append(obj)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        model = type(self.batch[0])
+        db_writer.submit(model.objects.bulk_create, self.batch).result(WRITE_TIMEOUT)
+        self.result.imported += len(self.batch)
+        self.batch = []
+
+
+def import_food_items(records, batch_size=DEFAULT_BATCH_SIZE, reject_file=None):
+    importer = _Importer(batch_size, reject_file)
+    for line_number, record in records:
+        importer.result.rows += 1
+        try:
+            if isinstance(record, RejectedRow):
+                raise record
+            name = (record.get('name') or '').strip()
+            if not name:
+                raise RejectedRow('Missing name')
+            expiry_text = str(record.get('expiry') or record.get('expiry_date') or '').strip()
+            # bulk_create skips save(), so parse here
+            importer.add(FoodItem(
+                name=name[:200],
+                expiry_text=expiry_text[:100],
+                expiry_date=parse_expiry_date(expiry_text),
+                image=record.get('image') or '',
+            ))
+        except RejectedRow as e:
+            importer.reject(line_number, e, record)
+    importer.flush()
+    if importer.result.imported:
+        # bulk_create sends no post_save signals
+        db_writer.submit(bump_inventory_version).result(WRITE_TIMEOUT)
+    return importer.result.finish()
+
+
+def import_purchases(records, batch_size=DEFAULT_BATCH_SIZE, reject_file=None, create_missing_items=False):
+    importer = _Importer(batch_size, reject_file)
+    item_ids = {}
+    for item_id, name in FoodItem.objects.order_by('id').values_list('id', 'name'):
+        item_ids.setdefault(name.lower(), item_id)  # oldest item wins for duplicate names
+    this_year = date.today().year
+    touched_months = set()
+
+    for line_number, record in records:
+        importer.result.rows += 1
+        try:
+            if isinstance(record, RejectedRow):
+                raise record
+            name = str(record.get('food_item') or record.get('name') or '').strip()
+            if not name:
+                raise RejectedRow('Missing food_item')
+            item_id = item_ids.get(name.lower())
+            if item_id is None:
+                if not create_missing_items:
+                    raise RejectedRow(f'Unknown food item {name!r}')
+                item = FoodItem(name=name[:200])
+                db_writer.submit(item.save).result(WRITE_TIMEOUT)
+                item_id = item.id
+                item_ids[name.lower()] = item_id
+                importer.result.created_items += 1
+
+            if record.get('purchase_date'):
+                bought = _purchase_date(record['purchase_date'])
+                month, year = bought.month, bought.year
+            else:
+                if record.get('month_bought') in (None, ''):
+                    raise RejectedRow('Missing month_bought or purchase_date')
+                month = _month(record['month_bought'])
+                year = _int(record, 'year_bought', default=this_year, minimum=1900)
+
+            importer.add(FoodItemPurchase(
+                food_item_id=item_id,
+                quantity_bought=_int(record, 'quantity_bought'),
+                month_bought=month,
+                year_bought=year,
+                amount_wasted=_int(record, 'amount_wasted', default=0),
+            ))
+            touched_months.add((item_id, year, month))
+        except RejectedRow as e:
+            importer.reject(line_number, e, record)
+    importer.flush()
+    # bulk_create sends no post_save signals, so bring the monthly rollup up to date here
+    db_writer.submit(refresh_rollups, touched_months).result(WRITE_TIMEOUT)
+    return importer.result.finish()
+
+
+IMPORTERS = {
+    'fooditems': import_food_items,
+    'purchases': import_purchases,
+}
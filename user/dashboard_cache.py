@@ -0,0 +1,57 @@
+"""Cache of the rendered dashboard inventory fragment.
+
+The fragment only changes when a FoodItem is saved or deleted, or when the date
+rolls over and statuses move on. The cache key therefore combines an inventory
+version, bumped by model signals (see user.signals), with today's date. The same
+values give an ETag and Last-Modified, so polling browsers get 304s.
+
+The version lives in the database (``InventoryVersion``), so a change made by any
+worker process reaches every other one, whatever the cache backend. The rendered
+fragments can then stay in each process's own cache: a stale copy is simply
+never looked up again.
+
+Code that writes FoodItems without signals (bulk_create, queryset.update or
+delete) must call ``bump_inventory_version()`` itself.
+"""
+import hashlib
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from .models import InventoryVersion
+
+VERSION_ROW = 1
+
+
+def _new_state():
+    return {'version': time.time_ns(), 'modified': time.time()}
+
+
+def get_inventory_version():
+    """``{'version': ..., 'modified': unix time}`` of the last inventory change"""
+    # A new row starts a new version, so ETags from before it can't match
+    row, _ = InventoryVersion.objects.get_or_create(pk=VERSION_ROW, defaults=_new_state())
+    return {'version': row.version, 'modified': row.modified}
+
+
+def bump_inventory_version(**kwargs):
+    """Invalidate cached inventory fragments. Usable directly as a signal receiver."""
+    state = _new_state()
+    if not InventoryVersion.objects.filter(pk=VERSION_ROW).update(**state):
+        InventoryVersion.objects.update_or_create(pk=VERSION_ROW, defaults=state)
+
+
+def dashboard_validators(today, query_string):
+    """Cache key, ETag and Last-Modified timestamp for a dashboard request"""
+    state = get_inventory_version()
+    query_hash = hashlib.sha1(query_string.encode()).hexdigest()[:12]
+    key = f"dashboard:{state['version']}:{today.isoformat()}:{query_hash}"
+    etag = f'"{state["version"]}-{today.strftime("%Y%m%d")}-{query_hash}"'
+    # Statuses change at midnight, so the page is at least as new as today's start
+    midnight = datetime.combine(today, dt_time.min).timestamp()
+    return key, etag, max(state['modified'], midnight)
+
+
+def seconds_until_midnight():
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), dt_time.min)
+    return max(int((midnight - now).total_seconds()), 1)
@@ -0,0 +1,68 @@
+"""Parsing of free-text expiry dates as typed, spoken or read off packaging by OCR."""
+import calendar
+import re
+from datetime import date
+
+MONTHS = {}
+for _number in range(1, 13):
+    MONTHS[calendar.month_name[_number].lower()] = _number
+    MONTHS[calendar.month_abbr[_number].lower()] = _number
+MONTHS['sept'] = 9
+
+_ordinal = r'(?:st|nd|rd|th)?'
+_iso_re = re.compile(r'(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})')
+_numeric_re = re.compile(r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{2,4})')
+_day_month_re = re.compile(rf'(\d{{1,2}}){_ordinal}(?:\s+of)?[\s\-]+([a-z]{{3,9}})\.?,?[\s\-]+(\d{{2,4}})')
+_month_day_re = re.compile(rf'([a-z]{{3,9}})\.?[\s\-]+(\d{{1,2}}){_ordinal},?[\s\-]+(\d{{4}})')
+_month_year_re = re.compile(r'(?:([a-z]{3,9})\.?|(\d{1,2}))[\s/\-]+(\d{4})')
+
+
+def _year(text):
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+def _make_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_expiry_date(text):
+    """Parse an expiry date in any of the formats we see, or return None.
+
+    Accepts ISO dates, numeric dates (month first, like the voice form, falling back
+    to day first when that is the only valid reading), written dates such as
+    '12th Jan 2024', 'January 12, 2024' or '12-JAN-24', and month-only dates like
+    'Mar 2025' or '03/2025', which are taken as the last day of that month.
+    """
+    if not text:
+        return None
+    text = str(text).strip().lower()
+
+    match = _iso_re.search(text)
+    if match:
+        return _make_date(int(match[1]), int(match[2]), int(match[3]))
+
+    match = _numeric_re.search(text)
+    if match:
+        first, second, year = int(match[1]), int(match[2]), _year(match[3])
+        return _make_date(year, first, second) or _make_date(year, second, first)
+
+    match = _day_month_re.search(text)
+    if match and match[2] in MONTHS:
+        return _make_date(_year(match[3]), MONTHS[match[2]], int(match[1]))
+
+    match = _month_day_re.search(text)
+    if match and match[1] in MONTHS:
+        return _make_date(int(match[3]), MONTHS[match[1]], int(match[2]))
+
+    match = _month_year_re.search(text)
+    if match:
+        month = MONTHS.get(match[1]) if match[1] else int(match[2])
+        year = int(match[3])
+        if month and 1 <= month <= 12:
+            return date(year, month, calendar.monthrange(year, month)[1])
+
+    return None
@@ -0,0 +1,197 @@
+"""Filtered, keyset-paginated inventory listing shared by the dashboard and the JSON API.
+
+Items are ordered by (expiry_date, id) with undated items last. A page ends with
+an opaque cursor holding the sort key of its last row, and the next page starts
+strictly after that key. Dated and undated items are paged separately, the
+dated ones with an ``expiry_date`` range and the undated ones by ``id``, and
+status filters become ``expiry_date`` ranges too, so every page is an index range
+search on (expiry_date, id), however deep into the inventory it is, unlike
+OFFSET paging.
+"""
+import base64
+import binascii
+import json
+from datetime import date, timedelta
+
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+from foodsaver import media
+
+from .models import EXPIRING_SOON_DAYS, FoodItem
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+STATUSES = ('expired', 'expiring soon', 'expiring this week', 'good', 'invalid date')
+
+# Status -> [from, to) days after today its expiry dates fall in, matching
+# FoodItemQuerySet.with_status; None is unbounded. 'invalid date' is a NULL date.
+STATUS_DAYS = {
+    'expired': (None, 0),
+    'expiring soon': (0, EXPIRING_SOON_DAYS + 1),
+    'expiring this week': (EXPIRING_SOON_DAYS + 1, 7),
+    'good': (7, None),
+}
+
+# API field name -> database columns it needs
+FIELDS = {
+    'id': ['id'],
+    'name': ['name'],
+    'expiry_date': ['expiry_date'],
+    'expiry_text': ['expiry_text'],
+    'status': ['status'],
+    'days_left': ['expiry_date'],
+    'image_url': ['image'],
+    'thumbnail_url': ['image', 'image_variants'],
+}
+
+
+class InventoryQueryError(ValueError):
+    """Raised for malformed filter, cursor or field parameters"""
+
+
+def encode_cursor(expiry_date, item_id):
+    raw = json.dumps([expiry_date.isoformat() if expiry_date else None, item_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        expiry, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (date.fromisoformat(expiry) if expiry else None), int(item_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InventoryQueryError('Invalid cursor')
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InventoryQueryError(f'{name} must be a YYYY-MM-DD date')
+
+
+def parse_fields(value):
+    """Validate a comma-separated ``fields=`` projection (None means all fields)"""
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise InventoryQueryError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _status_filter(statuses, today):
+    """(Q over dated rows, or None when no dated status is wanted; whether undated rows are)"""
+    if not statuses:
+        return Q(expiry_date__isnull=False), True
+    ranges = sorted((STATUS_DAYS[s] for s in statuses if s in STATUS_DAYS),
+                    key=lambda r: float('-inf') if r[0] is None else r[0])
+    merged = []
+    for low, high in ranges:
+        if merged and merged[-1][1] is None:
+            break  # the previous range is unbounded above and covers the rest
+        if merged and (low is None or low <= merged[-1][1]):
+            previous_high = merged[-1][1]
+            merged[-1] = (merged[-1][0], None if high is None else max(high, previous_high))
+        else:
+            merged.append((low, high))
+    dated = None
+    for low, high in merged:
+        q = Q(expiry_date__isnull=False)
+        if low is not None:
+            q &= Q(expiry_date__gte=today + timedelta(days=low))
+        if high is not None:
+            q &= Q(expiry_date__lt=today + timedelta(days=high))
+        dated = q if dated is None else dated | q
+    return dated, 'invalid date' in statuses
+
+
+def inventory_page(params, today=None, fields=None):
+    """One page of inventory for the query parameters in ``params``.
+
+    Supported parameters: ``status`` (comma-separated), ``expiry_from`` and
+    ``expiry_to`` (inclusive ISO dates), ``order`` ('asc' or 'desc'), ``limit``
+    and ``cursor``. Rows are FoodItem instances, or dicts of ``fields`` when a
+    projection is given. Returns ``(rows, next_cursor)``.
+    """
+    today = today or date.today()
+
+    statuses = None
+    if params.get('status'):
+        statuses = [s.strip() for s in params['status'].split(',') if s.strip()]
+        unknown = [s for s in statuses if s not in STATUSES]
+        if unknown:
+            raise InventoryQueryError(f"Unknown status: {', '.join(unknown)}")
+    dated, undated = _status_filter(statuses, today)
+    if dated is not None and params.get('expiry_from'):
+        dated &= Q(expiry_date__gte=_parse_date(params['expiry_from'], 'expiry_from'))
+    if dated is not None and params.get('expiry_to'):
+        dated &= Q(expiry_date__lte=_parse_date(params['expiry_to'], 'expiry_to'))
+    if params.get('expiry_from') or params.get('expiry_to'):
+        undated = False  # a date range never matches a missing date
+
+    try:
+        limit = min(max(int(params.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise InventoryQueryError('limit must be a number')
+    descending = params.get('order') == 'desc'
+    after_date, after_id = decode_cursor(params['cursor']) if params.get('cursor') else (None, None)
+
+    queryset = FoodItem.objects.with_status(today)
+    if fields is not None:
+        columns = {'id', 'expiry_date'}  # always needed for the cursor
+        for field in fields:
+            columns.update(FIELDS[field])
+        queryset = queryset.values(*columns)
+
+    rows = []
+    # Dated items first, unless the cursor is already in the undated tail
+    if dated is not None and (after_id is None or after_date is not None):
+        page = queryset.filter(dated)
+        if after_date is not None:
+            # Same rows as (expiry_date, id) > (after_date, after_id), but the
+            # leading bound keeps it an index range search in SQLite
+            if descending:
+                page = page.filter(Q(expiry_date__lte=after_date), Q(expiry_date__lt=after_date) | Q(id__lt=after_id))
+            else:
+                page = page.filter(Q(expiry_date__gte=after_date), Q(expiry_date__gt=after_date) | Q(id__gt=after_id))
+        page = page.order_by('-expiry_date', '-id') if descending else page.order_by('expiry_date', 'id')
+        rows = list(page[:limit + 1])
+    if undated and len(rows) <= limit:
+        page = queryset.filter(expiry_date__isnull=True)
+        if after_id is not None and after_date is None:
+            page = page.filter(id__lt=after_id) if descending else page.filter(id__gt=after_id)
+        page = page.order_by('-id') if descending else page.order_by('id')
+        rows += list(page[:limit + 1 - len(rows)])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if fields is None:
+            next_cursor = encode_cursor(last.expiry_date, last.id)
+        else:
+            next_cursor = encode_cursor(last['expiry_date'], last['id'])
+
+    if fields is not None:
+        rows = [_project(row, fields, today) for row in rows]
+    return rows, next_cursor
+
+
+def _project(row, fields, today):
+    item = {}
+    for field in fields:
+        if field == 'days_left':
+            item[field] = (row['expiry_date'] - today).days if row['expiry_date'] else None
+        elif field == 'image_url':
+            item[field] = default_storage.url(row['image']) if row['image'] else None
+        elif field == 'thumbnail_url':
+            item[field] = media.image_url(row['image'], 'thumb', variants=row['image_variants'])
+        elif field == 'expiry_date':
+            item[field] = row['expiry_date'].isoformat() if row['expiry_date'] else None
+        else:
+            item[field] = row[field]
+    return item
@@ -0,0 +1,164 @@
+"""Ledger of Gemini calls: latency, size, token and cache-hit accounting per call site.
+
+Calls are queued on the shared foodsaver.db writer and bulk inserted into the
+``LLMCall`` table with whatever else is waiting, so recording a call never waits
+on the database.
+
+    with ledger.track('recipe', prompt) as call:
+        response = model.generate_content(prompt)
+        call.set_response(response)
+"""
+import atexit
+import logging
+import queue
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.utils import timezone
+
+from foodsaver.db import writer
+
+logger = logging.getLogger(__name__)
+
+
+class CallRecord:
+    """Mutable record filled in while a call is in flight"""
+
+    def __init__(self, call_site, prompt=None):
+        self.call_site = call_site
+        self.prompt_chars = len(prompt) if isinstance(prompt, str) else 0
+        self.response_chars = 0
+        self.prompt_tokens = None
+        self.response_tokens = None
+        self.cache_hit = False
+        self.error_class = ''
+
+    def set_response(self, response):
+        """Take response size and token usage from a Gemini response"""
+        text = getattr(response, 'text', None) or ''
+        self.response_chars = len(text)
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            self.prompt_tokens = getattr(usage, 'prompt_token_count', None)
+            self.response_tokens = getattr(usage, 'candidates_token_count', None)
+
+
+def record(call_site, latency_ms, prompt_chars=0, response_chars=0, prompt_tokens=None,
+           response_tokens=None, cache_hit=False, error_class=''):
+    """Queue one call for writing. Never blocks and never raises."""
+    from .models import LLMCall
+
+    try:
+        writer.add(LLMCall(
+            call_site=call_site,
+            created_at=timezone.now(),
+            latency_ms=latency_ms,
+            prompt_chars=prompt_chars,
+            response_chars=response_chars,
+            prompt_tokens=prompt_tokens,
+            response_tokens=response_tokens,
+            cache_hit=cache_hit,
+            error_class=error_class,
+        ), block=False)
+    except queue.Full:
+        logger.warning("LLM ledger queue full, dropping call record")
+
+
+def record_cache_hit(call_site, prompt=None, response_text='', latency_ms=0.0):
+    """Record a call answered from a cache instead of Gemini"""
+    record(
+        call_site,
+        latency_ms,
+        prompt_chars=len(prompt) if isinstance(prompt, str) else 0,
+        response_chars=len(response_text or ''),
+        cache_hit=True,
+    )
+
+
+@contextmanager
+def track(call_site, prompt=None):
+    """Time the enclosed Gemini call and record it, including the error class if it raises"""
+    call = CallRecord(call_site, prompt)
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call.error_class = type(e).__name__
+        raise
+    finally:
+        record(
+            call.call_site,
+            (time.perf_counter() - start) * 1000,
+            prompt_chars=call.prompt_chars,
+            response_chars=call.response_chars,
+            prompt_tokens=call.prompt_tokens,
+            response_tokens=call.response_tokens,
+            cache_hit=call.cache_hit,
+            error_class=call.error_class,
+        )
+
+
+def flush(timeout=5.0):
+    """Wait until every queued call has been written"""
+    try:
+        writer.flush(timeout)
+    except Exception as e:
+        logger.error(f"Error flushing LLM ledger records: {e}")
+
+
+atexit.register(flush)
+
+
+def summarize(since, bucket_seconds=None):
+    """Per call site latency percentiles and throughput for calls made since ``since``.
+
+    With ``bucket_seconds`` each site also gets a time series of the same stats.
+    """
+    from .models import LLMCall
+
+    rows = (
+        LLMCall.objects
+        .filter(created_at__gte=since)
+        .order_by()
+        .values_list('call_site', 'created_at', 'latency_ms', 'cache_hit', 'error_class',
+                     'prompt_tokens', 'response_tokens')
+    )
+
+    by_site = {}
+    for site, created_at, latency, cache_hit, error_class, p_tokens, r_tokens in rows.iterator():
+        by_site.setdefault(site, []).append(
+            (created_at.timestamp(), latency, cache_hit, bool(error_class), p_tokens or 0, r_tokens or 0)
+        )
+
+    window_seconds = max((timezone.now() - since).total_seconds(), 1.0)
+    summary = {}
+    for site, values in by_site.items():
+        data = np.array(values, dtype=float)
+        stats = _stats(data, window_seconds)
+        if bucket_seconds:
+            start = since.timestamp()
+            buckets = ((data[:, 0] - start) // bucket_seconds).astype(int)
+            stats['buckets'] = [
+                dict(start=datetime.fromtimestamp(start + b * bucket_seconds, tz=dt_timezone.utc).isoformat(),
+                     **_stats(data[buckets == b], bucket_seconds))
+                for b in np.unique(buckets)
+            ]
+        summary[site] = stats
+    return summary
+
+
+def _stats(data, seconds):
+    latencies = data[:, 1]
+    upstream = latencies[data[:, 2] == 0]  # cache hits would drag the percentiles down
+    return {
+        'calls': int(len(data)),
+        'cache_hits': int(data[:, 2].sum()),
+        'errors': int(data[:, 3].sum()),
+        'p50_ms': round(float(np.percentile(upstream, 50)), 1) if len(upstream) else None,
+        'p95_ms': round(float(np.percentile(upstream, 95)), 1) if len(upstream) else None,
+        'calls_per_minute': round(len(data) * 60.0 / seconds, 3),
+        'prompt_tokens': int(data[:, 4].sum()),
+        'response_tokens': int(data[:, 5].sum()),
+    }
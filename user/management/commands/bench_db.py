@@ -0,0 +1,103 @@
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from foodsaver.db import BatchWriter
+from user.inventory import inventory_page
+from user.models import FoodItem
+
+BENCH_PREFIX = '__bench__'
+
+
+class Command(BaseCommand):
+    help = ("Measure read/write throughput under mixed concurrent load, with writes sent "
+            "straight to SQLite and through the batching writer")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--mode', choices=['direct', 'batched', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        self.stdout.write(f"journal_mode={journal_mode}, {options['readers']} readers, "
+                          f"{options['writers']} writers, {options['seconds']}s per run")
+
+        modes = ['direct', 'batched'] if options['mode'] == 'both' else [options['mode']]
+        try:
+            for mode in modes:
+                self.report(mode, self.run(mode, options['readers'], options['writers'], options['seconds']))
+        finally:
+            deleted, _ = FoodItem.objects.filter(name__startswith=BENCH_PREFIX).delete()
+            self.stdout.write(f"Removed {deleted} benchmark rows")
+
+    def run(self, mode, readers, writers, seconds):
+        stop = threading.Event()
+        stats = {'read': [], 'write': [], 'read_errors': 0, 'write_errors': 0}
+        lock = threading.Lock()
+        batch_writer = BatchWriter(name='bench-writer') if mode == 'batched' else None
+
+        def read_loop():
+            latencies, errors = [], 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    inventory_page({'limit': '50', 'status': 'expiring soon,expiring this week'})
+                    latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    errors += 1
+            connection.close()
+            with lock:
+                stats['read'].extend(latencies)
+                stats['read_errors'] += errors
+
+        def write_loop(worker):
+            latencies, errors, n = [], 0, 0
+            while not stop.is_set():
+                item = FoodItem(name=f'{BENCH_PREFIX}{worker}-{n}', expiry_text='2030-01-01')
+                n += 1
+                started = time.perf_counter()
+                try:
+                    if batch_writer is None:
+                        item.save()
+                    else:
+                        batch_writer.submit(item.save).result()
+                    latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    errors += 1
+            connection.close()
+            with lock:
+                stats['write'].extend(latencies)
+                stats['write_errors'] += errors
+
+        threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+        threads += [threading.Thread(target=write_loop, args=(w,)) for w in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        stats['seconds'] = seconds
+        if batch_writer is not None:
+            stats['batches'] = batch_writer.batches
+        return stats
+
+    def report(self, mode, stats):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{mode} writes"))
+        for kind in ('read', 'write'):
+            latencies = np.array(stats[kind]) * 1000
+            line = f"  {kind}s: {len(latencies) / stats['seconds']:.0f}/s"
+            if len(latencies):
+                line += (f", p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms,"
+                         f" max {latencies.max():.1f} ms")
+            line += f", {stats[kind + '_errors']} lock errors"
+            self.stdout.write(line)
+        if stats.get('batches'):
+            self.stdout.write(f"  {len(stats['write'])} writes in {stats['batches']} commits")
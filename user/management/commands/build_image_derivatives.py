@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from donation.models import FoodDonation
+from foodsaver import media
+from foodsaver.db import writer as db_writer
+from user.models import FoodItem
+
+
+class Command(BaseCommand):
+    help = "Build missing thumbnail and WebP variants for every stored food and donation image and record them on the rows"
+
+    def handle(self, *args, **options):
+        names = set(FoodItem.objects.exclude(image='').values_list('image', flat=True))
+        names |= set(FoodDonation.objects.exclude(food_image='').exclude(food_image=None)
+                     .values_list('food_image', flat=True))
+        written = failed = 0
+        for name in sorted(names):
+            try:
+                written += len(media.build_derivatives(name))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{name}: {e}")
+        db_writer.flush()  # variant lists recorded on the rows (media.derivatives_built)
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {len(names)} images, wrote {written} variants, {failed} failed"))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from user.bulk_import import DEFAULT_BATCH_SIZE, IMPORTERS, detect_format, iter_records, open_text
+
+
+class Command(BaseCommand):
+    help = "Bulk import food items or purchase history from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Rows per bulk insert and transaction")
+        parser.add_argument('--reject-file', help="Where to write rejected rows (JSON lines)")
+        parser.add_argument('--create-missing-items', action='store_true',
+                            help="Create FoodItems for unknown names in purchase files")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        fmt = options['format'] or detect_format(options['path'])
+        reject_path = options['reject_file'] or f"{options['path']}.rejects.jsonl"
+
+        kwargs = {'batch_size': options['batch_size']}
+        if options['kind'] == 'purchases':
+            kwargs['create_missing_items'] = options['create_missing_items']
+
+        try:
+            source = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+        with source, open(reject_path, 'w', encoding='utf-8') as reject_file:
+            records = iter_records(open_text(source), fmt)
+            result = IMPORTERS[options['kind']](records, reject_file=reject_file, **kwargs)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} of {result.rows} rows in {result.seconds:.1f}s "
+            f"({result.rows_per_sec:,.0f} rows/sec)"
+        ))
+        if result.created_items:
+            self.stdout.write(f"Created {result.created_items} new food items")
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(f"{result.rejected} rows rejected, see {reject_path}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from user.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the MonthlyConsumption and HouseholdMonthlyWaste rollups from the full purchase history"
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} monthly consumption rows"))
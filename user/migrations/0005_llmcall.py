@@ -0,0 +1,45 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0004_alter_fooditempurchase_month_bought"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LLMCall",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("call_site", models.CharField(max_length=50)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("latency_ms", models.FloatField()),
+                ("prompt_chars", models.PositiveIntegerField(default=0)),
+                ("response_chars", models.PositiveIntegerField(default=0)),
+                ("prompt_tokens", models.PositiveIntegerField(blank=True, null=True)),
+                ("response_tokens", models.PositiveIntegerField(blank=True, null=True)),
+                ("cache_hit", models.BooleanField(default=False)),
+                ("error_class", models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["created_at", "call_site"],
+                        name="user_llmcal_created_b52ea3_idx",
+                    )
+                ],
+            },
+        ),
+    ]
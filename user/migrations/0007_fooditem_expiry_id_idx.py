@@ -0,0 +1,24 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0006_fooditem_expiry_date"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fooditem",
+            name="expiry_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="fooditem",
+            index=models.Index(
+                fields=["expiry_date", "id"], name="fooditem_expiry_id_idx"
+            ),
+        ),
+    ]
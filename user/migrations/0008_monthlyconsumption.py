@@ -0,0 +1,100 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:19
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def build_rollups(apps, schema_editor):
+    # A frozen copy of user.rollups.rebuild_rollups as it was when this migration was
+    # written, so later rollup changes don't change what this data migration does
+    FoodItemPurchase = apps.get_model("user", "FoodItemPurchase")
+    MonthlyConsumption = apps.get_model("user", "MonthlyConsumption")
+    totals = (
+        FoodItemPurchase.objects
+        .order_by()
+        .values("food_item_id", "year_bought", "month_bought")
+        .annotate(
+            total_bought=Coalesce(Sum("quantity_bought"), 0),
+            total_wasted=Coalesce(Sum("amount_wasted"), 0),
+            purchases=Count("id"),
+        )
+    )
+    batch = []
+    for row in totals.iterator():
+        year, month = row["year_bought"], row["month_bought"]
+        batch.append(MonthlyConsumption(
+            food_item_id=row["food_item_id"],
+            year=year,
+            month=month,
+            period=year * 100 + month,
+            total_bought=row["total_bought"],
+            total_wasted=row["total_wasted"],
+            purchases=row["purchases"],
+        ))
+        if len(batch) >= BATCH_SIZE:
+            MonthlyConsumption.objects.bulk_create(batch)
+            batch = []
+    MonthlyConsumption.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0007_fooditem_expiry_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyConsumption",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.IntegerField()),
+                ("month", models.IntegerField()),
+                ("period", models.IntegerField()),
+                ("total_bought", models.PositiveIntegerField(default=0)),
+                ("total_wasted", models.PositiveIntegerField(default=0)),
+                ("purchases", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="fooditempurchase",
+            index=models.Index(
+                fields=["food_item", "year_bought", "month_bought"],
+                name="purchase_item_month_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="monthlyconsumption",
+            name="food_item",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="monthly_consumption",
+                to="user.fooditem",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="monthlyconsumption",
+            index=models.Index(
+                fields=["period", "food_item"], name="consumption_period_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="monthlyconsumption",
+            constraint=models.UniqueConstraint(
+                fields=("food_item", "year", "month"), name="unique_item_month"
+            ),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:22
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_household_totals(apps, schema_editor):
+    # A frozen copy of the household part of user.rollups.rebuild_rollups as it was
+    # when this migration was written; the per-item rows were built by 0008
+    MonthlyConsumption = apps.get_model("user", "MonthlyConsumption")
+    HouseholdMonthlyWaste = apps.get_model("user", "HouseholdMonthlyWaste")
+    totals = (
+        MonthlyConsumption.objects
+        .order_by()
+        .values("period", "year", "month")
+        .annotate(
+            bought=Sum("total_bought"),
+            wasted=Sum("total_wasted"),
+            purchase_count=Sum("purchases"),
+            item_count=Count("food_item_id"),
+        )
+    )
+    HouseholdMonthlyWaste.objects.bulk_create(
+        HouseholdMonthlyWaste(
+            period=row["period"],
+            year=row["year"],
+            month=row["month"],
+            total_bought=row["bought"],
+            total_wasted=row["wasted"],
+            waste_ratio=round(row["wasted"] / row["bought"], 4) if row["bought"] else 0.0,
+            purchases=row["purchase_count"],
+            items=row["item_count"],
+        )
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0008_monthlyconsumption"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HouseholdMonthlyWaste",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.IntegerField(unique=True)),
+                ("year", models.IntegerField()),
+                ("month", models.IntegerField()),
+                ("total_bought", models.PositiveIntegerField(default=0)),
+                ("total_wasted", models.PositiveIntegerField(default=0)),
+                ("waste_ratio", models.FloatField(default=0)),
+                ("purchases", models.PositiveIntegerField(default=0)),
+                ("items", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_household_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0009_householdmonthlywaste"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fooditem",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
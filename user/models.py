@@ -1,14 +1,86 @@
+from datetime import date, timedelta
+
 from django.db import models
+from django.db.models import Case, CharField, Value, When
 from django.utils import timezone
 
+from foodsaver import media
+
+from .dates import parse_expiry_date
+
 # Create your models here.
-from django.db import models
+
+# Days left at or below which an item counts as expiring soon (and triggers a notification)
+EXPIRING_SOON_DAYS = 5
+
+
+class FoodItemQuerySet(models.QuerySet):
+    def with_status(self, today=None):
+        """Annotate each item with the dashboard status, computed in the database"""
+        today = today or date.today()
+        return self.annotate(status=Case(
+            When(expiry_date__isnull=True, then=Value('invalid date')),
+            When(expiry_date__lt=today, then=Value('expired')),
+            When(expiry_date__lte=today + timedelta(days=EXPIRING_SOON_DAYS), then=Value('expiring soon')),
+            When(expiry_date__lt=today + timedelta(days=7), then=Value('expiring this week')),
+            default=Value('good'),
+            output_field=CharField(),
+        ))
+
 
 class FoodItem(models.Model):
     name = models.CharField(max_length=200)
-    expiry_date = models.CharField(max_length=100)
+    expiry_text = models.CharField(max_length=100, blank=True)  # As typed, spoken or read by OCR
+    expiry_date = models.DateField(null=True, blank=True)  # Parsed from expiry_text
     image = models.ImageField(upload_to='food_images/')
+    image_variants = models.JSONField(default=list, blank=True)  # Built derivatives, see foodsaver.media
 
+    objects = FoodItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves expiry range filters and (expiry_date, id) keyset pagination
+            models.Index(fields=['expiry_date', 'id'], name='fooditem_expiry_id_idx'),
+        ]
+
+    # Fields whose loaded values save() compares against to tell what changed
+    TRACKED_FIELDS = ('expiry_text', 'image')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def _changed(self, name):
+        """Whether field ``name`` differs from what was loaded from or last saved to the database"""
+        if name in self.get_deferred_fields():
+            return False
+        loaded = getattr(self, '_loaded_values', {})
+        return name not in loaded or str(getattr(self, name) or '') != str(loaded[name] or '')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        derived = []
+        # The date follows the text when the text changes (unparseable text clears it,
+        # status 'invalid date'); a date set directly, e.g. in the admin, is kept
+        if update_fields is None or 'expiry_text' in update_fields:
+            if self.expiry_date is None or (self.pk is not None and self._changed('expiry_text')):
+                self.expiry_date = parse_expiry_date(self.expiry_text)
+                derived.append('expiry_date')
+        # Looking for variants stats storage, so only do it for a new image
+        if (update_fields is None or 'image' in update_fields) and self._changed('image'):
+            self.image_variants = media.available_variants(self.image)
+            derived.append('image_variants')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(derived)
+        super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            name: str(getattr(self, name) or '') for name in self.TRACKED_FIELDS if name not in deferred
+        }
 
     def __str__(self):
         return self.name
@@ -26,6 +98,78 @@ class FoodItemPurchase(models.Model):
     year_bought = models.IntegerField(default=timezone.now().year)  # Stores the year of purchase, default is current year
     amount_wasted = models.PositiveIntegerField(default=0, null=True, blank=True)  # Amount wasted, filled at the end of the month
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['food_item', 'year_bought', 'month_bought'], name='purchase_item_month_idx'),
+        ]
+
     def __str__(self):
         month_name = dict(self.MONTH_CHOICES).get(self.month_bought, "Unknown Month")
-        return f"{self.quantity_bought} of {self.food_item.name} bought in {month_name} {self.year_bought}"
\ No newline at end of file
+        return f"{self.quantity_bought} of {self.food_item.name} bought in {month_name} {self.year_bought}"
+
+class MonthlyConsumption(models.Model):
+    """Purchase totals per food item per month, kept up to date by user.rollups"""
+    food_item = models.ForeignKey(FoodItem, on_delete=models.CASCADE, related_name='monthly_consumption')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    period = models.IntegerField()  # year * 100 + month, for time-range queries
+    total_bought = models.PositiveIntegerField(default=0)
+    total_wasted = models.PositiveIntegerField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['food_item', 'year', 'month'], name='unique_item_month'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'food_item'], name='consumption_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.food_item_id} {self.year}-{self.month:02d}: {self.total_bought} bought, {self.total_wasted} wasted"
+
+
+class HouseholdMonthlyWaste(models.Model):
+    """Household purchase and waste totals per month, kept up to date by user.rollups"""
+    period = models.IntegerField(unique=True)  # year * 100 + month
+    year = models.IntegerField()
+    month = models.IntegerField()
+    total_bought = models.PositiveIntegerField(default=0)
+    total_wasted = models.PositiveIntegerField(default=0)
+    waste_ratio = models.FloatField(default=0)
+    purchases = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)  # distinct food items bought that month
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d}: {self.total_wasted} of {self.total_bought} wasted"
+
+
+class LLMCall(models.Model):
+    """One Gemini call (or cache hit standing in for one), recorded by user.ledger"""
+    call_site = models.CharField(max_length=50)
+    created_at = models.DateTimeField(default=timezone.now)
+    latency_ms = models.FloatField()
+    prompt_chars = models.PositiveIntegerField(default=0)
+    response_chars = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    response_tokens = models.PositiveIntegerField(null=True, blank=True)
+    cache_hit = models.BooleanField(default=False)
+    error_class = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'call_site']),
+        ]
+
+    def __str__(self):
+        return f"{self.call_site} {self.latency_ms:.0f}ms at {self.created_at:%Y-%m-%d %H:%M:%S}"
+
+
+class InventoryVersion(models.Model):
+    """Single row bumped on every inventory change, shared by all worker processes (see
+    user.dashboard_cache)"""
+    version = models.BigIntegerField(default=0)
+    modified = models.FloatField(default=0)  # unix time of the change
+
+    def __str__(self):
+        return f"inventory version {self.version}"
@@ -0,0 +1,189 @@
+"""Local recipe corpus with an inverted ingredient -> recipe index.
+
+Answers "what can I make with these (expiring) ingredients" from the bundled
+``data/recipes.json`` in a few milliseconds, so Gemini is only needed when nothing
+in the corpus is a good match.
+"""
+import json
+import os
+import re
+import threading
+from fractions import Fraction
+
+RECIPE_CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'recipes.json')
+
+# Recipes scoring below this are not good enough to answer without Gemini
+MIN_LOCAL_SCORE = 0.6
+
+# Ingredients everyone is assumed to have, ignored when matching
+PANTRY_STAPLES = {'salt', 'pepper', 'water', 'oil', 'sugar'}
+
+# Words ending in 's' that are not plurals, beyond the '-ss' and '-us' endings
+SINGULAR_S_WORDS = {'molasses', 'swiss'}
+
+_word_re = re.compile(r'[a-z]+')
+# First quantity in an amount: '1 1/2', '1/3', '2' or '0.5'
+_quantity_re = re.compile(r'(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)')
+
+
+def normalize_ingredient(text):
+    """Reduce an ingredient mention to its index key ('2 Ripe Tomatoes' -> 'tomato')"""
+    words = _word_re.findall(text.lower())
+    if not words:
+        return ''
+    word = words[-1]
+    if word in SINGULAR_S_WORDS or word.endswith(('ss', 'us')):  # 'hummus', 'asparagus'
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+def split_ingredients(text):
+    """Split a free-text ingredient list ('tomatoes, 2 eggs and onion') into keys"""
+    if isinstance(text, (list, tuple)):
+        parts = text
+    else:
+        parts = re.split(r',|;|\n|\band\b', str(text))
+    keys = []
+    for part in parts:
+        key = normalize_ingredient(part)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+class RecipeIndex:
+    """Inverted index from ingredient key to the recipes that use it"""
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.postings = {}
+        self.recipe_keys = []
+        for recipe_id, recipe in enumerate(recipes):
+            keys = {normalize_ingredient(key) for key, _ in recipe['ingredients']}
+            keys -= PANTRY_STAPLES
+            self.recipe_keys.append(keys)
+            for key in keys:
+                self.postings.setdefault(key, []).append(recipe_id)
+
+    @classmethod
+    def load(cls, path=RECIPE_CORPUS_PATH):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['recipes'])
+
+    def search(self, ingredients, expiring=None, time_limit=None, diet=None, limit=5):
+        """Rank recipes for the given ingredients, best first.
+
+        Each result is ``(score, recipe)``. The score rewards recipes that use up
+        many of the ingredients (``expiring`` ones count double) and need little
+        else, and halves for recipes that don't fit in ``time_limit`` minutes.
+        """
+        have = set(split_ingredients(ingredients)) - PANTRY_STAPLES
+        urgent = set(split_ingredients(expiring or [])) & have
+        if not have:
+            return []
+
+        candidates = set()
+        for key in have:
+            candidates.update(self.postings.get(key, ()))
+
+        wanted_weight = len(have) + len(urgent)
+        results = []
+        for recipe_id in candidates:
+            recipe = self.recipes[recipe_id]
+            if diet and diet != 'Regular' and diet not in recipe.get('diets', ()):
+                continue
+            keys = self.recipe_keys[recipe_id]
+            used = keys & have
+            # How much of what the user has (weighted towards expiring items) gets used up
+            coverage = (len(used) + len(used & urgent)) / wanted_weight
+            # How much of the recipe the user can actually make from what they have
+            completeness = len(used) / len(keys)
+            score = 0.6 * coverage + 0.4 * completeness
+            if time_limit and recipe['time_minutes'] > time_limit:
+                score *= 0.5
+            results.append((round(score, 3), recipe))
+
+        results.sort(key=lambda r: (-r[0], r[1]['time_minutes']))
+        return results[:limit]
+
+    def best_match(self, ingredients, expiring=None, time_limit=None, diet=None, min_score=MIN_LOCAL_SCORE):
+        """The top recipe if it scores at least ``min_score``, else None"""
+        results = self.search(ingredients, expiring=expiring, time_limit=time_limit, diet=diet, limit=1)
+        if results and results[0][0] >= min_score:
+            return results[0][1]
+        return None
+
+    def best_for_item(self, name):
+        """Simplest recipe (fewest other ingredients, then quickest) that uses the item"""
+        recipe_ids = self.postings.get(normalize_ingredient(name), ())
+        if not recipe_ids:
+            return None
+        best = min(recipe_ids, key=lambda i: (len(self.recipe_keys[i]), self.recipes[i]['time_minutes']))
+        return self.recipes[best]
+
+
+def _format_quantity(value):
+    value = value.limit_denominator(8)
+    whole, rest = divmod(value.numerator, value.denominator)
+    if not rest:
+        return str(whole)
+    fraction = f"{rest}/{value.denominator}"
+    return f"{whole} {fraction}" if whole else fraction
+
+
+def scale_amount(amount, factor):
+    """Scale the first quantity in an ingredient amount ('1 1/2 cups flour' x 2 -> '3 cups flour').
+    Amounts without a number ('a pinch of salt') are returned unchanged."""
+    match = _quantity_re.search(amount)
+    if not match or factor == 1:
+        return amount
+    text = match.group(1)
+    if '/' in text:
+        value = sum((Fraction(part) for part in text.split()), Fraction(0))
+    else:
+        value = Fraction(text)
+    return amount[:match.start()] + _format_quantity(value * Fraction(factor)) + amount[match.end():]
+
+
+def recipe_to_markdown(recipe, num_people=None):
+    """Render a corpus recipe in the same Markdown shape Gemini returns, with the
+    ingredient amounts scaled from the recipe's servings to ``num_people``"""
+    servings = recipe['servings']
+    try:
+        people = int(num_people) if num_people else servings
+    except (TypeError, ValueError):
+        people = servings
+    if people <= 0:
+        people = servings
+    factor = Fraction(people, servings)
+    lines = [f"## {recipe['emoji']} {recipe['name']}", '']
+    lines.append(f"**Time:** {recipe['time_minutes']} minutes")
+    lines.append(f"**Serves:** {people}")
+    lines.append(f"**Difficulty:** {recipe['difficulty']}")
+    lines.append('')
+    lines.append('### Ingredients')
+    lines.extend(f"* {scale_amount(amount, factor)}" for _, amount in recipe['ingredients'])
+    lines.append('')
+    lines.append('### Instructions')
+    lines.extend(f"{n}. {step}" for n, step in enumerate(recipe['steps'], 1))
+    return '\n'.join(lines)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_recipe_index():
+    """Process-wide index, loaded from the bundled corpus on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RecipeIndex.load()
+    return _index
@@ -0,0 +1,212 @@
+"""Chunked, resumable uploads written straight to disk.
+
+A client starts an upload with its filename, size and (optionally) SHA-256, then
+sends the bytes in chunks of any size up to MAX_CHUNK_SIZE, each tagged with the
+offset it starts at. Chunks are streamed from the request body onto the end of a
+partial file in READ_SIZE pieces, so memory use does not depend on chunk or file
+size. After a dropped connection the client asks for the current offset and
+carries on from there. Finalizing checks the size and checksum, moves the file
+into content-addressed media storage (foodsaver.media) and hands it to a
+background worker. Upload state lives in a JSON sidecar next to the partial file.
+
+Changes to one upload are serialized across threads and worker processes: a
+thread lock per upload that is only kept while someone holds or waits for it,
+around a lock row in a small SQLite file in the upload directory (the same
+``sqlite_lock`` single-flight uses between processes).
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+
+from foodsaver import media
+from foodsaver.singleflight import sqlite_lock
+
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024  # suggested to clients
+READ_SIZE = 64 * 1024
+UPLOAD_TTL = 24 * 60 * 60  # seconds before an abandoned upload is removed
+
+_upload_id_re = re.compile(r'^[0-9a-f]{32}$')
+LOCK_DB_NAME = 'locks.sqlite3'
+
+_locks = {}  # upload id -> [thread lock, number of holders and waiters]
+_locks_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    """Raised for unknown uploads and invalid chunks; ``status`` is the HTTP status to return"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _upload_dir():
+    path = settings.RESUMABLE_UPLOAD_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(upload_id):
+    if not _upload_id_re.match(upload_id or ''):
+        raise UploadError('Unknown upload', status=404)
+    base = os.path.join(_upload_dir(), upload_id)
+    return base + '.part', base + '.json'
+
+
+@contextmanager
+def _lock(upload_id):
+    """Hold ``upload_id`` against other threads and processes"""
+    with _locks_lock:
+        entry = _locks.setdefault(upload_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0], sqlite_lock(os.path.join(_upload_dir(), LOCK_DB_NAME), f'upload:{upload_id}'):
+            yield
+    finally:
+        with _locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[upload_id]
+
+
+def load_state(upload_id):
+    part_path, state_path = _paths(upload_id)
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        raise UploadError('Unknown upload', status=404)
+    state['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else state.get('offset', 0)
+    return state
+
+
+def save_state(state):
+    _, state_path = _paths(state['upload_id'])
+    temp_path = f'{state_path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+
+def update_state(upload_id, **changes):
+    with _lock(upload_id):
+        state = load_state(upload_id)
+        state.update(changes)
+        save_state(state)
+        return state
+
+
+def start_upload(filename, size, sha256=None, metadata=None):
+    """Create an upload and return its state"""
+    if not filename:
+        raise UploadError('filename is required')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be a number of bytes')
+    if not 0 < size <= MAX_UPLOAD_SIZE:
+        raise UploadError(f'size must be between 1 and {MAX_UPLOAD_SIZE} bytes')
+    if sha256 and not re.match(r'^[0-9a-fA-F]{64}$', sha256):
+        raise UploadError('sha256 must be 64 hex characters')
+
+    cleanup_stale_uploads()
+    upload_id = secrets.token_hex(16)
+    part_path, _ = _paths(upload_id)
+    open(part_path, 'wb').close()
+    state = {
+        'upload_id': upload_id,
+        'filename': os.path.basename(filename)[:200],
+        'size': size,
+        'sha256': sha256.lower() if sha256 else None,
+        'metadata': metadata or {},
+        'status': 'uploading',
+        'created': time.time(),
+        'offset': 0,
+    }
+    save_state(state)
+    return state
+
+
+def append_chunk(upload_id, offset, stream, length):
+    """Append ``length`` bytes read from ``stream`` at ``offset``. Returns the new offset.
+
+    The offset must equal the bytes received so far; a mismatch raises an
+    UploadError with status 409 and the current offset so the client can resume.
+    """
+    with _lock(upload_id):
+        state = load_state(upload_id)
+        if state['status'] != 'uploading':
+            raise UploadError('Upload is already finalized', status=409, offset=state['offset'])
+        if offset != state['offset']:
+            raise UploadError('Chunk does not start at the current offset', status=409, offset=state['offset'])
+        if length <= 0 or length > MAX_CHUNK_SIZE:
+            raise UploadError(f'Chunks must be between 1 and {MAX_CHUNK_SIZE} bytes', offset=state['offset'])
+        if offset + length > state['size']:
+            raise UploadError('Chunk goes past the declared size', offset=state['offset'])
+
+        part_path, _ = _paths(upload_id)
+        received = 0
+        with open(part_path, 'ab') as part:
+            while received < length:
+                piece = stream.read(min(READ_SIZE, length - received))
+                if not piece:
+                    break
+                part.write(piece)
+                received += len(piece)
+        if received < length:
+            # Connection dropped mid-chunk: keep the whole chunk or none of it
+            os.truncate(part_path, offset)
+            raise UploadError('Chunk body shorter than Content-Length', offset=offset)
+        return offset + received
+
+
+def finalize_upload(upload_id, prefix='food_images'):
+    """Verify a complete upload and move it into media storage. Returns ``(state, stored)``."""
+    with _lock(upload_id):
+        state = load_state(upload_id)
+        if state['status'] != 'uploading':
+            raise UploadError('Upload is already finalized', status=409, offset=state['offset'])
+        if state['offset'] != state['size']:
+            raise UploadError(f"Upload incomplete: {state['offset']} of {state['size']} bytes",
+                              status=409, offset=state['offset'])
+
+        part_path, _ = _paths(upload_id)
+        with open(part_path, 'rb') as part:
+            upload = File(part, name=state['filename'])
+            digest = media.file_digest(upload)
+            if state['sha256'] and digest != state['sha256']:
+                state['status'] = 'failed'
+                state['error'] = 'Checksum mismatch'
+                save_state(state)
+                os.remove(part_path)
+                raise UploadError('Checksum mismatch; start the upload again', status=422)
+            stored = media.store_upload(upload, prefix, digest=digest)
+        os.remove(part_path)
+
+        state.update(status='processing', stored_name=stored.name, sha256=digest, offset=state['size'])
+        save_state(state)
+        return state, stored
+
+
+def cleanup_stale_uploads(now=None):
+    """Remove partial uploads and state older than UPLOAD_TTL. Returns the number removed."""
+    now = now or time.time()
+    removed = 0
+    for entry in os.scandir(_upload_dir()):
+        if entry.name.endswith(('.part', '.json', '.tmp')) and now - entry.stat().st_mtime > UPLOAD_TTL:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
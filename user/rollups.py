@@ -0,0 +1,154 @@
+"""Monthly consumption and waste rollups maintained alongside FoodItemPurchase.
+
+``MonthlyConsumption`` holds one row per (food item, year, month) with purchase
+totals, and ``HouseholdMonthlyWaste`` one row per month with
+the household totals. Signals in user.signals refresh the affected rows whenever
+a purchase is saved or deleted. Bulk writes that bypass signals call
+``refresh_rollups`` with the keys they touched, and ``rebuild_rollups`` recomputes
+both tables (``manage.py rebuild_rollups``). Both send ``rollups_changed``.
+
+Signal-driven refreshes run on the thread that saved the purchase, inside its
+transaction, so a purchase and its rollup rows commit together. Saves made through
+the shared writer (foodsaver.db) therefore refresh on the writer thread too.
+"""
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from .models import FoodItemPurchase, HouseholdMonthlyWaste, MonthlyConsumption
+
+# Sent after rollup rows change, for consumers such as dead.forecast
+rollups_changed = Signal()
+
+REFRESH_CHUNK = 200
+BATCH_SIZE = 5000
+
+
+def monthly_totals(purchases):
+    """One grouped query: purchase totals per (food_item, year, month)"""
+    return (
+        purchases
+        .order_by()
+        .values('food_item_id', 'year_bought', 'month_bought')
+        .annotate(
+            total_bought=Coalesce(Sum('quantity_bought'), 0),
+            total_wasted=Coalesce(Sum('amount_wasted'), 0),
+            purchases=Count('id'),
+        )
+    )
+
+
+def waste_ratio(bought, wasted):
+    return round(wasted / bought, 4) if bought else 0.0
+
+
+def _rollup_rows(totals):
+    for row in totals:
+        year, month = row['year_bought'], row['month_bought']
+        yield MonthlyConsumption(
+            food_item_id=row['food_item_id'],
+            year=year,
+            month=month,
+            period=year * 100 + month,
+            total_bought=row['total_bought'],
+            total_wasted=row['total_wasted'],
+            purchases=row['purchases'],
+        )
+
+
+def _household_rows(rollups):
+    """Household totals per month, aggregated from the per-item rollup rows"""
+    totals = (
+        rollups
+        .order_by()
+        .values('period', 'year', 'month')
+        .annotate(
+            bought=Sum('total_bought'),
+            wasted=Sum('total_wasted'),
+            purchase_count=Sum('purchases'),
+            item_count=Count('food_item_id'),
+        )
+    )
+    for row in totals:
+        yield HouseholdMonthlyWaste(
+            period=row['period'],
+            year=row['year'],
+            month=row['month'],
+            total_bought=row['bought'],
+            total_wasted=row['wasted'],
+            waste_ratio=waste_ratio(row['bought'], row['wasted']),
+            purchases=row['purchase_count'],
+            items=row['item_count'],
+        )
+
+
+def refresh_household(periods):
+    """Recompute the household rows for an iterable of periods (year * 100 + month)"""
+    periods = sorted(set(periods))
+    for start in range(0, len(periods), REFRESH_CHUNK):
+        chunk = periods[start:start + REFRESH_CHUNK]
+        rows = list(_household_rows(MonthlyConsumption.objects.filter(period__in=chunk)))
+        found = {row.period for row in rows}
+        with transaction.atomic():
+            HouseholdMonthlyWaste.objects.filter(period__in=[p for p in chunk if p not in found]).delete()
+            HouseholdMonthlyWaste.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['period'],
+                update_fields=['total_bought', 'total_wasted', 'waste_ratio', 'purchases', 'items'],
+            )
+
+
+def refresh_rollups(keys):
+    """Recompute the rollup rows for an iterable of (food_item_id, year, month) keys"""
+    keys = list(set(keys))
+
+    for start in range(0, len(keys), REFRESH_CHUNK):
+        chunk = keys[start:start + REFRESH_CHUNK]
+        match = Q()
+        for item_id, year, month in chunk:
+            match |= Q(food_item_id=item_id, year_bought=year, month_bought=month)
+        rows = list(_rollup_rows(monthly_totals(FoodItemPurchase.objects.filter(match))))
+        found = {(r.food_item_id, r.year, r.month) for r in rows}
+
+        with transaction.atomic():
+            empty = Q()
+            for item_id, year, month in chunk:
+                if (item_id, year, month) not in found:
+                    empty |= Q(food_item_id=item_id, year=year, month=month)
+            if empty:
+                MonthlyConsumption.objects.filter(empty).delete()
+            MonthlyConsumption.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['food_item', 'year', 'month'],
+                update_fields=['total_bought', 'total_wasted', 'purchases', 'period'],
+            )
+
+    refresh_household(year * 100 + month for _, year, month in keys)
+    if keys:
+        rollups_changed.send(sender=MonthlyConsumption, keys=keys)
+    return keys
+
+
+def rebuild_rollups():
+    """Recompute the rollup tables from the purchase history. Returns the item-month row count."""
+    with transaction.atomic():
+        MonthlyConsumption.objects.all().delete()
+        count = 0
+        batch = []
+        for row in _rollup_rows(monthly_totals(FoodItemPurchase.objects.all()).iterator()):
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                MonthlyConsumption.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        MonthlyConsumption.objects.bulk_create(batch)
+        count += len(batch)
+
+        HouseholdMonthlyWaste.objects.all().delete()
+        HouseholdMonthlyWaste.objects.bulk_create(_household_rows(MonthlyConsumption.objects.all()))
+
+    rollups_changed.send(sender=MonthlyConsumption, keys=None)
+    return count
@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from foodsaver import media
+from foodsaver.db import writer as db_writer
+
+from .dashboard_cache import bump_inventory_version
+from .models import FoodItem, FoodItemPurchase
+from .rollups import refresh_rollups
+
+
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+def food_item_changed(sender, **kwargs):
+    bump_inventory_version()
+
+
+@receiver(media.derivatives_built)
+def record_image_variants(sender, name, variants, **kwargs):
+    """Note the finished variants on every item showing the image, so listings link them"""
+    def update():
+        if FoodItem.objects.filter(image=name).update(image_variants=variants):
+            bump_inventory_version()
+    db_writer.submit(update)
+
+
+@receiver(pre_save, sender=FoodItemPurchase)
+def remember_purchase_month(sender, instance, **kwargs):
+    """Keep the pre-update month so moving a purchase refreshes both rollup rows"""
+    instance._rollup_key_before = None
+    if instance.pk:
+        instance._rollup_key_before = (
+            FoodItemPurchase.objects
+            .filter(pk=instance.pk)
+            .values_list('food_item_id', 'year_bought', 'month_bought')
+            .first()
+        )
+
+
+@receiver(post_save, sender=FoodItemPurchase)
+@receiver(post_delete, sender=FoodItemPurchase)
+def purchase_changed(sender, instance, **kwargs):
+    keys = [(instance.food_item_id, instance.year_bought, instance.month_bought)]
+    if getattr(instance, '_rollup_key_before', None):
+        keys.append(instance._rollup_key_before)
+    refresh_rollups(keys)
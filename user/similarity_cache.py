@@ -0,0 +1,115 @@
+"""Similarity cache for chatbot answers.
+
+Questions are encoded as hashed TF-IDF vectors (word unigrams and bigrams hashed
+into a fixed number of columns) and kept as rows of one NumPy matrix. A new
+question reuses the answer of the most similar stored question when their cosine
+similarity clears the threshold, so rephrasings of common questions don't go
+back to Gemini. The cache holds a fixed number of entries and evicts the least
+recently used one when full.
+"""
+import math
+import re
+import threading
+import zlib
+
+import numpy as np
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'can', 'could', 'do', 'does', 'for', 'how', 'i', 'in', 'is',
+    'it', 'me', 'my', 'of', 'on', 'or', 'please', 'should', 'the', 'to', 'what', 'which',
+    'with', 'would', 'you', 'your',
+}
+
+_token_re = re.compile(r"[a-z0-9']+")
+
+
+def _stem(word):
+    """Crude plural stripping so 'banana' and 'bananas' hash to the same column"""
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-2] if word.endswith('oes') else word[:-1]
+    return word
+
+
+class SimilarityCache:
+    def __init__(self, capacity=1024, dim=2048, threshold=0.85):
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.squared = np.zeros((capacity, dim), dtype=np.float32)  # for row norms under current idf
+        self.doc_freq = np.zeros(dim, dtype=np.float32)
+        self.answers = [None] * capacity
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def encode(self, text):
+        """Sublinear term-frequency vector of the question's hashed unigrams and bigrams"""
+        words = [_stem(w) for w in _token_re.findall(text.lower()) if w not in STOP_WORDS]
+        terms = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+        counts = {}
+        for term in terms:
+            column = zlib.crc32(term.encode()) % self.dim
+            counts[column] = counts.get(column, 0) + 1
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for column, count in counts.items():
+            vector[column] = 1.0 + math.log(count)
+        return vector
+
+    def _idf(self):
+        return np.log((1.0 + self.size) / (1.0 + self.doc_freq)) + 1.0
+
+    def get(self, question):
+        """Cached answer for a similar enough question, or None"""
+        vector = self.encode(question)
+        with self.lock:
+            if self.size and vector.any():
+                idf = self._idf()
+                columns = np.flatnonzero(vector)
+                query = vector[columns] * idf[columns]
+                dots = self.matrix[:self.size, columns] @ (query * idf[columns])
+                row_norms = np.sqrt(self.squared[:self.size] @ (idf * idf))
+                similarity = dots / np.maximum(row_norms * np.linalg.norm(query), 1e-9)
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.threshold:
+                    self.clock += 1
+                    self.last_used[best] = self.clock
+                    self.hits += 1
+                    return self.answers[best]
+            self.misses += 1
+            return None
+
+    def put(self, question, answer):
+        vector = self.encode(question)
+        if not vector.any():
+            return
+        with self.lock:
+            if self.size < self.capacity:
+                slot = self.size
+                self.size += 1
+            else:
+                slot = int(np.argmin(self.last_used))
+                self.doc_freq -= self.matrix[slot] > 0
+                self.evictions += 1
+            self.matrix[slot] = vector
+            self.squared[slot] = vector * vector
+            self.doc_freq += vector > 0
+            self.answers[slot] = answer
+            self.clock += 1
+            self.last_used[slot] = self.clock
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': self.size,
+            'capacity': self.capacity,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,95 @@
+from datetime import date
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from dead.forecast import schedule_refresh
+from user import analytics
+from user.models import FoodItem, FoodItemPurchase
+from user.rollups import rollups_changed
+
+
+class PeriodTests(SimpleTestCase):
+    def test_parse_and_format(self):
+        self.assertEqual(analytics.parse_period('2025-03', 'from'), 202503)
+        self.assertEqual(analytics.format_period(202503), '2025-03')
+        for bad in ('2025', '2025-13', 'march', '2025-0'):
+            with self.assertRaises(analytics.AnalyticsQueryError):
+                analytics.parse_period(bad, 'from')
+
+    def test_default_range_is_the_last_twelve_months(self):
+        self.assertEqual(analytics.default_range(date(2025, 3, 9)), (202404, 202503))
+        self.assertEqual(analytics.default_range(date(2025, 12, 1)), (202501, 202512))
+
+
+class WasteReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rollups_changed.disconnect(dispatch_uid='dead.forecast.schedule_refresh')
+        try:
+            cls.milk = FoodItem.objects.create(name='milk', expiry_text='2025-06-01')
+            cls.bread = FoodItem.objects.create(name='bread', expiry_text='2025-06-01')
+            for item, month, bought, wasted in [
+                (cls.milk, 1, 10, 2), (cls.milk, 1, 5, None), (cls.milk, 2, 8, 4),
+                (cls.bread, 2, 4, 3), (cls.bread, 4, 6, 0),
+            ]:
+                FoodItemPurchase.objects.create(food_item=item, quantity_bought=bought, month_bought=month,
+                                                year_bought=2025, amount_wasted=wasted)
+        finally:
+            rollups_changed.connect(schedule_refresh, dispatch_uid='dead.forecast.schedule_refresh')
+
+    def test_report(self):
+        report = analytics.waste_report({'from': '2025-01', 'to': '2025-03', 'item': str(self.milk.id)})
+        self.assertEqual(report['totals'], {'total_bought': 27, 'total_wasted': 9,
+                                            'waste_ratio': round(9 / 27, 4), 'purchases': 4})
+        self.assertEqual([(m['month'], m['total_bought'], m['items']) for m in report['months']],
+                         [('2025-01', 15, 1), ('2025-02', 12, 2)])
+        self.assertEqual([(i['name'], i['total_wasted']) for i in report['top_wasted']],
+                         [('milk', 6), ('bread', 3)])
+        self.assertEqual([(m['month'], m['waste_ratio']) for m in report['item']['months']],
+                         [('2025-01', round(2 / 15, 4)), ('2025-02', 0.5)])
+
+    def test_top_limit_and_default_range(self):
+        report = analytics.waste_report({'top': '1'}, today=date(2025, 4, 30))
+        self.assertEqual((report['from'], report['to']), ('2024-05', '2025-04'))
+        self.assertEqual(report['totals']['total_bought'], 33)
+        self.assertEqual(len(report['top_wasted']), 1)
+
+    def test_endpoint(self):
+        data = self.client.get('/analytics/waste/', {'from': '2025-02', 'to': '2025-02'}).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['totals']['total_wasted'], 7)
+        for params in ({'from': '2025-03', 'to': '2025-01'}, {'top': 'ten'}, {'to': '25'}):
+            data = self.client.get('/analytics/waste/', params).json()
+            self.assertFalse(data['success'])
+
+
+class HouseholdMigrationTests(TransactionTestCase):
+    before = [('user', '0008_monthlyconsumption')]
+    after = [('user', '0009_householdmonthlywaste')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_migration_builds_household_totals(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        Item, Rollup = apps.get_model('user', 'FoodItem'), apps.get_model('user', 'MonthlyConsumption')
+        milk = Item.objects.create(name='milk', expiry_text='2025-06-01')
+        bread = Item.objects.create(name='bread', expiry_text='2025-06-01')
+        Rollup.objects.create(food_item=milk, year=2025, month=3, period=202503,
+                              total_bought=6, total_wasted=1, purchases=2)
+        Rollup.objects.create(food_item=bread, year=2025, month=3, period=202503,
+                              total_bought=2, total_wasted=1, purchases=1)
+        Rollup.objects.create(food_item=bread, year=2025, month=4, period=202504,
+                              total_bought=3, total_wasted=0, purchases=1)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        Household = executor.loader.project_state(self.after).apps.get_model('user', 'HouseholdMonthlyWaste')
+        rows = Household.objects.order_by('period').values_list(
+            'period', 'total_bought', 'total_wasted', 'waste_ratio', 'purchases', 'items')
+        self.assertEqual(list(rows), [(202503, 8, 2, 0.25, 3, 2), (202504, 3, 0, 0.0, 1, 1)])
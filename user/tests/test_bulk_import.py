@@ -0,0 +1,87 @@
+import io
+import json
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TransactionTestCase, override_settings
+
+from user import bulk_import
+from user.models import FoodItem, FoodItemPurchase, MonthlyConsumption
+
+FOOD_CSV = """name,expiry
+Milk,2025-06-03
+,2025-06-04
+Bread,soon
+Eggs,12th Jan 2025
+"""
+
+PURCHASES_JSONL = """{"food_item": "milk", "quantity_bought": 3, "month_bought": "March", "year_bought": 2025}
+{"food_item": "Milk", "quantity_bought": "2", "purchase_date": "2025-03-20", "amount_wasted": 1}
+{"food_item": "Cheese", "quantity_bought": 1, "month_bought": 4, "year_bought": 2025}
+{"food_item": "Milk", "quantity_bought": -1, "month_bought": 3}
+not json
+"""
+
+
+def records(text, fmt):
+    return bulk_import.iter_records(io.StringIO(text), fmt)
+
+
+class BulkImportTests(TransactionTestCase):
+    def test_food_items(self):
+        rejects = io.StringIO()
+        result = bulk_import.import_food_items(records(FOOD_CSV, 'csv'), batch_size=2, reject_file=rejects)
+        self.assertEqual((result.rows, result.imported, result.rejected), (4, 3, 1))
+        self.assertEqual(json.loads(rejects.getvalue()), {
+            'line': 3, 'error': 'Missing name', 'record': {'name': '', 'expiry': '2025-06-04'}})
+        dates = dict(FoodItem.objects.values_list('name', 'expiry_date'))
+        self.assertEqual(str(dates['Eggs']), '2025-01-12')
+        self.assertIsNone(dates['Bread'])
+
+    def test_purchases_update_rollups(self):
+        FoodItem.objects.create(name='Milk', expiry_text='2025-06-03')
+        result = bulk_import.import_purchases(records(PURCHASES_JSONL, 'jsonl'), batch_size=2)
+        self.assertEqual((result.imported, result.rejected), (2, 3))
+        self.assertEqual([r['line'] for r in result.sample_rejects], [3, 4, 5])
+        rollup = MonthlyConsumption.objects.get(year=2025, month=3)
+        self.assertEqual((rollup.total_bought, rollup.total_wasted, rollup.purchases), (5, 1, 2))
+
+        result = bulk_import.import_purchases(records(PURCHASES_JSONL, 'jsonl'), create_missing_items=True)
+        self.assertEqual((result.imported, result.created_items), (3, 1))
+        self.assertEqual(FoodItemPurchase.objects.filter(food_item__name='Cheese').count(), 1)
+
+
+class BulkImportApiTests(TransactionTestCase):
+    def setUp(self):
+        self.reject_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.reject_dir.cleanup)
+        override = override_settings(IMPORT_REJECT_DIR=self.reject_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('kitchen', password='pantry-123')
+
+    def post(self, client):
+        upload = SimpleUploadedFile('items.csv', FOOD_CSV.encode())
+        return client.post('/inventory/import/', {'file': upload, 'kind': 'fooditems'})
+
+    def test_requires_login(self):
+        response = self.post(Client())
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(FoodItem.objects.exists())
+
+    def test_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        self.assertEqual(self.post(client).status_code, 403)
+        self.assertFalse(FoodItem.objects.exists())
+
+    def test_import_and_download_rejects(self):
+        client = Client()
+        client.force_login(self.user)
+        data = self.post(client).json()
+        self.assertEqual((data['imported'], data['rejected']), (3, 1))
+        download = client.get(data['reject_file_url'])
+        self.assertEqual(json.loads(b''.join(download.streaming_content))['error'], 'Missing name')
+        self.assertEqual(Client().get(data['reject_file_url']).status_code, 302)
+        self.assertEqual(client.get('/inventory/import/rejects/not-a-uuid/').status_code, 404)
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from user.dashboard_cache import bump_inventory_version, dashboard_validators
+from user.models import FoodItem, InventoryVersion
+
+
+class DashboardCacheTests(TestCase):
+    today = date(2025, 6, 1)
+
+    def test_changes_invalidate(self):
+        key, etag, _ = dashboard_validators(self.today, 'status=good')
+        self.assertEqual(dashboard_validators(self.today, 'status=good')[:2], (key, etag))
+        self.assertNotEqual(dashboard_validators(self.today, 'status=expired')[0], key)
+        self.assertNotEqual(dashboard_validators(self.today + timedelta(days=1), 'status=good')[0], key)
+
+        FoodItem.objects.create(name='milk', expiry_text='2025-06-03')
+        key2, etag2, _ = dashboard_validators(self.today, 'status=good')
+        self.assertNotEqual((key2, etag2), (key, etag))
+        bump_inventory_version()
+        self.assertNotEqual(dashboard_validators(self.today, 'status=good')[0], key2)
+
+    def test_version_is_shared_through_the_database(self):
+        key, _, modified = dashboard_validators(self.today, '')
+        # Another worker process bumping the version only touches the database
+        InventoryVersion.objects.update(version=12345, modified=modified + 60)
+        key2, etag2, modified2 = dashboard_validators(self.today, '')
+        self.assertNotEqual(key2, key)
+        self.assertTrue(etag2.startswith('"12345-'))
+        self.assertEqual(modified2, modified + 60)
+
+    def test_conditional_requests(self):
+        first = self.client.get('/dashboard/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        FoodItem.objects.create(name='eggs', expiry_text='2025-06-03')
+        second = self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertIn(b'eggs', second.content)
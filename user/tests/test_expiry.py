@@ -0,0 +1,73 @@
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from user.dates import parse_expiry_date
+from user.models import FoodItem
+
+
+class ParseExpiryDateTests(SimpleTestCase):
+    def test_formats(self):
+        cases = {
+            '2024-01-12': date(2024, 1, 12),
+            'Best before 2024/1/5': date(2024, 1, 5),
+            '01/12/2024': date(2024, 1, 12),  # month first, like the voice form
+            '25/12/2024': date(2024, 12, 25),  # only valid day first
+            '3.4.25': date(2025, 3, 4),
+            '12th Jan 2024': date(2024, 1, 12),
+            '1st of March 2025': date(2025, 3, 1),
+            'January 12, 2024': date(2024, 1, 12),
+            'Sept 3 2024': date(2024, 9, 3),
+            '12-JAN-24': date(2024, 1, 12),
+            'Mar 2025': date(2025, 3, 31),
+            'Feb 2024': date(2024, 2, 29),
+            '03/2025': date(2025, 3, 31),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_expiry_date(text), expected)
+
+    def test_unparseable(self):
+        for text in ('', None, 'soon', '2024-02-30', '31/31/2024', 'Foo 2024', '13/2025'):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_expiry_date(text))
+
+
+class FoodItemSaveTests(TestCase):
+    def test_date_follows_text_changes(self):
+        item = FoodItem.objects.create(name='milk', expiry_text='2025-06-03')
+        self.assertEqual(item.expiry_date, date(2025, 6, 3))
+        item = FoodItem.objects.get(pk=item.pk)
+        item.expiry_text = 'smudged'
+        item.save()
+        item.refresh_from_db()
+        self.assertIsNone(item.expiry_date)
+        item.expiry_text = '4 June 2025'
+        item.save(update_fields=['expiry_text'])
+        self.assertEqual(FoodItem.objects.get(pk=item.pk).expiry_date, date(2025, 6, 4))
+
+    def test_date_set_directly_is_kept(self):
+        item = FoodItem.objects.create(name='cheese', expiry_text='best before end of June')
+        self.assertIsNone(item.expiry_date)
+        item = FoodItem.objects.get(pk=item.pk)
+        item.expiry_date = date(2025, 6, 30)
+        item.save()
+        self.assertEqual(FoodItem.objects.get(pk=item.pk).expiry_date, date(2025, 6, 30))
+        created = FoodItem.objects.create(name='bread', expiry_text='soon', expiry_date=date(2025, 6, 2))
+        self.assertEqual(FoodItem.objects.get(pk=created.pk).expiry_date, date(2025, 6, 2))
+
+    def test_storage_checked_only_for_new_images(self):
+        with mock.patch('foodsaver.media.available_variants', return_value=['thumb_webp']) as variants:
+            item = FoodItem.objects.create(name='apple', expiry_text='2025-06-03', image='food_images/a.jpg')
+            self.assertEqual(variants.call_count, 1)
+            item = FoodItem.objects.get(pk=item.pk)
+            item.name = 'green apple'
+            item.save()
+            item.save(update_fields=['name'])
+            FoodItem.objects.only('name').get(pk=item.pk).save(update_fields=['name'])
+            self.assertEqual(variants.call_count, 1)
+            item.image = 'food_images/b.jpg'
+            item.save()
+            self.assertEqual(variants.call_count, 2)
+        self.assertEqual(FoodItem.objects.get(pk=item.pk).image_variants, ['thumb_webp'])
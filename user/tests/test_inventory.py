@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+
+from user.inventory import InventoryQueryError, decode_cursor, encode_cursor, inventory_page
+from user.models import FoodItem
+
+
+class InventoryPaginationTests(TestCase):
+    today = date(2025, 6, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        # Several items share each date, so pages split ties on id
+        for offset in (-10, -1, 0, 0, 2, 3, 5, 5, 5, 30):
+            day = cls.today + timedelta(days=offset)
+            FoodItem.objects.create(name=f'item {offset}', expiry_text=day.isoformat())
+        for text in ('', 'soon', 'n/a'):
+            FoodItem.objects.create(name=f'undated {text}', expiry_text=text)
+
+    def walk(self, **params):
+        ids, cursor = [], None
+        while True:
+            page_params = dict(params, limit='3')
+            if cursor:
+                page_params['cursor'] = cursor
+            rows, cursor = inventory_page(page_params, today=self.today)
+            self.assertLessEqual(len(rows), 3)
+            ids += [item.id for item in rows]
+            if cursor is None:
+                return ids
+
+    def expected(self, items, descending=False):
+        dated = sorted((item for item in items if item.expiry_date), key=lambda item: (item.expiry_date, item.id),
+                       reverse=descending)
+        undated = sorted((item.id for item in items if item.expiry_date is None), reverse=descending)
+        return [item.id for item in dated] + undated
+
+    def test_walks_dated_then_undated(self):
+        items = list(FoodItem.objects.all())
+        self.assertEqual(self.walk(), self.expected(items))
+        self.assertEqual(self.walk(order='desc'), self.expected(items, descending=True))
+
+    def test_status_filters(self):
+        items = list(FoodItem.objects.with_status(self.today))
+        for statuses in ('expired', 'expiring soon', 'good', 'invalid date', 'expired,invalid date',
+                         'expiring soon,expiring this week,good'):
+            wanted = statuses.split(',')
+            for order in ('asc', 'desc'):
+                with self.subTest(status=statuses, order=order):
+                    expected = self.expected([item for item in items if item.status in wanted], order == 'desc')
+                    self.assertEqual(self.walk(status=statuses, order=order), expected)
+
+    def test_date_range_excludes_undated(self):
+        ids = self.walk(expiry_from=self.today.isoformat(), expiry_to=(self.today + timedelta(days=5)).isoformat())
+        self.assertEqual(len(ids), 7)
+        self.assertTrue(all(FoodItem.objects.get(id=i).expiry_date for i in ids))
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'status': 'stale'}, {'limit': 'ten'}, {'expiry_from': 'June'}):
+            with self.subTest(params=params), self.assertRaises(InventoryQueryError):
+                inventory_page(params, today=self.today)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(date(2025, 6, 1), 42)), (date(2025, 6, 1), 42))
+        self.assertEqual(decode_cursor(encode_cursor(None, 7)), (None, 7))
+
+    def test_projection(self):
+        rows, _ = inventory_page({'status': 'expiring soon', 'limit': '2'}, today=self.today,
+                                 fields=['name', 'days_left', 'status', 'expiry_date'])
+        self.assertEqual(rows[0], {'name': 'item 0', 'days_left': 0, 'status': 'expiring soon',
+                                   'expiry_date': self.today.isoformat()})
+
+    def test_deep_pages_use_the_index(self):
+        rows, cursor = inventory_page({'limit': '3'}, today=self.today)
+        with self.assertNumQueries(1) as queries:
+            inventory_page({'limit': '3', 'cursor': cursor}, today=self.today)
+        sql = queries.captured_queries[0]['sql']
+        with connection.cursor() as c:
+            c.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(str(row) for row in c.fetchall())
+        self.assertIn('fooditem_expiry_id_idx', plan)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from user import ledger
+from user.models import LLMCall
+
+
+class LedgerTests(TransactionTestCase):
+    def test_track_and_summarize(self):
+        since = timezone.now() - timedelta(minutes=1)
+        response = SimpleNamespace(text='a recipe', usage_metadata=SimpleNamespace(
+            prompt_token_count=12, candidates_token_count=30))
+        with ledger.track('recipe', 'prompt') as call:
+            call.set_response(response)
+        with self.assertRaises(ValueError):
+            with ledger.track('recipe', 'prompt'):
+                raise ValueError('quota')
+        ledger.record_cache_hit('recipe', 'prompt', 'a recipe')
+        ledger.record_cache_hit('chatbot', 'hi', 'hello')
+        ledger.flush()
+
+        first = LLMCall.objects.filter(call_site='recipe', cache_hit=False).order_by('id').first()
+        self.assertEqual((first.prompt_chars, first.response_chars), (6, 8))
+        self.assertEqual((first.prompt_tokens, first.response_tokens), (12, 30))
+        self.assertEqual(LLMCall.objects.filter(error_class='ValueError').count(), 1)
+
+        summary = ledger.summarize(since, bucket_seconds=60)
+        recipe = summary['recipe']
+        self.assertEqual((recipe['calls'], recipe['cache_hits'], recipe['errors']), (3, 1, 1))
+        self.assertEqual(recipe['prompt_tokens'], 12)
+        self.assertIsNotNone(recipe['p95_ms'])
+        self.assertEqual(sum(bucket['calls'] for bucket in recipe['buckets']), 3)
+        # Cache hits alone leave no upstream latency to report
+        self.assertIsNone(summary['chatbot']['p50_ms'])
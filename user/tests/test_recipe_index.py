@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+
+from user.recipe_index import (
+    RecipeIndex, get_recipe_index, normalize_ingredient, recipe_to_markdown, scale_amount, split_ingredients,
+)
+
+
+def recipe(name, ingredients, minutes=20, diets=()):
+    return {'name': name, 'emoji': '', 'time_minutes': minutes, 'servings': 2, 'difficulty': 'Easy',
+            'diets': list(diets), 'steps': ['Cook.'], 'ingredients': [[key, key] for key in ingredients]}
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_plurals(self):
+        cases = {
+            '2 Ripe Tomatoes': 'tomato', 'berries': 'berry', 'peaches': 'peach', 'radishes': 'radish',
+            'boxes': 'box', 'eggs': 'egg', 'hummus': 'hummus', 'asparagus': 'asparagus', 'molasses': 'molasses',
+            'swiss': 'swiss', 'watercress': 'watercress', 'glasses': 'glass', 'rice': 'rice', '': '',
+        }
+        for text, key in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(normalize_ingredient(text), key)
+        self.assertEqual(split_ingredients('tomatoes, 2 eggs and onion; Eggs'), ['tomato', 'egg', 'onion'])
+
+
+class RecipeIndexTests(SimpleTestCase):
+    def test_ranking(self):
+        index = RecipeIndex([
+            recipe('omelette', ['egg', 'onion', 'salt']),
+            recipe('salad', ['tomato', 'onion', 'cucumber', 'feta'], diets=['Vegetarian']),
+            recipe('stew', ['tomato', 'onion', 'beef'], minutes=120),
+        ])
+        self.assertEqual(index.best_match('eggs, onions')['name'], 'omelette')
+        # The expiring item decides between otherwise similar recipes
+        names = [r['name'] for _, r in index.search('tomato, onion, egg', expiring=['egg'])]
+        self.assertEqual(names[0], 'omelette')
+        self.assertEqual(index.search('tomato, onion')[0][1]['name'], 'stew')
+        self.assertEqual(index.search('tomato, onion', time_limit=30)[0][1]['name'], 'salad')
+        self.assertIsNone(index.best_match('beef', diet='Vegetarian'))
+        self.assertIsNone(index.best_match('saffron'))
+        self.assertEqual(index.best_for_item('Onions')['name'], 'omelette')
+
+    def test_bundled_corpus_loads(self):
+        index = get_recipe_index()
+        self.assertTrue(index.recipes)
+        self.assertTrue(all(recipe['servings'] > 0 for recipe in index.recipes))
+
+
+class ScaleTests(SimpleTestCase):
+    def test_scale_amount(self):
+        self.assertEqual(scale_amount('1 1/2 cups flour', 2), '3 cups flour')
+        self.assertEqual(scale_amount('1/3 cup milk', 3), '1 cup milk')
+        self.assertEqual(scale_amount('2 eggs', 0.5), '1 eggs')
+        self.assertEqual(scale_amount('0.5 tsp salt', 3), '1 1/2 tsp salt')
+        self.assertEqual(scale_amount('a pinch of salt', 4), 'a pinch of salt')
+
+    def test_markdown_scales_to_people(self):
+        text = recipe_to_markdown({**recipe('rice', []), 'ingredients': [['rice', '1 cup rice']]}, '6')
+        self.assertIn('**Serves:** 6', text)
+        self.assertIn('* 3 cup rice', text)
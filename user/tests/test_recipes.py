@@ -0,0 +1,63 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from user import views
+
+
+class RecipeBatchTests(SimpleTestCase):
+    def test_fan_out_is_bounded(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def generate(params):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            if params['ingredients'] == 'bad':
+                raise RuntimeError('quota')
+            return f"recipe for {params['ingredients']}", 'gemini'
+
+        param_sets = [views.get_recipe_params({'ingredients': f'item {i}'}) for i in range(12)]
+        param_sets[5]['ingredients'] = 'bad'
+        with mock.patch.object(views, 'generate_recipe', side_effect=generate):
+            results = list(views.run_recipe_batch(param_sets))
+
+        self.assertLessEqual(peak[0], views.RECIPE_BATCH_CONCURRENCY)
+        self.assertEqual(sorted(r['index'] for r in results), list(range(12)))
+        failed = [r for r in results if not r['success']]
+        self.assertEqual([r['index'] for r in failed], [5])
+        self.assertTrue(all(r['cached'] is False for r in results if r['success']))
+
+    def test_endpoint(self):
+        with mock.patch.object(views, 'generate_recipe', side_effect=lambda p: (p['ingredients'], 'cache')):
+            response = self.client.post('/recipe/generate/batch/', json.dumps({
+                'items': ['rice, egg', {'ingredients': ['milk', 'oats']}, '  '],
+                'num_people': 3,
+                'stream': False,
+            }), content_type='application/json')
+            data = response.json()
+            self.assertEqual(data['count'], 2)
+            self.assertEqual([r['response'] for r in data['results']], ['rice, egg', 'milk, oats'])
+
+            response = self.client.post('/recipe/generate/batch/', json.dumps({'items': ['rice']}),
+                                        content_type='application/json')
+            lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+            self.assertEqual(lines[-1], {'done': True, 'count': 1})
+
+    def test_chatbot_uses_configured_key(self):
+        genai = mock.Mock()
+        genai.GenerativeModel.return_value.generate_content.return_value.text = 'Try a frittata.'
+        with mock.patch.object(views, 'genai', genai), mock.patch.object(views, 'ledger'), \
+                mock.patch.object(views, 'chatbot_cache') as cache:
+            cache.get.return_value = None
+            response = self.client.post('/chatbot/send/', json.dumps({'message': 'eggs?'}),
+                                        content_type='application/json')
+        self.assertEqual(response.json()['response'], 'Try a frittata.')
+        genai.configure.assert_not_called()
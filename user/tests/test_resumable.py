@@ -0,0 +1,142 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from user import resumable
+
+
+class UploadDirMixin:
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(RESUMABLE_UPLOAD_DIR=os.path.join(directory.name, 'uploads'),
+                                     MEDIA_ROOT=os.path.join(directory.name, 'media'))
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ResumableUploadTests(UploadDirMixin, SimpleTestCase):
+    data = bytes(range(256)) * 40
+
+    def start(self, **kwargs):
+        kwargs.setdefault('sha256', hashlib.sha256(self.data).hexdigest())
+        return resumable.start_upload('photo.jpg', len(self.data), **kwargs)['upload_id']
+
+    def send(self, upload_id, start, end):
+        return resumable.append_chunk(upload_id, start, io.BytesIO(self.data[start:end]), end - start)
+
+    def test_start_validation(self):
+        for filename, size in [('', 10), ('a.jpg', 'ten'), ('a.jpg', 0), ('a.jpg', resumable.MAX_UPLOAD_SIZE + 1)]:
+            with self.assertRaises(resumable.UploadError):
+                resumable.start_upload(filename, size)
+        with self.assertRaises(resumable.UploadError):
+            resumable.start_upload('a.jpg', 10, sha256='abc')
+        with self.assertRaises(resumable.UploadError) as error:
+            resumable.load_state('../../etc/passwd')
+        self.assertEqual(error.exception.status, 404)
+
+    def test_chunks_must_arrive_in_order(self):
+        upload_id = self.start()
+        self.assertEqual(self.send(upload_id, 0, 4000), 4000)
+        for start in (0, 3000, 5000):
+            with self.assertRaises(resumable.UploadError) as error:
+                self.send(upload_id, start, start + 1000)
+            self.assertEqual((error.exception.status, error.exception.offset), (409, 4000))
+        with self.assertRaises(resumable.UploadError):
+            resumable.append_chunk(upload_id, 4000, io.BytesIO(b'x' * 10000), 10000)  # past the size
+        self.assertEqual(self.send(upload_id, 4000, len(self.data)), len(self.data))
+
+    def test_short_chunk_is_dropped_whole(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, 1000)
+        with self.assertRaises(resumable.UploadError) as error:
+            resumable.append_chunk(upload_id, 1000, io.BytesIO(self.data[1000:1500]), 1000)
+        self.assertEqual(error.exception.offset, 1000)
+        self.assertEqual(resumable.load_state(upload_id)['offset'], 1000)
+
+    def test_finalize(self):
+        upload_id = self.start(metadata={'food_name': 'milk'})
+        self.send(upload_id, 0, 2000)
+        with self.assertRaises(resumable.UploadError) as error:
+            resumable.finalize_upload(upload_id)
+        self.assertEqual((error.exception.status, error.exception.offset), (409, 2000))
+
+        self.send(upload_id, 2000, len(self.data))
+        with mock.patch('foodsaver.media.schedule_derivatives'):
+            state, stored = resumable.finalize_upload(upload_id)
+        self.assertEqual(state['status'], 'processing')
+        self.assertEqual(stored.digest, hashlib.sha256(self.data).hexdigest())
+        with default_storage.open(stored.name, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(resumable.load_state(upload_id)['stored_name'], stored.name)
+        with self.assertRaises(resumable.UploadError) as error:
+            resumable.finalize_upload(upload_id)
+        self.assertEqual(error.exception.status, 409)
+
+    def test_checksum_mismatch(self):
+        upload_id = self.start(sha256='0' * 64)
+        self.send(upload_id, 0, len(self.data))
+        with self.assertRaises(resumable.UploadError) as error:
+            resumable.finalize_upload(upload_id)
+        self.assertEqual(error.exception.status, 422)
+        self.assertEqual(resumable.load_state(upload_id)['status'], 'failed')
+
+    def test_concurrent_chunks_at_one_offset(self):
+        upload_id = self.start()
+        barrier = threading.Barrier(8)
+        outcomes = []
+
+        def send():
+            barrier.wait()
+            try:
+                outcomes.append(self.send(upload_id, 0, 1000))
+            except resumable.UploadError as e:
+                outcomes.append(e.status)
+
+        threads = [threading.Thread(target=send) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), [409] * 7 + [1000])
+        self.assertEqual(resumable.load_state(upload_id)['offset'], 1000)
+        self.assertEqual(resumable._locks, {})
+
+    def test_cleanup_stale_uploads(self):
+        upload_id = self.start()
+        self.assertEqual(resumable.cleanup_stale_uploads(), 0)
+        self.assertEqual(resumable.cleanup_stale_uploads(now=os.path.getmtime(
+            os.path.join(resumable._upload_dir(), f'{upload_id}.json')) + resumable.UPLOAD_TTL + 1), 2)
+        with self.assertRaises(resumable.UploadError):
+            resumable.load_state(upload_id)
+
+
+class ResumableUploadViewTests(UploadDirMixin, TestCase):
+    def test_round_trip(self):
+        data = b'\xff\xd8' + os.urandom(3000)
+        start = self.client.post('/upload/resumable/', {'filename': 'p.jpg', 'size': len(data)},
+                                 content_type='application/json').json()
+        self.assertTrue(start['success'])
+        url = f"/upload/resumable/{start['upload_id']}/"
+
+        sent = self.client.put(url, data[:1000], content_type='application/octet-stream',
+                               headers={'Content-Range': f'bytes 0-999/{len(data)}'}).json()
+        self.assertEqual(sent['offset'], 1000)
+        conflict = self.client.put(f'{url}?offset=0', data[:1000], content_type='application/octet-stream')
+        self.assertEqual((conflict.status_code, conflict.json()['offset']), (409, 1000))
+        self.assertEqual(self.client.get(url).json()['offset'], 1000)
+        self.client.put(f'{url}?offset=1000', data[1000:], content_type='application/octet-stream')
+
+        with mock.patch('user.views.photo_executor') as executor, \
+                mock.patch('foodsaver.media.schedule_derivatives'):
+            done = self.client.post(f'{url}finalize/')
+        self.assertEqual(done.status_code, 202)
+        self.assertEqual(done.json()['status'], 'processing')
+        executor.submit.assert_called_once()
@@ -0,0 +1,112 @@
+import random
+from collections import Counter
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from dead.forecast import schedule_refresh
+from user.models import FoodItem, FoodItemPurchase, HouseholdMonthlyWaste, MonthlyConsumption
+from user.rollups import rebuild_rollups, refresh_rollups, rollups_changed
+
+
+def expected_rollups():
+    """Per item-month (bought, wasted, purchases) computed straight from the purchases"""
+    totals = Counter()
+    for purchase in FoodItemPurchase.objects.all():
+        key = (purchase.food_item_id, purchase.year_bought, purchase.month_bought)
+        totals[key + ('bought',)] += purchase.quantity_bought
+        totals[key + ('wasted',)] += purchase.amount_wasted or 0
+        totals[key + ('purchases',)] += 1
+    keys = {key[:3] for key in totals}
+    return {key: (totals[key + ('bought',)], totals[key + ('wasted',)], totals[key + ('purchases',)])
+            for key in keys}
+
+
+def stored_rollups():
+    return {
+        (row.food_item_id, row.year, row.month): (row.total_bought, row.total_wasted, row.purchases)
+        for row in MonthlyConsumption.objects.all()
+    }
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        # Keep the background forecast refresh out of these tests
+        rollups_changed.disconnect(dispatch_uid='dead.forecast.schedule_refresh')
+        self.addCleanup(rollups_changed.connect, schedule_refresh, dispatch_uid='dead.forecast.schedule_refresh')
+        self.sent = []
+        rollups_changed.connect(self.record_signal)
+        self.addCleanup(rollups_changed.disconnect, self.record_signal)
+        self.items = [FoodItem.objects.create(name=name, expiry_text='2025-06-01') for name in ('milk', 'rice', 'eggs')]
+
+    def record_signal(self, keys, **kwargs):
+        self.sent.append(keys)
+
+    def test_signals_keep_rollups_current(self):
+        rng = random.Random(4)
+        purchases = []
+        for _ in range(60):
+            action = rng.random()
+            if purchases and action < 0.2:
+                purchases.pop(rng.randrange(len(purchases))).delete()
+            elif purchases and action < 0.45:
+                purchase = rng.choice(purchases)
+                purchase.month_bought = rng.randint(1, 3)  # moves it between rollup rows
+                purchase.amount_wasted = rng.randint(0, purchase.quantity_bought)
+                purchase.save()
+            else:
+                quantity = rng.randint(1, 10)
+                purchases.append(FoodItemPurchase.objects.create(
+                    food_item=rng.choice(self.items), quantity_bought=quantity, month_bought=rng.randint(1, 3),
+                    year_bought=2025, amount_wasted=rng.randint(0, quantity)))
+        self.assertEqual(stored_rollups(), expected_rollups())
+
+        household = {row.period: (row.total_bought, row.total_wasted) for row in HouseholdMonthlyWaste.objects.all()}
+        expected = Counter()
+        for (_, year, month), (bought, wasted, _) in expected_rollups().items():
+            expected[(year * 100 + month, 'b')] += bought
+            expected[(year * 100 + month, 'w')] += wasted
+        self.assertEqual(household, {period: (expected[(period, 'b')], expected[(period, 'w')])
+                                     for period, _ in expected})
+        self.assertTrue(self.sent)
+
+    def test_rebuild_matches_incremental(self):
+        for i in range(30):
+            FoodItemPurchase.objects.create(food_item=self.items[i % 3], quantity_bought=i + 1,
+                                            month_bought=i % 12 + 1, year_bought=2024 + i % 2, amount_wasted=i % 4)
+        incremental = stored_rollups()
+        # Bulk writes skip signals; refresh_rollups and rebuild_rollups catch up
+        FoodItemPurchase.objects.filter(year_bought=2024).update(amount_wasted=0)
+        refresh_rollups([(item.id, 2024, month) for item in self.items for month in range(1, 13)])
+        self.assertEqual(stored_rollups(), expected_rollups())
+        self.assertNotEqual(stored_rollups(), incremental)
+        MonthlyConsumption.objects.all().delete()
+        self.assertEqual(rebuild_rollups(), len(expected_rollups()))
+        self.assertEqual(stored_rollups(), expected_rollups())
+        self.assertIsNone(self.sent[-1])
+
+
+class RollupMigrationTests(TransactionTestCase):
+    before = [('user', '0007_fooditem_expiry_id_idx')]
+    after = [('user', '0008_monthlyconsumption')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_migration_builds_rollups(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        Item, Purchase = apps.get_model('user', 'FoodItem'), apps.get_model('user', 'FoodItemPurchase')
+        milk = Item.objects.create(name='milk', expiry_text='2025-06-01')
+        Purchase.objects.create(food_item=milk, quantity_bought=4, month_bought=3, year_bought=2025, amount_wasted=1)
+        Purchase.objects.create(food_item=milk, quantity_bought=2, month_bought=3, year_bought=2025, amount_wasted=None)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        Rollup = executor.loader.project_state(self.after).apps.get_model('user', 'MonthlyConsumption')
+        row = Rollup.objects.get()
+        self.assertEqual((row.food_item_id, row.period, row.total_bought, row.total_wasted, row.purchases),
+                         (milk.id, 202503, 6, 1, 2))
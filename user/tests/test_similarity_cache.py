@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from user.similarity_cache import SimilarityCache
+
+
+class SimilarityCacheTests(SimpleTestCase):
+    def test_rephrasings_hit(self):
+        cache = SimilarityCache(capacity=8)
+        cache.put('How should I store ripe bananas?', 'In a fruit bowl.')
+        cache.put('What can I cook with leftover rice?', 'Fried rice.')
+        self.assertEqual(cache.get('how to store ripe banana'), 'In a fruit bowl.')
+        self.assertEqual(cache.get('What can I cook with leftover rice'), 'Fried rice.')
+        self.assertIsNone(cache.get('How long do eggs keep in the fridge?'))
+        self.assertIsNone(cache.get('the and of'))  # nothing but stop words
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_matches_brute_force_cosine(self):
+        rng = np.random.default_rng(0)
+        words = ['rice', 'egg', 'milk', 'store', 'freeze', 'cook', 'bread', 'stale', 'soup', 'apple']
+        questions = [' '.join(rng.choice(words, size=rng.integers(2, 5))) for _ in range(40)]
+        cache = SimilarityCache(capacity=64, dim=4096, threshold=0.5)
+        for i, question in enumerate(questions[:20]):
+            cache.put(question, i)
+        matrix = np.array([cache.encode(q) for q in questions[:20]])
+        idf = np.log((1.0 + 20) / (1.0 + (matrix > 0).sum(axis=0))) + 1.0
+        weighted = matrix * idf
+        for question in questions[20:]:
+            query = cache.encode(question) * idf
+            similarity = weighted @ query / np.maximum(
+                np.linalg.norm(weighted, axis=1) * np.linalg.norm(query), 1e-9)
+            best = int(np.argmax(similarity))
+            expected = best if similarity[best] >= cache.threshold else None
+            with self.subTest(question=question):
+                answer = cache.get(question)
+                if expected is None:
+                    self.assertIsNone(answer)
+                else:
+                    # Ties between equal questions may pick either copy
+                    self.assertAlmostEqual(similarity[answer], similarity[best], places=5)
+
+    def test_evicts_least_recently_used(self):
+        cache = SimilarityCache(capacity=2)
+        cache.put('freeze bread loaf', 'bread')
+        cache.put('store tomato sauce', 'sauce')
+        self.assertEqual(cache.get('freeze bread loaf'), 'bread')
+        cache.put('ripen avocado quickly', 'avocado')
+        self.assertIsNone(cache.get('store tomato sauce'))
+        self.assertEqual(cache.get('freeze bread loaf'), 'bread')
+        self.assertEqual(cache.evictions, 1)
+        np.testing.assert_array_equal(cache.doc_freq, (cache.matrix[:cache.size] > 0).sum(axis=0))
+
+    def test_concurrent_use(self):
+        cache = SimilarityCache(capacity=16)
+
+        def work(n):
+            for i in range(50):
+                cache.put(f'question {n} number {i}', i)
+                cache.get(f'question {n} number {i // 2}')
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.size, 16)
+        np.testing.assert_array_equal(cache.doc_freq, (cache.matrix > 0).sum(axis=0))
@@ -9,8 +9,14 @@ urlpatterns = [
     path('test/', views.test, name='test'),
     path('', views.upload_image_and_voice_input, name='upload_image_and_voice_input'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('inventory/', views.inventory_api, name='inventory_api'),
+    path('inventory/import/', views.bulk_import_api, name='bulk_import_api'),
+    path('inventory/import/rejects/<str:reject_id>/', views.bulk_import_rejects, name='bulk_import_rejects'),
     path('add_food/', views.add_food, name='add_food'),
     path('upload/', views.upload_image_and_voice_input, name='upload'),
+    path('upload/resumable/', views.resumable_upload_start, name='resumable_upload_start'),
+    path('upload/resumable/<str:upload_id>/', views.resumable_upload, name='resumable_upload'),
+    path('upload/resumable/<str:upload_id>/finalize/', views.resumable_upload_finalize, name='resumable_upload_finalize'),
     path('fruit_detect/', views.index1, name='fruit_detect'),
     path('video_feed1/', views.video_feed1, name='video_feed1'),
     path('get_detections1/', views.get_detections1, name='get_detections1'),
@@ -22,6 +28,9 @@ urlpatterns = [
     path('chatbot/send/', views.chatbot_send, name='chatbot_send'),
     path('recipe-generator/', views.recipe_generator, name='recipe_generator'),
     path('recipe/generate/', views.generate_recipe_api, name='generate_recipe_api'),
+    path('recipe/generate/batch/', views.generate_recipe_batch_api, name='generate_recipe_batch_api'),
+    path('llm/stats/', views.llm_stats, name='llm_stats'),
+    path('analytics/waste/', views.waste_analytics, name='waste_analytics'),
 ]
 
 # ===================================================================
@@ -33,39 +42,4 @@ def spline(request):
     """Shelf Optimize page"""
     return render(request, 'user/spline.html')
 
-# Then keep the URL in urls.py# OPTION 1: Remove spline from urls.py (QUICKEST FIX)
-# In user/urls.py, simply REMOVE or COMMENT OUT this line:
-
-from django.urls import path
-from . import views
-
-urlpatterns = [
-    path('base/', views.base, name='base'),
-    path('test/', views.test, name='test'),
-    path('', views.upload_image_and_voice_input, name='upload_image_and_voice_input'),
-    path('dashboard/', views.dashboard, name='dashboard'),
-    path('add_food/', views.add_food, name='add_food'),
-    path('upload/', views.upload_image_and_voice_input, name='upload'),
-    path('fruit_detect/', views.index1, name='fruit_detect'),
-    path('video_feed1/', views.video_feed1, name='video_feed1'),
-    path('get_detections1/', views.get_detections1, name='get_detections1'),
-    path('recipee_slider/', views.recipee_slider, name='recipee_slider'),
-    path('video_feed/', views.video_feed, name='video_feed'),
-    path('rotting_index/', views.rotting_index, name='rotting_index'),
-    # path('spline/', views.spline, name='spline'),  # COMMENTED OUT
-    path('community/', views.community, name='community'),
-    path('chatbot/send/', views.chatbot_send, name='chatbot_send'),
-    path('recipe-generator/', views.recipe_generator, name='recipe_generator'),
-    path('recipe/generate/', views.generate_recipe_api, name='generate_recipe_api'),
-]
-
-# ===================================================================
-
-# OPTION 2: Add spline view to views.py
-# Add this function to your views.py:
-
-def spline(request):
-    """Shelf Optimize page"""
-    return render(request, 'user/spline.html')
-
-# Then keep the URL in urls.py
\ No newline at end of file
+# Then keep the URL in urls.py